@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+# Copyright (c) 2014-2023 Matias Bordese
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Parser benchmarks.
+
+Each benchmark parses a synthetic diff (see benchmarks.generators) in every
+mode, and reports the best time, the throughput and the memory held by the
+result. Modes: full, metadata (metadata_only=True), columnar and lazy
+storages, buffer and buffer-md (PatchSet.from_buffer), str (converting the
+parsed diff back to text) and cli (running `python -m unidiff` on it).
+Set UNIDIFF_PURE_PYTHON to compare with the parser without its (optional)
+C speedups.
+
+Examples:
+    $ python -m benchmarks.bench_parse
+    $ python -m benchmarks.bench_parse headers crlf
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+from benchmarks.generators import (
+    binary_heavy_diff,
+    crlf_diff,
+    header_heavy_diff,
+    huge_file_diff,
+    many_files_diff,
+    non_utf8_diff,
+)
+from unidiff import PatchSet
+
+
+# diff generator and the encoding of its data
+BENCHMARKS = {
+    'files': (many_files_diff, 'utf-8'),
+    'hunks': (huge_file_diff, 'utf-8'),
+    'headers': (header_heavy_diff, 'utf-8'),
+    'binary': (binary_heavy_diff, 'utf-8'),
+    'crlf': (crlf_diff, 'utf-8'),
+    'latin1': (non_utf8_diff, 'latin-1'),
+}
+
+
+# parsing modes compared by each benchmark, given the diff lines and the
+# encoded diff data
+MODES = [
+    ('full', lambda lines, data, encoding: PatchSet(lines)),
+    ('metadata', lambda lines, data, encoding: PatchSet(
+        lines, metadata_only=True)),
+    ('columnar', lambda lines, data, encoding: PatchSet(
+        lines, storage='columnar')),
+    ('lazy', lambda lines, data, encoding: PatchSet(lines, storage='lazy')),
+    ('buffer', lambda lines, data, encoding: PatchSet.from_buffer(
+        data, encoding)),
+    ('buffer-md', lambda lines, data, encoding: PatchSet.from_buffer(
+        data, encoding, metadata_only=True)),
+]
+
+
+def report(name, mode, best, lines, data, size=None):
+    print('%-8s %-10s %9.2f ms %8.1f MB/s %10.0f lines/s %10s' % (
+        name, mode, best * 1000, len(data) / best / 1e6, len(lines) / best,
+        '-' if size is None else '%.1f B/line' % (size / len(lines))))
+
+
+def run_cli(filename, encoding):
+    with open(filename, 'rb') as diff_file:
+        subprocess.run([sys.executable, '-m', 'unidiff'], stdin=diff_file,
+                       stdout=subprocess.DEVNULL, check=True,
+                       env=dict(os.environ, PYTHONIOENCODING=encoding))
+
+
+def run(name, repeat=7):
+    generator, encoding = BENCHMARKS[name]
+    diff = generator()
+    lines = diff.splitlines(keepends=True)
+    data = diff.encode(encoding)
+    for mode, parse in MODES:
+        timer = timeit.Timer(lambda: parse(lines, data, encoding))
+        best = min(timer.repeat(repeat=repeat, number=1))
+
+        # memory held by the parsed result (the input is not included)
+        tracemalloc.start()
+        try:
+            patch = parse(lines, data, encoding)
+            size = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        del patch
+        report(name, mode, best, lines, data, size)
+
+    patch = PatchSet(lines)
+    timer = timeit.Timer(lambda: str(patch))
+    report(name, 'str', min(timer.repeat(repeat=repeat, number=1)),
+           lines, data)
+    with open(os.devnull, 'w', encoding=encoding) as null_file:
+        timer = timeit.Timer(lambda: patch.write_to(null_file))
+        report(name, 'write_to', min(timer.repeat(repeat=repeat, number=1)),
+               lines, data)
+
+    diff_file = tempfile.NamedTemporaryFile(suffix='.diff', delete=False)
+    try:
+        with diff_file:
+            diff_file.write(data)
+        timer = timeit.Timer(lambda: run_cli(diff_file.name, encoding))
+        report(name, 'cli', min(timer.repeat(repeat=3, number=1)),
+               lines, data)
+    finally:
+        os.remove(diff_file.name)
+
+
+def main():
+    for name in sys.argv[1:] or BENCHMARKS:
+        run(name)
+
+
+if __name__ == '__main__':
+    main()
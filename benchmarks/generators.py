@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+# Copyright (c) 2014-2023 Matias Bordese
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Synthetic diffs of different shapes for the benchmarks.
+
+Every generator returns the diff text, and is seeded so the same arguments
+always return the same diff.
+"""
+
+import random
+
+
+WORDS = ['value', 'count', 'result', 'items', 'config', 'buffer', 'index',
+         'total', 'name', 'path', 'data', 'offset', 'flags', 'parser']
+ACCENTED_WORDS = ['café', 'niño', 'größe', 'façade', 'déjà', 'señal']
+
+
+def _code_line(rng, words=WORDS):
+    """Return a random line of code, without the line ending."""
+    indent = ' ' * (4 * rng.randint(0, 3))
+    name = rng.choice(words)
+    kind = rng.random()
+    if kind < 0.4:
+        return '%s%s = compute(%s, %d)' % (
+            indent, name, rng.choice(words), rng.randint(0, 999))
+    if kind < 0.7:
+        return '%sif %s > %d:' % (indent, name, rng.randint(0, 99))
+    if kind < 0.9:
+        return '%sreturn %s.%s()' % (indent, name, rng.choice(words))
+    return ''
+
+
+def _hunk(rng, source_start, target_start, context, changes, newline='\n',
+          words=WORDS):
+    """Return the lines of a hunk and its source and target lengths."""
+    body = []
+    source_length = target_length = 0
+    for _ in range(context):
+        body.append(' ' + _code_line(rng, words) + newline)
+    for _ in range(changes):
+        kind = rng.random()
+        if kind < 0.4:
+            body.append('-' + _code_line(rng, words) + newline)
+        elif kind < 0.8:
+            body.append('+' + _code_line(rng, words) + newline)
+        else:
+            body.append(' ' + _code_line(rng, words) + newline)
+    for _ in range(context):
+        body.append(' ' + _code_line(rng, words) + newline)
+    for line in body:
+        if line[0] != '+':
+            source_length += 1
+        if line[0] != '-':
+            target_length += 1
+    header = '@@ -%d,%d +%d,%d @@ def %s():\n' % (
+        source_start, source_length, target_start, target_length,
+        rng.choice(words))
+    return [header] + body, source_length, target_length
+
+
+def _git_file(rng, path, hunks, newline='\n', words=WORDS):
+    """Return the lines of a git diff for a modified file."""
+    lines = [
+        'diff --git a/%s b/%s\n' % (path, path),
+        'index %07x..%07x 100644\n' % (rng.getrandbits(28),
+                                       rng.getrandbits(28)),
+        '--- a/%s\n' % path,
+        '+++ b/%s\n' % path,
+    ]
+    source_start = target_start = 1
+    for _ in range(hunks):
+        source_start += rng.randint(5, 40)
+        target_start = source_start + rng.randint(-3, 3)
+        hunk, source_length, target_length = _hunk(
+            rng, source_start, max(target_start, 1), 3, rng.randint(1, 12),
+            newline, words)
+        lines.extend(hunk)
+        source_start += source_length
+    return lines
+
+
+def many_files_diff(files=2000, seed=0):
+    """Return a git diff of many small modified files."""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(files):
+        path = 'src/package%d/module%d.py' % (i % 50, i)
+        lines.extend(_git_file(rng, path, rng.randint(1, 3)))
+    return ''.join(lines)
+
+
+def huge_file_diff(hunks=2000, lines_per_hunk=50):
+    """Return a diff for a single file made of many hunks."""
+    lines = ['--- a/big.c\n', '+++ b/big.c\n']
+    source_start = target_start = 1
+    for i in range(hunks):
+        removed = lines_per_hunk // 5
+        added = lines_per_hunk // 5
+        context = lines_per_hunk - added - removed
+        lines.append('@@ -%d,%d +%d,%d @@ int function_%d(void)\n' % (
+            source_start, context + removed, target_start, context + added, i))
+        for j in range(context // 2):
+            lines.append('     int value_%d = compute(%d);\n' % (j, j))
+        for j in range(removed):
+            lines.append('-    old_call(value_%d, "%d");\n' % (j, i))
+        for j in range(added):
+            lines.append('+    new_call(value_%d, "%d", flags);\n' % (j, i))
+        for j in range(context - context // 2):
+            lines.append('     total += value_%d;\n' % j)
+        source_start += context + removed + 10
+        target_start += context + added + 10
+    return ''.join(lines)
+
+
+def header_heavy_diff(files=5000):
+    """Return a diff made of renames and mode changes (headers only)."""
+    lines = []
+    for i in range(files):
+        lines.extend([
+            'diff --git a/src/module%d.py b/lib/module%d.py\n' % (i, i),
+            'old mode 100644\n',
+            'new mode 100755\n',
+            'similarity index 100%\n',
+            'rename from src/module%d.py\n' % i,
+            'rename to lib/module%d.py\n' % i,
+        ])
+    return ''.join(lines)
+
+
+def binary_heavy_diff(files=2000, seed=0):
+    """Return a git diff mostly made of binary file changes."""
+    rng = random.Random(seed)
+    alphabet = ('0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+                'abcdefghijklmnopqrstuvwxyz!#$%&()*+-;<=>?@^_`{|}~')
+    lines = []
+    for i in range(files):
+        kind = rng.random()
+        if kind < 0.1:
+            lines.extend(_git_file(rng, 'docs/page%d.md' % i, 1))
+            continue
+        path = 'assets/image%d.png' % i
+        lines.extend([
+            'diff --git a/%s b/%s\n' % (path, path),
+            'index %07x..%07x 100644\n' % (rng.getrandbits(28),
+                                           rng.getrandbits(28)),
+        ])
+        if kind < 0.5:
+            lines.append('Binary files a/%s and b/%s differ\n' % (path, path))
+            continue
+        lines.append('GIT binary patch\n')
+        for size in (rng.randint(100, 4000), rng.randint(100, 4000)):
+            lines.append('literal %d\n' % size)
+            for _ in range(size // 52 + 1):
+                lines.append('z' + ''.join(
+                    rng.choice(alphabet) for _ in range(65)) + '\n')
+            lines.append('\n')
+    return ''.join(lines)
+
+
+def crlf_diff(files=2000, seed=0):
+    """Return a git diff of files with CRLF line endings."""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(files):
+        path = 'win/project%d/file%d.cs' % (i % 20, i)
+        lines.extend(_git_file(rng, path, rng.randint(1, 3), newline='\r\n'))
+    return ''.join(lines)
+
+
+def non_utf8_diff(files=2000, seed=0):
+    """Return a git diff of files with non-ASCII text, to encode as latin-1."""
+    rng = random.Random(seed)
+    words = WORDS + ACCENTED_WORDS
+    lines = []
+    for i in range(files):
+        path = 'locale/messages%d.txt' % i
+        lines.extend(_git_file(rng, path, rng.randint(1, 3), words=words))
+    return ''.join(lines)
@@ -0,0 +1,25 @@
+"""Build the optional compiled parts of the parser.
+
+Everything else is configured in pyproject.toml. The C speedups (see
+unidiff/_speedups.c) are skipped if they cannot be built, or if
+UNIDIFF_PURE_PYTHON is set, the pure Python parser being used instead.
+Setting UNIDIFF_MYPYC (with mypy installed) also compiles unidiff.patch and
+unidiff.constants with mypyc.
+"""
+
+import os
+import platform
+
+from setuptools import Extension, setup
+
+ext_modules = []
+if (platform.python_implementation() == 'CPython' and
+        not os.environ.get('UNIDIFF_PURE_PYTHON')):
+    ext_modules.append(Extension(
+        'unidiff._speedups', sources=['unidiff/_speedups.c'], optional=True))
+    if os.environ.get('UNIDIFF_MYPYC'):
+        from mypyc.build import mypycify
+        ext_modules.extend(mypycify(
+            ['unidiff/patch.py', 'unidiff/constants.py']))
+
+setup(ext_modules=ext_modules)
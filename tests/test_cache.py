@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+# Copyright (c) 2014-2023 Matias Bordese
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Tests for the parse cache."""
+
+import os
+import random
+import tempfile
+import unittest
+
+from unidiff import PatchSet
+from unidiff.cache import ParseCache
+
+
+class TestParseCache(unittest.TestCase):
+    """Tests for ParseCache."""
+
+    def setUp(self):
+        super(TestParseCache, self).setUp()
+        samples_dir = os.path.join(os.path.dirname(__file__), 'samples')
+        self.sample_file = os.path.join(samples_dir, 'git.diff')
+        with open(self.sample_file, 'rb') as diff_file:
+            self.data = diff_file.read()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.directory = temp_dir.name
+
+    def test_from_string(self):
+        cache = ParseCache()
+        expected = PatchSet.from_string(self.data)
+        first = PatchSet.from_string(self.data, cache=cache)
+        second = PatchSet.from_string(self.data, cache=cache)
+        self.assertEqual(first, expected)
+        self.assertEqual(second, expected)
+        self.assertEqual(str(second), str(expected))
+        # each call returns a new patch set
+        self.assertIsNot(first, second)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        # text data and other options are cached separately
+        PatchSet.from_string(self.data.decode('utf-8'), cache=cache)
+        PatchSet.from_string(self.data, metadata_only=True, cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+        PatchSet.from_string(self.data.decode('utf-8'), cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (2, 3))
+
+    def test_from_filename(self):
+        cache = ParseCache()
+        expected = PatchSet.from_filename(self.sample_file)
+        for storage in ('list', 'columnar', 'list'):
+            res = PatchSet.from_filename(self.sample_file, storage=storage,
+                                         cache=cache)
+            self.assertEqual(res, expected)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        # the same data read from a string has no other options in common
+        PatchSet.from_string(self.data, cache=cache)
+        self.assertEqual(cache.misses, 2)
+
+    def test_memory_eviction(self):
+        size = len(PatchSet.from_string(self.data).dumps())
+        cache = ParseCache(max_bytes=size * 2)
+        for metadata_only in (False, True, False):
+            PatchSet.from_string(self.data, metadata_only=metadata_only,
+                                 cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        PatchSet.from_string(self.data, encoding='latin-1', cache=cache)
+        # the least recently used result (metadata only) was evicted
+        PatchSet.from_string(self.data, cache=cache)
+        PatchSet.from_string(self.data, metadata_only=True, cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (2, 4))
+        stats = cache.stats()
+        self.assertEqual(stats['memory_items'], 2)
+        self.assertLessEqual(stats['memory_bytes'], size * 2)
+
+    def test_disk(self):
+        cache = ParseCache(directory=self.directory)
+        expected = PatchSet.from_string(self.data, cache=cache)
+        # a new cache (e.g. in another process) finds it on disk
+        other = ParseCache(directory=self.directory)
+        self.assertEqual(PatchSet.from_string(self.data, cache=other),
+                         expected)
+        self.assertEqual(PatchSet.from_string(self.data, cache=other),
+                         expected)
+        self.assertEqual(
+            other.stats(),
+            {'hits': 2, 'disk_hits': 1, 'misses': 0, 'memory_items': 1,
+             'memory_bytes': len(expected.dumps())})
+
+        other.clear()
+        self.assertEqual(os.listdir(self.directory), [])
+        self.assertEqual(other.stats()['hits'], 0)
+
+    def test_disk_eviction(self):
+        size = len(PatchSet.from_string(self.data).dumps())
+        # room for two files, each with its data digest
+        cache = ParseCache(max_bytes=0, directory=self.directory,
+                           max_disk_bytes=size * 2 + 64)
+
+        def path(encoding):
+            key = cache.make_key(self.data, encoding=encoding,
+                                 errors='strict', metadata_only=False)
+            return os.path.join(self.directory, key + '.unidiff')
+
+        PatchSet.from_string(self.data, encoding='utf-8', cache=cache)
+        PatchSet.from_string(self.data, encoding='ascii', cache=cache)
+        os.utime(path('utf-8'), (0, 0))
+        os.utime(path('ascii'), (1, 1))
+        # using a result makes it the most recently used one
+        PatchSet.from_string(self.data, encoding='utf-8', cache=cache)
+        PatchSet.from_string(self.data, encoding='latin-1', cache=cache)
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            sorted(os.path.basename(path(encoding))
+                   for encoding in ('utf-8', 'latin-1')))
+        self.assertEqual((cache.hits, cache.disk_hits, cache.misses),
+                         (1, 1, 3))
+
+    def test_invalid_data_is_parsed_again(self):
+        cache = ParseCache(directory=self.directory)
+        expected = PatchSet.from_string(self.data, cache=cache)
+        (name,) = os.listdir(self.directory)
+        with open(os.path.join(self.directory, name), 'wb') as f:
+            f.write(b'garbage')
+        other = ParseCache(directory=self.directory)
+        self.assertEqual(PatchSet.from_string(self.data, cache=other),
+                         expected)
+        # and stored again
+        self.assertEqual(PatchSet.loads(other.get(other.make_key(
+            self.data, encoding=None, errors='strict',
+            metadata_only=False))), expected)
+
+    def test_damaged_file_is_parsed_again(self):
+        expected = PatchSet.from_string(self.data)
+        cache = ParseCache(directory=self.directory)
+        PatchSet.from_string(self.data, cache=cache)
+        (name,) = os.listdir(self.directory)
+        path = os.path.join(self.directory, name)
+        with open(path, 'rb') as f:
+            stored = f.read()
+        rand = random.Random(0)
+        for _ in range(50):
+            damaged = bytearray(stored)
+            for _ in range(3):
+                damaged[rand.randrange(len(damaged))] ^= 1 << rand.randrange(8)
+            with open(path, 'wb') as f:
+                f.write(damaged)
+            other = ParseCache(directory=self.directory)
+            self.assertIsNone(other.get(name[:-len('.unidiff')]))
+            # the damaged file was removed
+            self.assertEqual(os.listdir(self.directory), [])
+            res = PatchSet.from_string(self.data, cache=other)
+            self.assertEqual(str(res), str(expected))
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), stored)
@@ -24,14 +24,19 @@
 
 """Tests for Hunk."""
 
+import copy
+import pickle
 import unittest
 
 from unidiff.patch import (
     LINE_TYPE_ADDED,
     LINE_TYPE_CONTEXT,
     LINE_TYPE_REMOVED,
+    ColumnarHunk,
     Hunk,
+    LazyHunk,
     Line,
+    PatchSet,
 )
 
 
@@ -88,3 +93,188 @@ class TestHunk(unittest.TestCase):
         self.assertIn(str(self.removed_line), hunk.source)
         source_lines = list(hunk.source_lines())
         self.assertEqual(source_lines, [self.removed_line])
+
+    def test_counts(self):
+        for hunk in (Hunk(), ColumnarHunk()):
+            self.assertEqual((hunk.added, hunk.removed), (0, 0))
+            for line in (self.added_line, self.removed_line,
+                         self.context_line, self.added_line):
+                hunk.append(line)
+            self.assertEqual((hunk.added, hunk.removed), (2, 1))
+
+            # any other change is also reflected in the counts
+            hunk.pop()
+            self.assertEqual((hunk.added, hunk.removed), (1, 1))
+            hunk[0] = self.removed_line
+            self.assertEqual((hunk.added, hunk.removed), (0, 2))
+            del hunk[1]
+            self.assertEqual((hunk.added, hunk.removed), (0, 1))
+            hunk.extend([self.added_line, self.added_line])
+            hunk.insert(0, self.added_line)
+            self.assertEqual((hunk.added, hunk.removed), (3, 1))
+            hunk.remove(self.added_line)
+            hunk += [self.removed_line]
+            self.assertEqual((hunk.added, hunk.removed), (2, 2))
+            hunk *= 2
+            self.assertEqual((hunk.added, hunk.removed), (4, 4))
+            hunk.clear()
+            self.assertEqual((hunk.added, hunk.removed), (0, 0))
+
+    def test_counts_are_kept_on_copies(self):
+        hunk = Hunk()
+        hunk.append(self.added_line)
+        # metadata only hunks have no lines to count
+        patch = PatchSet(
+            '--- a/f\n+++ b/f\n@@ -1,3 +1,4 @@\n-a\n-b\n+c\n+d\n+e\n f\n',
+            metadata_only=True)
+        metadata_hunk = patch[0][0]
+        self.assertEqual(len(metadata_hunk), 0)
+        for other in (pickle.loads(pickle.dumps(hunk)), copy.copy(hunk),
+                      copy.deepcopy(hunk)):
+            self.assertEqual(other, hunk)
+            self.assertEqual((other.added, other.removed), (1, 0))
+        for other in (pickle.loads(pickle.dumps(metadata_hunk)),
+                      copy.copy(metadata_hunk), copy.deepcopy(metadata_hunk)):
+            self.assertEqual((other.added, other.removed), (3, 2))
+
+    def test_parsed_hunk_counts(self):
+        # the parser appends lines without counting them, and sets the counts
+        # once the hunk is complete
+        patch = PatchSet(
+            '--- a/f\n+++ b/f\n@@ -1,2 +1,2 @@\n-old\n+new\n same\n')
+        hunk = patch[0][0]
+        self.assertEqual((hunk.added, hunk.removed), (1, 1))
+        hunk.append(self.added_line)
+        self.assertEqual((hunk.added, hunk.removed), (2, 1))
+        self.assertEqual(hunk[-1], self.added_line)
+
+
+class TestColumnarHunk(unittest.TestCase):
+    """Tests for ColumnarHunk."""
+
+    def setUp(self):
+        super(TestColumnarHunk, self).setUp()
+        self.lines = [
+            Line('one\n', LINE_TYPE_CONTEXT, 1, 1, 4),
+            Line('two\n', LINE_TYPE_REMOVED, 2, None, 5),
+            Line('dos\n', LINE_TYPE_ADDED, None, 2, 6),
+            Line('three', LINE_TYPE_CONTEXT, 3, 3, 7),
+        ]
+        self.hunk = Hunk(1, 3, 1, 3)
+        self.columnar_hunk = ColumnarHunk(1, 3, 1, 3)
+        for line in self.lines:
+            self.hunk.append(line)
+            self.columnar_hunk.append(line)
+
+    def test_lines_are_created_on_access(self):
+        hunk = self.columnar_hunk
+        self.assertEqual(len(hunk), 4)
+        self.assertEqual(list(hunk), self.lines)
+        self.assertEqual(hunk[1], self.lines[1])
+        self.assertEqual(hunk[-1], self.lines[-1])
+        self.assertEqual(hunk[1:3], self.lines[1:3])
+        self.assertEqual(list(reversed(hunk)), self.lines[::-1])
+        self.assertIn(self.lines[2], hunk)
+        self.assertEqual(hunk.index(self.lines[2]), 2)
+        self.assertRaises(IndexError, hunk.__getitem__, 4)
+        # lines are not kept in the list itself
+        self.assertEqual(list.__len__(hunk), 0)
+        self.assertIsNot(hunk[0], hunk[0])
+
+    def test_same_as_hunk(self):
+        hunk = self.columnar_hunk
+        self.assertEqual(hunk, self.hunk)
+        self.assertFalse(hunk != self.hunk)
+        self.assertEqual(str(hunk), str(self.hunk))
+        self.assertEqual((hunk.added, hunk.removed), (1, 1))
+        self.assertEqual(hunk.source, self.hunk.source)
+        self.assertEqual(hunk.target, self.hunk.target)
+        self.assertEqual(list(hunk.source_lines()),
+                         list(self.hunk.source_lines()))
+        self.assertEqual(list(hunk.target_lines()),
+                         list(self.hunk.target_lines()))
+        self.assertTrue(hunk.is_valid())
+
+    def test_mutation_materializes_lines(self):
+        hunk = self.columnar_hunk
+        del hunk[1]
+        self.assertEqual(list.__len__(hunk), 3)
+        self.assertEqual(list(hunk), [self.lines[0]] + self.lines[2:])
+        self.assertEqual((hunk.added, hunk.removed), (1, 0))
+        # appending keeps working once materialized
+        hunk.append(self.lines[1])
+        self.assertEqual(hunk[-1], self.lines[1])
+        self.assertIs(hunk[0], hunk[0])
+
+    def test_pickle_and_copy(self):
+        hunk = self.columnar_hunk
+        for other in (pickle.loads(pickle.dumps(hunk)), copy.copy(hunk),
+                      copy.deepcopy(hunk)):
+            self.assertIsInstance(other, ColumnarHunk)
+            # the columns are kept, no lines are created
+            self.assertIsNotNone(other._line_types)
+            self.assertEqual(other, hunk)
+            self.assertEqual(repr(other), repr(hunk))
+        # copies do not share the columns
+        other = copy.copy(hunk)
+        other.append(self.lines[0])
+        self.assertEqual(len(hunk), 4)
+        self.assertEqual(len(other), 5)
+
+
+class TestLazyHunk(unittest.TestCase):
+    """Tests for LazyHunk."""
+
+    def setUp(self):
+        super(TestLazyHunk, self).setUp()
+        diff = ('--- a/f\n'
+                '+++ b/f\n'
+                '@@ -1,3 +1,3 @@\n'
+                ' one\n'
+                '-two\n'
+                '+dos\n'
+                ' three\n'
+                '\\ No newline at end of file\n')
+        self.hunk = PatchSet(diff, storage='lazy')[0][0]
+        self.expected = PatchSet(diff)[0][0]
+
+    def test_lines_are_parsed_on_access(self):
+        hunk = self.hunk
+        self.assertIsInstance(hunk, LazyHunk)
+        self.assertEqual((hunk.added, hunk.removed), (1, 1))
+        self.assertTrue(hunk)
+        # the marker line was appended without parsing the hunk
+        self.assertIsNotNone(hunk._body)
+        self.assertEqual(len(hunk), 5)
+        self.assertIsNone(hunk._body)
+        self.assertEqual(list(hunk), list(self.expected))
+        self.assertEqual(
+            [line.diff_line_no for line in hunk], [4, 5, 6, 7, None])
+        self.assertEqual((hunk.added, hunk.removed), (1, 1))
+        self.assertIs(hunk[0], hunk[0])
+
+    def test_same_as_hunk(self):
+        hunk = self.hunk
+        self.assertEqual(hunk, self.expected)
+        self.assertEqual(self.expected, hunk)
+        self.assertEqual(str(hunk), str(self.expected))
+        self.assertEqual(hunk.source, self.expected.source)
+        self.assertEqual(hunk.target, self.expected.target)
+        self.assertTrue(hunk.is_valid())
+
+    def test_mutation(self):
+        hunk = self.hunk
+        del hunk[1]
+        self.assertEqual(list(hunk),
+                         [self.expected[0]] + list(self.expected[2:]))
+        self.assertEqual((hunk.added, hunk.removed), (1, 0))
+
+    def test_pickle_and_copy(self):
+        hunk = self.hunk
+        for other in (pickle.loads(pickle.dumps(hunk)), copy.copy(hunk),
+                      copy.deepcopy(hunk)):
+            self.assertIsInstance(other, LazyHunk)
+            # the raw lines are kept, not parsed
+            self.assertIsNotNone(other._body)
+            self.assertEqual(other, self.expected)
+        self.assertIsNotNone(hunk._body)
@@ -24,6 +24,8 @@
 
 """Tests for Line."""
 
+import pickle
+import tracemalloc
 import unittest
 
 from unidiff.patch import (
@@ -70,3 +72,36 @@ class TestLine(unittest.TestCase):
         self.assertTrue(self.context_line.is_context)
         self.assertFalse(self.added_line.is_context)
         self.assertFalse(self.removed_line.is_context)
+
+    def test_slots(self):
+        self.assertFalse(hasattr(self.added_line, '__dict__'))
+        self.assertRaises(AttributeError, setattr, self.added_line, 'foo', 1)
+
+    def test_pickle(self):
+        line = Line('Sample line', LINE_TYPE_ADDED, None, 4, 7)
+        data = pickle.dumps(line, pickle.HIGHEST_PROTOCOL)
+        self.assertEqual(pickle.loads(data), line)
+        # pickled as a constructor call, without the attribute names
+        self.assertNotIn(b'target_line_no', data)
+
+    def test_memory_footprint(self):
+        class DictLine(Line):
+            """Line keeping its attributes in a per-instance __dict__."""
+
+        def footprint(line_class, count=10000):
+            lines = [None] * count
+            tracemalloc.start()
+            try:
+                before = tracemalloc.get_traced_memory()[0]
+                for i in range(count):
+                    lines[i] = line_class('Sample line', LINE_TYPE_ADDED)
+                    # make sure the attributes are materialized
+                    lines[i].diff_line_no = None
+                return (tracemalloc.get_traced_memory()[0] - before) / count
+            finally:
+                tracemalloc.stop()
+
+        slots_size = footprint(Line)
+        dict_size = footprint(DictLine)
+        # no per-line dict on top of the object itself
+        self.assertLess(slots_size, dict_size)
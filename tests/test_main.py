@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+# Copyright (c) 2014-2023 Matias Bordese
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Tests for the command line entry point."""
+
+import contextlib
+import csv
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from unidiff import UnidiffParseError
+from unidiff import __main__ as cli
+
+
+class TestMain(unittest.TestCase):
+    """Tests for the unidiff command."""
+
+    def setUp(self):
+        super(TestMain, self).setUp()
+        samples_dir = os.path.join(os.path.dirname(__file__), 'samples')
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.paths = []
+        for sample in ('git.diff', 'git_rename.diff', 'binary.diff'):
+            path = os.path.join(self.tmp_dir,
+                                sample.replace('.diff', '.patch'))
+            shutil.copy(os.path.join(samples_dir, sample), path)
+            self.paths.append(path)
+        self.paths.sort()
+        self.bad_path = os.path.join(self.tmp_dir, 'bad.diff')
+        shutil.copy(os.path.join(samples_dir, 'sample1.diff'), self.bad_path)
+
+    def run_main(self, *args):
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        with mock.patch.object(sys, 'argv', ['unidiff'] + list(args)), \
+                contextlib.redirect_stdout(stdout), \
+                contextlib.redirect_stderr(stderr):
+            status = cli.main()
+        return status, stdout.getvalue(), stderr.getvalue()
+
+    def test_expand_paths(self):
+        pattern = os.path.join(self.tmp_dir, '*.patch')
+        self.assertEqual(cli.expand_paths([pattern]), self.paths)
+        # in the given order, without repeating paths
+        self.assertEqual(
+            cli.expand_paths([self.bad_path, pattern, self.paths[0]]),
+            [self.bad_path] + self.paths)
+        # paths without wildcards are kept even if missing
+        missing = os.path.join(self.tmp_dir, 'missing.diff')
+        self.assertEqual(cli.expand_paths([missing]), [missing])
+        self.assertRaises(ValueError, cli.expand_paths,
+                          [os.path.join(self.tmp_dir, '*.missing')])
+
+    def test_single_path(self):
+        status, output, _ = self.run_main(self.paths[1])
+        self.assertEqual(status, 0)
+        self.assertEqual(output, (
+            'Summary\n'
+            '-------\n'
+            'added_file: +4 additions, -0 deletions\n'
+            'modified_file: +3 additions, -1 deletions\n'
+            'removed_file: +0 additions, -3 deletions\n'
+            '\n'
+            '1 modified file(s), 1 added file(s), 1 removed file(s)\n'
+            'Total: 7 addition(s), 4 deletion(s)\n'))
+
+    def test_many_paths(self):
+        status, output, _ = self.run_main(
+            os.path.join(self.tmp_dir, '*.patch'))
+        self.assertEqual(status, 0)
+        lines = output.splitlines()
+        titles = [line for line, underline in zip(lines, lines[1:])
+                  if underline and underline == '-' * len(line)]
+        self.assertEqual(titles, self.paths + ['Grand total'])
+        self.assertIn(
+            '%s\n%s\n'
+            'moved: +1 additions, -1 deletions\n'
+            'newfile: +1 additions, -1 deletions\n'
+            'sub/otherfile: +0 additions, -0 deletions\n'
+            '\n'
+            '3 modified file(s), 0 added file(s), 0 removed file(s)\n'
+            '3 file(s) renamed\n'
+            'Total: 2 addition(s), 2 deletion(s)\n'
+            '\n' % (self.paths[2], '-' * len(self.paths[2])), output)
+        self.assertTrue(output.endswith(
+            'Grand total\n'
+            '-----------\n'
+            '3 diff file(s)\n'
+            '4 modified file(s), 2 added file(s), 1 removed file(s)\n'
+            '3 file(s) renamed\n'
+            'Total: 9 addition(s), 6 deletion(s)\n'))
+
+    def test_jobs(self):
+        pattern = os.path.join(self.tmp_dir, '*.patch')
+        expected = self.run_main(pattern)
+        for jobs in ('2', '0'):
+            self.assertEqual(self.run_main('--jobs', jobs, pattern), expected)
+        status, _, errors = self.run_main('--jobs', '2', '--stats', pattern)
+        self.assertIn('files: 7\n', errors)
+
+    def test_errors(self):
+        missing = os.path.join(self.tmp_dir, 'missing.diff')
+        status, output, errors = self.run_main(
+            self.bad_path, self.paths[0], missing)
+        self.assertEqual(status, 1)
+        self.assertEqual(errors.splitlines(), [
+            'unidiff: %s: Hunk diff line expected: @@ -22,3 +22,7 @@'
+            % self.bad_path,
+            "unidiff: %s: [Errno 2] No such file or directory: '%s'"
+            % (missing, missing)])
+        self.assertIn('1 diff file(s)\n2 diff file(s) could not be parsed\n',
+                      output)
+        self.assertTrue(output.startswith(self.paths[0]))
+
+        for args in (['--show-diff'] + self.paths, ['--jobs', '-1'],
+                     [os.path.join(self.tmp_dir, '*.missing')]):
+            with contextlib.redirect_stderr(io.StringIO()):
+                self.assertRaises(SystemExit, self.run_main, *args)
+
+    def test_jsonl_format(self):
+        status, output, _ = self.run_main('--format', 'jsonl', self.paths[1])
+        self.assertEqual(status, 0)
+        records = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual(records[0], {
+            'diff': self.paths[1], 'path': 'added_file',
+            'source_file': '/dev/null', 'target_file': 'b/added_file',
+            'added': 4, 'removed': 0, 'is_binary_file': False,
+            'is_rename': False, 'is_added_file': True,
+            'is_removed_file': False, 'is_modified_file': False,
+            'source_mode': None, 'target_mode': '100644', 'diff_line_no': 1})
+        self.assertEqual(
+            [(r['path'], r['added'], r['removed'], r['diff_line_no'])
+             for r in records],
+            [('added_file', 4, 0, 1), ('modified_file', 3, 1, 12),
+             ('removed_file', 0, 3, 26)])
+
+    def test_csv_and_json_formats(self):
+        pattern = os.path.join(self.tmp_dir, '*.patch')
+        _, output, _ = self.run_main('--format', 'jsonl', pattern)
+        expected = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual([r['diff'] for r in expected],
+                         [self.paths[0]] + [self.paths[1]] * 3 +
+                         [self.paths[2]] * 3)
+
+        for jobs in ('1', '2'):
+            _, output, _ = self.run_main('--format', 'json', '--jobs', jobs,
+                                         pattern)
+            self.assertEqual(json.loads(output), expected)
+            _, output, _ = self.run_main('--format', 'csv', '--jobs', jobs,
+                                         pattern)
+            rows = list(csv.DictReader(io.StringIO(output)))
+            self.assertEqual(list(rows[0]), list(expected[0]))
+            self.assertEqual(
+                [(row['diff'], row['path'], row['target_mode'],
+                  row['is_rename']) for row in rows],
+                [(r['diff'], r['path'], r['target_mode'] or '',
+                  str(r['is_rename'])) for r in expected])
+
+        status, output, _ = self.run_main('--format', 'json', self.bad_path)
+        self.assertEqual(status, 1)
+        self.assertEqual(json.loads(output), [])
+
+    def test_records_are_streamed(self):
+        with open(self.paths[1]) as diff_file:
+            data = diff_file.read()
+        # the second file is malformed, the first record is already written
+        stdin = io.StringIO(data.replace('@@ -1,3 +0,0 @@', '@@ -1,5 +0,0 @@'))
+        stdout = io.StringIO()
+        with mock.patch.object(sys, 'stdin', stdin), \
+                mock.patch.object(sys, 'stdout', stdout), \
+                mock.patch.object(sys, 'argv', ['unidiff', '--format',
+                                                'jsonl']):
+            self.assertRaises(UnidiffParseError, cli.main)
+        records = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual([record['path'] for record in records],
+                         ['added_file', 'modified_file'])
+
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertRaises(SystemExit, self.run_main, '--format', 'json',
+                              '--show-diff', self.paths[1])
+
+    def test_default_args(self):
+        # the arguments used without parsing them when none are given
+        args = cli.get_parser().parse_args([])
+        self.assertEqual(vars(args), cli.DEFAULT_ARGS)
+
+
+class TestStartup(unittest.TestCase):
+    """Tests for the time it takes to start the unidiff command."""
+
+    # time spent importing modules (that `python -c pass` does not import)
+    # to summarize a small diff, measured with -X importtime; the command is
+    # run from git hooks, so this should stay well below the interpreter
+    # startup time
+    BUDGET_MS = 35
+
+    def setUp(self):
+        super(TestStartup, self).setUp()
+        self.root_dir = os.path.dirname(os.path.dirname(
+            os.path.realpath(__file__)))
+        self.sample_file = os.path.join(self.root_dir, 'tests', 'samples',
+                                        'git.diff')
+        # use bytecode files (kept apart) even if writing them is disabled,
+        # so that compiling the sources is not measured
+        self.env = dict(os.environ, PYTHONPYCACHEPREFIX=tempfile.mkdtemp())
+        self.env.pop('PYTHONDONTWRITEBYTECODE', None)
+        self.addCleanup(shutil.rmtree, self.env['PYTHONPYCACHEPREFIX'])
+
+    def import_times(self, code, *args):
+        """Return the import time (in ms) of each module imported by code.
+
+        Modules imported by another module are not listed, their time is
+        included in it.
+
+        """
+        with open(self.sample_file) as diff_file:
+            process = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', code] + list(args),
+                stdin=diff_file, stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE, cwd=self.root_dir, env=self.env,
+                universal_newlines=True, check=True)
+        times = {}
+        for line in process.stderr.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            _, cumulative, name = line.split('|')
+            if not name.startswith('  ') and cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative) / 1000
+        return times
+
+    def run_main(self, *args):
+        code = ('import sys; sys.argv[0] = "unidiff"; '
+                'from unidiff.__main__ import main; main()')
+        return self.import_times(code, *args)
+
+    def test_imports(self):
+        modules = set(self.run_main())
+        for module in ('argparse', 'concurrent.futures', 'csv', 'glob',
+                       'json', 'multiprocessing'):
+            self.assertNotIn(module, modules)
+        self.assertIn('unidiff.patch', modules)
+        # the parser is not needed to print the help
+        self.assertNotIn('unidiff.patch', self.run_main('--help'))
+
+    def test_patch_module_attribute(self):
+        # the parser module is available as an attribute of the package,
+        # as it was when the package imported it
+        code = ('import unidiff; '
+                'print(unidiff.patch.PatchSet is unidiff.PatchSet)')
+        output = subprocess.run(
+            [sys.executable, '-c', code], stdout=subprocess.PIPE,
+            cwd=self.root_dir, universal_newlines=True, check=True).stdout
+        self.assertEqual(output, 'True\n')
+
+    def test_patterns_are_compiled_when_used(self):
+        code = ('from unidiff import PatchSet, constants; '
+                'PatchSet(open("tests/samples/git.diff")); '
+                'print(constants.RE_HUNK_HEADER._compiled is not None, '
+                'constants.RE_HUNK_HEADER_BYTES._compiled is not None)')
+        output = subprocess.run(
+            [sys.executable, '-c', code], stdout=subprocess.PIPE,
+            cwd=self.root_dir, universal_newlines=True, check=True).stdout
+        self.assertEqual(output, 'True False\n')
+
+    # wall clock timings depend on the machine and its load, so they are
+    # only checked on request
+    @unittest.skipUnless(os.environ.get('UNIDIFF_TIMING_TESTS'),
+                         'set UNIDIFF_TIMING_TESTS to check the startup time')
+    def test_startup_budget(self):
+        # the first run writes the bytecode files
+        baseline = self.import_times('pass')
+        elapsed = []
+        for _ in range(3):
+            times = self.run_main()
+            elapsed.append(sum(time for module, time in times.items()
+                               if module not in baseline))
+        self.assertLess(min(elapsed), self.BUDGET_MS)
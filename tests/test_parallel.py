@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+# Copyright (c) 2014-2023 Matias Bordese
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Tests for the parallel parser."""
+
+import os.path
+import tempfile
+import unittest
+from unittest import mock
+
+from unidiff import PatchSet, parallel
+
+
+class TestParallelParse(unittest.TestCase):
+    """Tests for parallel.parse."""
+
+    def setUp(self):
+        super(TestParallelParse, self).setUp()
+        samples_dir = os.path.join(os.path.dirname(__file__), 'samples')
+        data = b''
+        for sample in ('git.diff', 'binary.diff', 'git_rename.diff',
+                       'git_delete.diff', 'git_quoted_filename.diff',
+                       'sample8.diff'):
+            with open(os.path.join(samples_dir, sample), 'rb') as diff_file:
+                data += diff_file.read()
+        diff_file = tempfile.NamedTemporaryFile(suffix='.diff', delete=False)
+        with diff_file:
+            diff_file.write(data * 3)
+        self.diff_filename = diff_file.name
+        self.addCleanup(os.remove, self.diff_filename)
+
+    def assertSamePatch(self, res, expected):
+        self.assertEqual(res, expected)
+        self.assertEqual(str(res), str(expected))
+        self.assertEqual(
+            [(f.path, f.diff_line_no, f.is_binary_file, f.patch_info)
+             for f in res],
+            [(f.path, f.diff_line_no, f.is_binary_file, f.patch_info)
+             for f in expected])
+        self.assertEqual(
+            [l.diff_line_no for f in res for h in f for l in h],
+            [l.diff_line_no for f in expected for h in f for l in h])
+
+    def test_split_points(self):
+        with open(self.diff_filename, 'rb') as diff_file:
+            data = diff_file.read()
+        points = parallel._split_points(data, 1, 'utf-8', None)
+        self.assertEqual(points[0], 0)
+        self.assertEqual(points[-1], len(data))
+        self.assertEqual(len(points) - 1, data.count(b'\ndiff --git ') + 1)
+        for start in points[1:-1]:
+            self.assertTrue(data.startswith(b'diff --git ', start))
+
+    def test_split_points_skip_non_headers(self):
+        data = (b'diff --git a/foo b/foo\n'
+                b'diff --git foo\n'
+                b'diff --git a/bar b/bar\n')
+        self.assertEqual(parallel._split_points(data, 1, 'utf-8', None),
+                         [0, 38, len(data)])
+
+    def test_parse(self):
+        for metadata_only in (False, True):
+            expected = PatchSet.from_filename(
+                self.diff_filename, metadata_only=metadata_only)
+            with mock.patch.object(parallel, 'MIN_CHUNK_SIZE', 1):
+                res = parallel.parse(
+                    self.diff_filename, processes=2,
+                    metadata_only=metadata_only)
+            self.assertSamePatch(res, expected)
+            self.assertEqual((res.added, res.removed),
+                             (expected.added, expected.removed))
+
+    def test_parse_list_storage(self):
+        expected = PatchSet.from_filename(self.diff_filename)
+        with mock.patch.object(parallel, 'MIN_CHUNK_SIZE', 1):
+            res = parallel.parse(self.diff_filename, processes=2,
+                                 storage='list')
+        self.assertSamePatch(res, expected)
+
+    def test_parse_single_chunk(self):
+        expected = PatchSet.from_filename(self.diff_filename)
+        for processes in (1, 2):
+            res = parallel.parse(self.diff_filename, processes=processes)
+            self.assertSamePatch(res, expected)
+
+    def test_parse_empty_file(self):
+        with tempfile.NamedTemporaryFile() as empty_file:
+            self.assertEqual(len(parallel.parse(empty_file.name)), 0)
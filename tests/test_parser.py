@@ -24,12 +24,22 @@
 
 """Tests for the unified diff parser process."""
 
+import asyncio
 import codecs
+import contextlib
+import io
 import os.path
+import pickle
+import random
+import sys
+import tempfile
 import unittest
+from array import array
 
-from unidiff import PatchSet
+from unidiff import IncrementalParser, PatchSet, aparse
+from unidiff.cache import ParseCache
 from unidiff.errors import UnidiffParseError
+from unidiff.patch import ColumnarHunk, Hunk, LazyHunk
 
 
 class TestUnidiffParser(unittest.TestCase):
@@ -99,6 +109,35 @@ class TestUnidiffParser(unittest.TestCase):
         self.assertEqual(modified_unicode_line.value, '\n')
         self.assertEqual(modified_unicode_line.line_type, ' ')
 
+    def test_hunk_body_line_types(self):
+        diff = (
+            '--- a/f\n'
+            '+++ b/f\n'
+            '@@ -1,5 +1,5 @@\n'
+            ' context\n'
+            '\n'
+            '\r\n'
+            '-\n'
+            '+\n'
+            '-removed\n'
+            '+added'
+        )
+        res = PatchSet(diff.splitlines(keepends=True))
+        hunk = res[0][0]
+
+        self.assertEqual(
+            [(l.line_type, l.value, l.source_line_no, l.target_line_no)
+             for l in hunk],
+            [(' ', 'context\n', 1, 1),
+             (' ', '\n', 2, 2),
+             (' ', '\r\n', 3, 3),
+             ('-', '\n', 4, None),
+             ('+', '\n', None, 4),
+             ('-', 'removed\n', 5, None),
+             ('+', 'added', None, 5)])
+        self.assertEqual([l.diff_line_no for l in hunk], list(range(4, 11)))
+        self.assertEqual((hunk.added, hunk.removed), (2, 2))
+
     def test_print_hunks_without_gaps(self):
         with codecs.open(self.sample_file, 'r', encoding='utf-8') as diff_file:
             res = PatchSet(diff_file)
@@ -176,6 +215,135 @@ class TestUnidiffParser(unittest.TestCase):
         self.assertEqual(ps1, ps2)
         self.assertNotEqual(ps1, ps3)
 
+    def test_columnar_storage(self):
+        with open(self.sample_file, 'rb') as diff_file:
+            expected = PatchSet(diff_file, encoding='utf-8')
+        with open(self.sample_file, 'rb') as diff_file:
+            res = PatchSet(diff_file, encoding='utf-8', storage='columnar')
+
+        self.assertIsInstance(res[0][0], ColumnarHunk)
+        self.assertEqual(res, expected)
+        self.assertEqual(str(res), str(expected))
+        self.assertEqual((res.added, res.removed), (21, 17))
+        self.assertEqual(
+            PatchSet.from_filename(self.sample_file, storage='columnar'),
+            expected)
+
+    def test_columnar_storage_no_newline_marker(self):
+        utf8_file = os.path.join(self.samples_dir, 'samples/sample3.diff')
+        with open(utf8_file, 'rb') as diff_file:
+            res = PatchSet(diff_file, encoding='utf-8', storage='columnar')
+
+        marker = res.added_files[0][0][4]
+        self.assertEqual(marker.line_type, '\\')
+        self.assertEqual(marker.value, ' No newline at end of file\n')
+        self.assertEqual(res.added_files[0][0][1].value, 'holá mundo!\n')
+
+    def test_lazy_storage(self):
+        for sample in ('sample0.diff', 'sample3.diff', 'sample4.diff',
+                       'git.diff', 'sample8.diff'):
+            utf8_file = os.path.join(self.samples_dir, 'samples', sample)
+            with open(utf8_file, 'rb') as diff_file:
+                expected = PatchSet(diff_file, encoding='utf-8')
+            with open(utf8_file, 'rb') as diff_file:
+                res = PatchSet(diff_file, encoding='utf-8', storage='lazy')
+
+            hunks = [hunk for patched_file in res for hunk in patched_file]
+            self.assertTrue(all(isinstance(hunk, LazyHunk) for hunk in hunks))
+            # counts are known without parsing the hunk lines
+            self.assertEqual((res.added, res.removed),
+                             (expected.added, expected.removed))
+            self.assertTrue(all(hunk._body is not None for hunk in hunks))
+            self.assertEqual(res, expected)
+            self.assertEqual(str(res), str(expected))
+            self.assertTrue(all(hunk._body is None for hunk in hunks))
+
+    def test_lazy_storage_parses_hunks_on_access(self):
+        res = PatchSet.from_filename(self.sample_file, storage='lazy')
+        expected = PatchSet.from_filename(self.sample_file)
+        hunk = res[0][1]
+        self.assertEqual(hunk[2], expected[0][1][2])
+        self.assertIsNone(hunk._body)
+        self.assertIsNotNone(res[0][0]._body)
+        self.assertEqual(res[1].line_at_target(4), expected[1].line_at_target(4))
+
+    def test_lazy_storage_lines_split_on_cr(self):
+        lines = ['--- a\n', '+++ b\n', '@@ -1,2 +1,2 @@\n',
+                 '-one\r', '+uno\r', ' two\n']
+        res = PatchSet(lines, storage='lazy')
+        self.assertEqual(res, PatchSet(lines))
+        self.assertEqual(res[0][0][0].value, 'one\r')
+
+    def test_lazy_storage_invalid_hunk(self):
+        lines = ['--- a\n', '+++ b\n', '@@ -1,2 +1,2 @@\n',
+                 '-one\n', '?uno\n', ' two\n']
+        with self.assertRaises(UnidiffParseError):
+            PatchSet(lines, storage='lazy')
+
+    def test_from_buffer(self):
+        for sample in ('sample0.diff', 'sample3.diff', 'sample4.diff',
+                       'sample5.diff', 'git.diff', 'sample8.diff'):
+            utf8_file = os.path.join(self.samples_dir, 'samples', sample)
+            with open(utf8_file, 'rb') as diff_file:
+                data = diff_file.read()
+            with open(utf8_file, 'rb') as diff_file:
+                expected = PatchSet(diff_file, encoding='utf-8')
+
+            for buffer in (data, bytearray(data), memoryview(data),
+                           memoryview(b'..' + data)[2:]):
+                res = PatchSet.from_buffer(buffer)
+                self.assertEqual(res, expected)
+                self.assertEqual(str(res), str(expected))
+                self.assertEqual(
+                    [(f.path, f.added, f.removed, f.diff_line_no) for f in res],
+                    [(f.path, f.added, f.removed, f.diff_line_no)
+                     for f in expected])
+
+        res = PatchSet.from_buffer(data, metadata_only=True)
+        self.assertEqual((res.added, res.removed),
+                         (expected.added, expected.removed))
+
+    def test_from_mmap(self):
+        utf8_file = os.path.join(self.samples_dir, 'samples/sample3.diff')
+        with open(utf8_file, 'rb') as diff_file:
+            expected = PatchSet(diff_file, encoding='utf-8')
+
+        res = PatchSet.from_mmap(utf8_file)
+        self.assertEqual(res, expected)
+        self.assertEqual(res.added_files[0][0][1].value, 'holá mundo!\n')
+
+        with tempfile.NamedTemporaryFile() as empty_file:
+            self.assertEqual(len(PatchSet.from_mmap(empty_file.name)), 0)
+
+    def test_from_buffer_decodes_lines_on_access(self):
+        data = (
+            b'--- a/f\n'
+            b'+++ b/f\n'
+            b'@@ -1,2 +1,2 @@\n'
+            b' hola\n'
+            b'-mundo\n'
+            b'+\xff\n'
+            b'\\ No newline at end of file\n'
+            b'\n'
+        )
+        res = PatchSet.from_buffer(data)
+        hunk = res[0][0]
+        self.assertEqual((res.added, res.removed), (1, 1))
+        self.assertEqual(hunk[0].value, 'hola\n')
+        self.assertEqual(
+            [(l.line_type, l.value) for l in hunk[3:]],
+            [('\\', ' No newline at end of file\n'), ('', '\n')])
+        # the invalid line is only decoded when accessed
+        self.assertRaises(UnicodeDecodeError, hunk.__getitem__, 2)
+
+        res = PatchSet.from_buffer(data, encoding='latin-1')
+        self.assertEqual(res[0][0][2].value, '\xff\n')
+        # pickling keeps the decoded values, not the buffer
+        self.assertEqual(pickle.loads(pickle.dumps(res)), res)
+
+    def test_unknown_storage(self):
+        self.assertRaises(ValueError, PatchSet, '', storage='tuples')
+
     def test_patchset_from_string(self):
         with codecs.open(self.sample_file, 'r', encoding='utf-8') as diff_file:
             diff_data = diff_file.read()
@@ -238,6 +406,210 @@ class TestUnidiffParser(unittest.TestCase):
         # from_string also accepts bytes without an explicit encoding
         self.assertEqual(PatchSet.from_string(diff_bytes), ps_ref)
 
+    def test_bytes_mode(self):
+        for fname in ('git.diff', 'git_rename.diff', 'git_symlink.diff',
+                      'binary.diff', 'sample3.diff', 'sample8.diff'):
+            file_path = os.path.join(self.samples_dir, 'samples', fname)
+            with open(file_path, 'rb') as diff_file:
+                diff_bytes = diff_file.read()
+            with open(file_path, 'r', encoding='utf-8') as diff_file:
+                expected = PatchSet(diff_file)
+
+            res = PatchSet(diff_bytes, mode='bytes')
+            self.assertEqual(len(res), len(expected))
+            for patched_file, expected_file in zip(res, expected):
+                self.assertEqual(patched_file.path,
+                                 expected_file.path.encode('utf-8'))
+                self.assertEqual(
+                    (patched_file.added, patched_file.removed,
+                     patched_file.is_added_file, patched_file.is_removed_file,
+                     patched_file.is_binary_file, patched_file.is_rename,
+                     patched_file.is_symlink),
+                    (expected_file.added, expected_file.removed,
+                     expected_file.is_added_file,
+                     expected_file.is_removed_file,
+                     expected_file.is_binary_file, expected_file.is_rename,
+                     expected_file.is_symlink))
+                for hunk, expected_hunk in zip(patched_file, expected_file):
+                    self.assertEqual(
+                        [(line.line_type, line.value.decode('utf-8'),
+                          line.source_line_no, line.target_line_no,
+                          line.diff_line_no) for line in hunk],
+                        [(line.line_type, line.value, line.source_line_no,
+                          line.target_line_no, line.diff_line_no)
+                         for line in expected_hunk])
+            self.assertEqual(bytes(res), str(expected).encode('utf-8'))
+            # the text is decoded from the bytes
+            self.assertEqual(str(res), str(expected))
+            for patched_file, expected_file in zip(res, expected):
+                self.assertEqual(str(patched_file), str(expected_file))
+                self.assertEqual(str(patched_file.patch_info),
+                                 str(expected_file.patch_info))
+                for hunk, expected_hunk in zip(patched_file, expected_file):
+                    self.assertEqual(str(hunk), str(expected_hunk))
+                    self.assertEqual([str(line) for line in hunk],
+                                     [str(line) for line in expected_hunk])
+            output = io.BytesIO()
+            res.write_to(output)
+            self.assertEqual(output.getvalue(), bytes(res))
+
+            metadata = PatchSet(diff_bytes, mode='bytes', metadata_only=True)
+            self.assertEqual((metadata.added, metadata.removed),
+                             (expected.added, expected.removed))
+
+    def test_bytes_mode_mixed_encodings(self):
+        # file names and lines in different encodings are kept as they are
+        diff_bytes = (b'--- a/caf\xe9\n'
+                      b'+++ b/caf\xe9\n'
+                      b'@@ -1,2 +1,2 @@\n'
+                      b'-\xe9t\xe9\n'
+                      b'+\xc3\xa9t\xc3\xa9\n'
+                      b' \x00\xff\r\n'
+                      b'\\ No newline at end of file\n')
+        self.assertRaises(UnicodeDecodeError, PatchSet, diff_bytes)
+
+        res = PatchSet(diff_bytes, mode='bytes')
+        self.assertEqual(res[0].path, b'caf\xe9')
+        self.assertEqual(res[0].source_file, b'a/caf\xe9')
+        self.assertEqual(
+            [(line.line_type, line.value) for line in res[0][0]],
+            [('-', b'\xe9t\xe9\n'), ('+', b'\xc3\xa9t\xc3\xa9\n'),
+             (' ', b'\x00\xff\r\n'), ('\\', b' No newline at end of file\n')])
+        self.assertEqual(bytes(res), diff_bytes)
+        # undecodable bytes are escaped in the text
+        self.assertEqual(str(res).encode('utf-8', 'surrogateescape'),
+                         diff_bytes)
+        self.assertEqual(str(res[0][0][0]), '-\udce9t\udce9\n')
+        self.assertEqual(res.get(b'caf\xe9'), res[0])
+
+        res = PatchSet.from_string(diff_bytes, mode='bytes')
+        self.assertEqual(res[0].path, b'caf\xe9')
+        self.assertEqual(bytes(res), diff_bytes)
+
+        file_path = os.path.join(self.samples_dir, 'samples/git.diff')
+        res = PatchSet.from_filename(file_path, mode='bytes')
+        with open(file_path, 'rb') as diff_file:
+            self.assertEqual(bytes(res), diff_file.read())
+        self.assertEqual(
+            [patched_file.path
+             for patched_file in PatchSet.iter_files(bytes(res), mode='bytes')],
+            [b'added_file', b'modified_file', b'removed_file'])
+
+    def test_bytes_mode_errors(self):
+        diff_bytes = b'--- a/f\n+++ b/f\n@@ -1 +1 @@\n-a\n+b\n'
+        self.assertRaises(ValueError, PatchSet, diff_bytes, mode='binary')
+        self.assertRaises(
+            ValueError, PatchSet, diff_bytes, mode='bytes', encoding='utf-8')
+        self.assertRaises(
+            ValueError, PatchSet, diff_bytes, mode='bytes', storage='columnar')
+        self.assertRaises(TypeError, PatchSet, diff_bytes.decode('ascii'),
+                          mode='bytes')
+        self.assertRaises(
+            UnidiffParseError, PatchSet, b'--- a/f\n+++ b/f\n@@ -1 +1 @@\n',
+            mode='bytes')
+        file_path = os.path.join(self.samples_dir, 'samples/git.diff')
+        self.assertRaises(ValueError, PatchSet.from_filename, file_path,
+                          mode='bytes', cache=ParseCache())
+        self.assertRaises(ValueError, PatchSet(diff_bytes, mode='bytes').dumps)
+        self.assertRaises(ValueError, PatchSet.from_string, diff_bytes,
+                          mode='bytes', cache=ParseCache())
+        self.assertRaises(TypeError, PatchSet.from_string,
+                          diff_bytes.decode('ascii'), mode='bytes')
+
+    def test_iter_files(self):
+        with open(self.sample_file, 'rb') as diff_file:
+            expected = PatchSet(diff_file, encoding='utf-8')
+        with open(self.sample_file, 'rb') as diff_file:
+            files = list(PatchSet.iter_files(diff_file, encoding='utf-8'))
+
+        self.assertEqual(files, list(expected))
+        self.assertEqual([f.path for f in files], [f.path for f in expected])
+        self.assertEqual([f.diff_line_no for f in files],
+                         [f.diff_line_no for f in expected])
+
+    def test_iter_files_is_streaming(self):
+        # each file is yielded as soon as the next one starts, without
+        # consuming the rest of the input
+        with codecs.open(self.sample_file, 'r', encoding='utf-8') as diff_file:
+            lines = diff_file.readlines()
+        consumed = []
+
+        def diff_lines():
+            for line in lines:
+                consumed.append(line)
+                yield line
+
+        files = PatchSet.iter_files(diff_lines(), metadata_only=True)
+        first = next(files)
+        self.assertEqual(first.path, '/path/to/new')
+        self.assertEqual(first.added, 12)
+        # stopped at the header of the second file
+        self.assertEqual(consumed[-1], '+++ /path/to/another_new\n')
+        self.assertLess(len(consumed), len(lines))
+        self.assertEqual([f.path for f in files],
+                         ['/path/to/another_new', '/path/to/existing'])
+
+    def test_iter_files_string_input(self):
+        diff = (
+            '--- a/f\n'
+            '+++ b/f\n'
+            '@@ -1,2 +1,2 @@\n'
+            ' hola\n'
+            '-mundo\n'
+            '+world\n'
+        )
+        files = list(PatchSet.iter_files(diff.encode('utf-8')))
+        self.assertEqual(len(files), 1)
+        self.assertEqual((files[0].added, files[0].removed), (1, 1))
+        self.assertEqual(str(files[0]), diff)
+
+    def test_incremental_parser(self):
+        with open(self.sample_file, 'rb') as diff_file:
+            data = diff_file.read()
+        expected = PatchSet(data, encoding='utf-8')
+
+        for chunk_size in (1, 7, 100, len(data)):
+            for chunks in ([data[i:i + chunk_size]
+                            for i in range(0, len(data), chunk_size)],
+                           [data.decode('utf-8')]):
+                parser = IncrementalParser()
+                files = []
+                for chunk in chunks:
+                    files.extend(parser.feed(chunk))
+                files.extend(parser.close())
+                self.assertEqual(files, list(expected))
+                self.assertEqual(
+                    [(f.path, f.diff_line_no, f.added, f.removed)
+                     for f in files],
+                    [(f.path, f.diff_line_no, f.added, f.removed)
+                     for f in expected])
+
+    def test_incremental_parser_returns_completed_files(self):
+        parser = IncrementalParser(metadata_only=True)
+        self.assertEqual(parser.feed('--- a/f\n+++ b/f\n@@ -1,2 +1,2 @@\n'),
+                         [])
+        # hunks can be split across chunks
+        self.assertEqual(parser.feed(' hola\n-mun'), [])
+        self.assertEqual(parser.feed('do\n+world\n--- a/g\n'), [])
+        # a file is complete once the next one starts
+        files = parser.feed('+++ b/g\n')
+        self.assertEqual([f.path for f in files], ['f'])
+        self.assertEqual((files[0].added, files[0].removed), (1, 1))
+        self.assertEqual(parser.feed('@@ -1 +1 @@\n-a\n+b'), [])
+        files = parser.close()
+        self.assertEqual([f.path for f in files], ['g'])
+        self.assertRaises(ValueError, parser.feed, '')
+        self.assertRaises(ValueError, parser.close)
+
+    def test_incremental_parser_errors(self):
+        parser = IncrementalParser()
+        parser.feed('--- a/f\n+++ b/f\n@@ -1,2 +1,2 @@\n hola\n')
+        self.assertRaises(UnidiffParseError, parser.close)
+
+        parser = IncrementalParser()
+        self.assertRaises(UnidiffParseError, parser.feed,
+                          '--- a/f\n+++ b/f\n@@ -1,2 +1,2 @@\n hola\n~\n')
+
     def test_parse_malformed_diff(self):
         """Parse malformed file."""
         with open(self.sample_bad_file) as diff_file:
@@ -601,6 +973,33 @@ class TestUnidiffParser(unittest.TestCase):
         # the index line is preserved so the diff still round-trips
         self.assertEqual(str(res), diff)
 
+    def test_header_lookalikes_are_patch_info(self):
+        # lines starting like a header but not matching one (or matching one
+        # out of context) are kept as patch info
+        diff = (
+            'new mode for the parser\n'
+            'old mode 100644\n'
+            'index 1234..5678 100644\n'
+            '-- \n'
+            '+ a commit message bullet\n'
+            'deleted files are now reported\n'
+            'diff --git a/f b/f\n'
+            'index 1234..5678\n'
+            '--- a/f\n'
+            '+++ b/f\n'
+            '@@ -1 +1 @@\n'
+            '-a\n'
+            '+b\n'
+        )
+        res = PatchSet(diff)
+
+        self.assertEqual(len(res), 1)
+        self.assertIsNone(res[0].source_mode)
+        self.assertIsNone(res[0].target_mode)
+        self.assertEqual(str(res[0].patch_info),
+                         'diff --git a/f b/f\nindex 1234..5678\n')
+        self.assertEqual((res.added, res.removed), (1, 1))
+
     def test_parse_format_patch_hunkless_rename(self):
         # regression test for issues #73 / #74: git format-patch output where a
         # hunkless file (a pure rename) is followed by the "-- " email
@@ -810,3 +1209,217 @@ class TestVCSSamples(unittest.TestCase):
         # by unidiff are the same
         with codecs.open(file_path, 'r', encoding='utf-8') as diff_file:
             self.assertEqual(diff_file.read(), str(res))
+
+    def test_lookup_by_path(self):
+        tests_dir = os.path.dirname(os.path.realpath(__file__))
+        file_path = os.path.join(tests_dir, 'samples/git_rename.diff')
+        res = PatchSet.from_filename(file_path)
+
+        self.assertIs(res.get('newfile'), res[1])
+        self.assertIs(res.by_path['sub/otherfile'], res[2])
+        self.assertIsNone(res.get('oldfile'))
+        self.assertIs(res.get('oldfile', res[0]), res[0])
+        self.assertEqual(list(res.by_path), ['moved', 'newfile', 'sub/otherfile'])
+        # renamed files can also be found by their source or target name
+        self.assertIs(res.by_source['oldfile'], res[1])
+        self.assertIs(res.by_target['newfile'], res[1])
+        self.assertNotIn('newfile', res.by_source)
+
+        # changes to the patch set are reflected
+        patched_file = res.pop(1)
+        self.assertIsNone(res.get('newfile'))
+        res.append(patched_file)
+        self.assertIs(res.get('newfile'), patched_file)
+
+    def test_lookup_added_and_removed_files(self):
+        tests_dir = os.path.dirname(os.path.realpath(__file__))
+        file_path = os.path.join(tests_dir, 'samples/git.diff')
+        res = PatchSet.from_filename(file_path)
+
+        self.assertEqual(
+            [res.get(path) for path in ('added_file', 'modified_file',
+                                        'removed_file')],
+            list(res))
+        self.assertNotIn('added_file', res.by_source)
+        self.assertNotIn('removed_file', res.by_target)
+
+    def test_dumps_and_loads(self):
+        tests_dir = os.path.dirname(os.path.realpath(__file__))
+        for fname in self.samples + ['git_rename.diff', 'binary.diff',
+                                     'sample3.diff', 'sample8.diff']:
+            file_path = os.path.join(tests_dir, 'samples', fname)
+            patches = [PatchSet.from_filename(file_path),
+                       PatchSet.from_filename(file_path, storage='columnar'),
+                       PatchSet.from_mmap(file_path)]
+            for patch in patches:
+                data = patch.dumps()
+                self.assertEqual(data, patches[0].dumps())
+                for storage in ('columnar', 'list'):
+                    res = PatchSet.loads(data, storage=storage)
+                    self.assertEqual(res, patches[0])
+                    self.assertEqual(str(res), str(patches[0]))
+                    self.assertEqual(
+                        [(f.path, f.diff_line_no, f.is_binary_file,
+                          f.source_mode, f.target_mode, f.patch_info)
+                         for f in res],
+                        [(f.path, f.diff_line_no, f.is_binary_file,
+                          f.source_mode, f.target_mode, f.patch_info)
+                         for f in patches[0]])
+                    self.assertEqual((res.added, res.removed),
+                                     (patches[0].added, patches[0].removed))
+                    expected_type = (ColumnarHunk if storage == 'columnar'
+                                     else Hunk)
+                    for patched_file in res:
+                        for hunk in patched_file:
+                            self.assertIs(type(hunk), expected_type)
+
+        # counts are kept for metadata only hunks
+        patch = PatchSet.from_filename(
+            os.path.join(tests_dir, 'samples', 'git.diff'), metadata_only=True)
+        res = PatchSet.loads(patch.dumps())
+        self.assertEqual(res, patch)
+        self.assertEqual((res.added, res.removed), (7, 4))
+
+    def test_write_to(self):
+        tests_dir = os.path.dirname(os.path.realpath(__file__))
+        for fname in self.samples + ['git_rename.diff', 'binary.diff',
+                                     'sample3.diff', 'sample8.diff']:
+            file_path = os.path.join(tests_dir, 'samples', fname)
+            expected = str(PatchSet.from_filename(file_path))
+            patches = [PatchSet.from_filename(file_path, storage=storage)
+                       for storage in ('list', 'columnar', 'lazy')]
+            patches.append(PatchSet.from_mmap(file_path))
+            for patch in patches:
+                output = io.StringIO()
+                patch.write_to(output)
+                self.assertEqual(output.getvalue(), expected)
+                self.assertEqual(''.join(patch.iter_chunks()), expected)
+                for patched_file in patch:
+                    output = io.StringIO()
+                    patched_file.write_to(output)
+                    self.assertEqual(output.getvalue(), str(patched_file))
+                    for hunk in patched_file:
+                        output = io.StringIO()
+                        hunk.write_to(output)
+                        self.assertEqual(output.getvalue(), str(hunk))
+
+    def test_loads_invalid_data(self):
+        self.assertRaises(ValueError, PatchSet.loads, b'')
+        self.assertRaises(ValueError, PatchSet.loads, b'not a patch set')
+        self.assertRaises(ValueError, PatchSet.loads,
+                          pickle.dumps((b'unidiff', 0, sys.byteorder, [])))
+        self.assertRaises(ValueError, PatchSet.loads,
+                          PatchSet('').dumps(), storage='tuples')
+        # no objects other than plain data are created
+        self.assertRaises(ValueError, PatchSet.loads,
+                          pickle.dumps((b'unidiff', 1, sys.byteorder,
+                                        [PatchSet('')])))
+
+    def test_loads_damaged_data(self):
+        tests_dir = os.path.dirname(os.path.realpath(__file__))
+        data = PatchSet.from_filename(
+            os.path.join(tests_dir, 'samples', 'git.diff')).dumps()
+        damaged = [data[:size] for size in range(0, len(data), 7)]
+        rand = random.Random(0)
+        for _ in range(500):
+            flipped = bytearray(data)
+            for _ in range(rand.randint(1, 3)):
+                flipped[rand.randrange(len(data))] ^= 1 << rand.randrange(8)
+            damaged.append(bytes(flipped))
+        # CPython may print a SystemError while failing to unpickle some of
+        # them (a bytearray released after a MemoryError)
+        with contextlib.redirect_stderr(io.StringIO()):
+            for payload in damaged:
+                # changed line values or numbers may still load, but never
+                # as anything else than a patch set
+                try:
+                    res = PatchSet.loads(payload, storage='list')
+                except ValueError:
+                    continue
+                str(res)
+
+        header = (b'unidiff', 1, sys.byteorder)
+        hunk = (1, 1, 1, 1, '', 1, 0, b'+', bytes(4), bytes(4), bytes(4),
+                array('q', [2]).tobytes(), 'a\n')
+        patched_file = (None, 'a/f', 'b/f', None, None, False, None, None, 0)
+        res = PatchSet.loads(
+            pickle.dumps(header + ([patched_file + ([hunk],)],)))
+        self.assertEqual(str(res), '--- a/f\n+++ b/f\n@@ -1,1 +1,1 @@\n+a\n')
+        for files in ([patched_file],
+                      [patched_file + ([hunk[:-1]],)],
+                      [patched_file + ([hunk[:7] + (b'x',) + hunk[8:]],)],
+                      [patched_file + ([hunk[:8] + (bytes(3),) + hunk[9:]],)],
+                      [patched_file + ([hunk[:-2] + (bytes(8), 'a\n')],)],
+                      [patched_file + ([hunk[:-1] + (b'a\n',)],)],
+                      (patched_file + ([hunk],),)):
+            self.assertRaises(ValueError, PatchSet.loads,
+                              pickle.dumps(header + (files,)))
+
+    def test_pickle(self):
+        tests_dir = os.path.dirname(os.path.realpath(__file__))
+        res = PatchSet.from_filename(
+            os.path.join(tests_dir, 'samples', 'git.diff'))
+        res.get('added_file')
+        other = pickle.loads(pickle.dumps(res))
+        self.assertEqual(other, res)
+        self.assertEqual([f.path for f in other], [f.path for f in res])
+        self.assertIs(other.get('added_file'), other[0])
+        # cached lookups are rebuilt rather than pickled
+        self.assertIsNone(pickle.loads(pickle.dumps(res))._index)
+
+
+class TestAsyncParsing(unittest.IsolatedAsyncioTestCase):
+    """Tests for parsing from asyncio streams."""
+
+    def setUp(self):
+        super(TestAsyncParsing, self).setUp()
+        samples_dir = os.path.dirname(os.path.realpath(__file__))
+        with open(os.path.join(samples_dir, 'samples/sample3.diff'),
+                  'rb') as diff_file:
+            self.data = diff_file.read()
+        self.expected = PatchSet(self.data, encoding='utf-8')
+
+    async def test_aparse_stream_reader(self):
+        reader = asyncio.StreamReader()
+        reader.feed_data(self.data)
+        reader.feed_eof()
+        files = [patched_file async for patched_file in aparse(reader)]
+        self.assertEqual(files, list(self.expected))
+
+    async def test_from_async_iter(self):
+        async def chunks():
+            for i in range(0, len(self.data), 10):
+                yield self.data[i:i + 10]
+
+        res = await PatchSet.from_async_iter(chunks())
+        self.assertIsInstance(res, PatchSet)
+        self.assertEqual(res, self.expected)
+        self.assertEqual(str(res), str(self.expected))
+
+        async def text_chunks():
+            yield self.data.decode('utf-8')
+
+        res = await PatchSet.from_async_iter(text_chunks(), metadata_only=True)
+        self.assertEqual((res.added, res.removed),
+                         (self.expected.added, self.expected.removed))
+
+    async def test_aparse_lets_other_tasks_run(self):
+        data = self.data * 200
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        async def chunks():
+            yield data
+
+        ticker = asyncio.ensure_future(tick())
+        try:
+            res = await PatchSet.from_async_iter(chunks())
+        finally:
+            ticker.cancel()
+        self.assertEqual(len(res), len(self.expected) * 200)
+        self.assertGreater(ticks, 1)
@@ -26,7 +26,14 @@
 
 import unittest
 
-from unidiff.patch import PatchedFile, Hunk
+from unidiff.patch import (
+    LINE_TYPE_ADDED,
+    LINE_TYPE_CONTEXT,
+    Hunk,
+    Line,
+    PatchedFile,
+    PatchSet,
+)
 
 
 class TestPatchedFile(unittest.TestCase):
@@ -67,3 +74,53 @@ class TestPatchedFile(unittest.TestCase):
         # a leading slash is not a prefix and must be preserved
         patched_file = PatchedFile(source="/foo/bar", target="/foo/bar")
         self.assertEqual(patched_file.path, "/foo/bar")
+
+    def test_path_follows_filename_changes(self):
+        patched_file = PatchedFile(source="a/foo/bar", target="b/foo/bar")
+        self.assertEqual(patched_file.path, "foo/bar")
+        patched_file.source_file = "/dev/null"
+        patched_file.target_file = "b/foo/baz"
+        self.assertEqual(patched_file.path, "foo/baz")
+
+    def test_lines_by_line_number(self):
+        patched_file = PatchSet(
+            '--- a/foo\n'
+            '+++ b/foo\n'
+            '@@ -2,3 +2,3 @@\n'
+            ' two\n'
+            '-three\n'
+            '+tres\n'
+            ' four\n'
+            '@@ -10,2 +10,3 @@\n'
+            ' ten\n'
+            '+ten and a half\n'
+            ' eleven\n')[0]
+        first, second = patched_file
+
+        self.assertIs(patched_file.line_at_source(3), first[1])
+        self.assertIs(patched_file.line_at_target(3), first[2])
+        self.assertIs(patched_file.line_at_target(11), second[1])
+        self.assertEqual(patched_file.line_at_target(11).diff_line_no, 10)
+        self.assertIs(patched_file.line_at_source(11), second[2])
+        for line_no in (0, 1, 5, 9, 13):
+            self.assertIsNone(patched_file.line_at_source(line_no))
+            self.assertIsNone(patched_file.line_at_target(line_no))
+
+        self.assertEqual(patched_file.lines_at_source(3, 11),
+                         [first[1], first[3], second[0]])
+        self.assertEqual(patched_file.lines_at_target(4, 20),
+                         [first[3]] + list(second))
+        self.assertEqual(patched_file.lines_at_target(5, 10), [])
+
+    def test_lines_by_line_number_after_changes(self):
+        hunk = Hunk(src_start=1, src_len=1, tgt_start=1, tgt_len=2)
+        hunk.append(Line('one\n', LINE_TYPE_CONTEXT, 1, 1))
+        self.patched_file.append(hunk)
+        self.assertIsNone(self.patched_file.line_at_target(2))
+
+        added_line = Line('two\n', LINE_TYPE_ADDED, None, 2)
+        hunk.append(added_line)
+        self.assertIs(self.patched_file.line_at_target(2), added_line)
+        hunk.pop(0)
+        self.assertIsNone(self.patched_file.line_at_source(1))
+        self.assertIs(self.patched_file.line_at_target(2), added_line)
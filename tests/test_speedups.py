@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+# Copyright (c) 2014-2023 Matias Bordese
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Tests for the C implementation of the hunk parsing loop."""
+
+import os
+import pickle
+import unittest
+from unittest import mock
+
+from unidiff import PatchSet, UnidiffParseError, patch
+from unidiff.patch import Line
+
+
+@unittest.skipIf(patch._speedups is None, 'unidiff._speedups is not built')
+class TestSpeedups(unittest.TestCase):
+    """Compare the parse results with and without unidiff._speedups."""
+
+    def setUp(self):
+        super(TestSpeedups, self).setUp()
+        self.samples_dir = os.path.join(os.path.dirname(__file__), 'samples')
+
+    def parse_both(self, parse):
+        """Return the result (or error) of parse, in C and in Python."""
+        results = []
+        for speedups in (patch._speedups, None):
+            with mock.patch.object(patch, '_speedups', speedups):
+                try:
+                    patch_set = parse()
+                except Exception as error:
+                    results.append((type(error), str(error)))
+                else:
+                    results.append(self.dump(patch_set))
+        return results
+
+    def dump(self, patch_set):
+        return [
+            (str(patched_file), [
+                (hunk.added, hunk.removed, [
+                    (type(line), line.value, line.line_type,
+                     line.source_line_no, line.target_line_no,
+                     line.diff_line_no)
+                    for line in hunk])
+                for hunk in patched_file])
+            for patched_file in patch_set]
+
+    def test_samples(self):
+        for name in sorted(os.listdir(self.samples_dir)):
+            path = os.path.join(self.samples_dir, name)
+            with open(path, 'rb') as diff_file:
+                data = diff_file.read()
+            for metadata_only in (False, True):
+                with self.subTest(name=name, metadata_only=metadata_only):
+                    c_result, py_result = self.parse_both(
+                        lambda: PatchSet(data.splitlines(keepends=True),
+                                         encoding='utf-8',
+                                         metadata_only=metadata_only))
+                    self.assertEqual(c_result, py_result)
+                    c_result, py_result = self.parse_both(
+                        lambda: PatchSet.from_filename(
+                            path, metadata_only=metadata_only))
+                    self.assertEqual(c_result, py_result)
+
+    def test_errors(self):
+        header = '--- a\n+++ b\n'
+        hunks = [
+            '@@ -1,2 +1,2 @@\n x\n',
+            '@@ -1,1 +1,1 @@\n x\n y\n',
+            '@@ -1,1 +1,1 @@\n-x\n+y\n+z\n',
+            '@@ -1,2 +1,2 @@\n x\n?y\n',
+            '@@ -1,2 +1,2 @@\n x\n\n',
+            '@@ -1,2 +1,2 @@\n x\n\r\n',
+            '@@ -1,2 +1,2 @@\n x\n\\ No newline at end of file\n y\n',
+        ]
+        for hunk in hunks:
+            for metadata_only in (False, True):
+                with self.subTest(hunk=hunk, metadata_only=metadata_only):
+                    c_result, py_result = self.parse_both(
+                        lambda: PatchSet(header + hunk,
+                                         metadata_only=metadata_only))
+                    self.assertEqual(c_result, py_result)
+
+    def test_decode_error(self):
+        data = b'--- a\n+++ b\n@@ -1 +1 @@\n-\xff\n+y\n'
+        c_result, py_result = self.parse_both(
+            lambda: PatchSet(data.splitlines(keepends=True),
+                             encoding='ascii'))
+        self.assertEqual(c_result, py_result)
+        self.assertEqual(c_result[0], UnicodeDecodeError)
+
+    def test_large_line_numbers(self):
+        # past the C integers, the Python loop is used
+        data = '--- a\n+++ b\n@@ -%d +%d @@\n-x\n+y\n' % (2 ** 64, 2 ** 64)
+        c_result, py_result = self.parse_both(lambda: PatchSet(data))
+        self.assertEqual(c_result, py_result)
+
+    def test_lines(self):
+        patch_set = PatchSet('--- a\n+++ b\n@@ -1 +1 @@\n-x\n+y\n')
+        line = patch_set[0][0][1]
+        self.assertEqual(line, Line('y\n', '+', None, 1, 5))
+        self.assertEqual(pickle.loads(pickle.dumps(line)), line)
+        with self.assertRaises(AttributeError):
+            line.other = 1
+
+    def test_parse_hunk_lines(self):
+        hunk = []
+        diff = iter([(1, ' x\n'), (2, '+y\n'), (3, ' z\n')])
+        result = patch._speedups.parse_hunk_lines(
+            diff, None, False, hunk, Line,
+            patch.RE_HUNK_EMPTY_BODY_LINE.match, UnidiffParseError,
+            1, 1, 2, 3)
+        self.assertEqual(result, (2, 3, 1, 0))
+        self.assertEqual(hunk, [Line('x\n', ' ', 1, 1, 1),
+                                Line('y\n', '+', None, 2, 2)])
+        # the hunk is complete: the rest of the diff is left
+        self.assertEqual(list(diff), [(3, ' z\n')])
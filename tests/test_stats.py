@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+# Copyright (c) 2014-2023 Matias Bordese
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+
+"""Tests for the parse stats."""
+
+import os
+import unittest
+
+from unidiff import PatchSet
+from unidiff.stats import ParseStats
+
+
+class TestParseStats(unittest.TestCase):
+    """Tests for ParseStats."""
+
+    def setUp(self):
+        super(TestParseStats, self).setUp()
+        samples_dir = os.path.join(os.path.dirname(__file__), 'samples')
+        self.sample_file = os.path.join(samples_dir, 'git.diff')
+        with open(self.sample_file, 'rb') as diff_file:
+            self.data = diff_file.read()
+
+    def assert_counts(self, stats, **expected):
+        counts = stats.as_dict()
+        self.assertEqual({name: counts[name] for name in expected}, expected)
+
+    def test_counts(self):
+        stats = ParseStats()
+        PatchSet.from_filename(self.sample_file, stats=stats)
+        self.assert_counts(
+            stats, files=3, binary_files=0, hunks=3,
+            # 15 hunk lines, 3 no newline markers and a trailing empty line
+            lines_created=19, lines_read=36, header_lines=19, hunk_lines=15,
+            # "index" lines without a file mode are kept as patch info; all
+            # the lines but the trailing empty one were checked for headers
+            patch_info_lines=2, bytes_decoded=0, header_candidates=20,
+            header_matches=18)
+        self.assertGreater(stats.parse_time, 0)
+        self.assertGreaterEqual(stats.hunk_time, 0)
+        self.assertAlmostEqual(
+            stats.parse_time,
+            stats.decode_time + stats.header_time + stats.hunk_time)
+
+    def test_storage(self):
+        for kwargs in ({'metadata_only': True}, {'storage': 'columnar'},
+                       {'storage': 'lazy'}):
+            stats = ParseStats()
+            PatchSet.from_filename(self.sample_file, stats=stats, **kwargs)
+            self.assert_counts(stats, files=3, hunks=3, lines_read=36,
+                               hunk_lines=15)
+        # only the no newline markers are kept by metadata only hunks
+        stats = ParseStats()
+        PatchSet(self.data, metadata_only=True, stats=stats)
+        self.assertEqual(stats.lines_created, 4)
+        stats = ParseStats()
+        PatchSet(self.data, storage='columnar', stats=stats)
+        self.assertEqual(stats.lines_created, 0)
+
+    def test_decoding(self):
+        for parse in (lambda stats: PatchSet(self.data, stats=stats),
+                      lambda stats: PatchSet.from_string(self.data,
+                                                         stats=stats),
+                      lambda stats: PatchSet(self.data.splitlines(True),
+                                             encoding='utf-8', stats=stats)):
+            stats = ParseStats()
+            res = parse(stats)
+            self.assertEqual(res, PatchSet.from_filename(self.sample_file))
+            self.assert_counts(stats, files=3, lines_read=36,
+                               bytes_decoded=len(self.data))
+            self.assertGreater(stats.decode_time, 0)
+
+    def test_iter_files(self):
+        stats = ParseStats()
+        files = PatchSet.iter_files(self.data, stats=stats)
+        next(files)
+        self.assertEqual(stats.files, 1)
+        list(files)
+        self.assert_counts(stats, files=3, lines_read=36)
+
+    def test_counts_add_up(self):
+        stats = ParseStats()
+        PatchSet(self.data, stats=stats)
+        PatchSet(self.data, stats=stats)
+        self.assert_counts(stats, files=6, hunks=6, lines_read=72,
+                           bytes_decoded=2 * len(self.data))
+
+    def test_merge(self):
+        stats = ParseStats()
+        PatchSet(self.data, stats=stats)
+        other = ParseStats()
+        PatchSet(self.data, metadata_only=True, stats=other)
+        expected = {name: stats.as_dict()[name] + other.as_dict()[name]
+                    for name in stats.as_dict()}
+        stats.merge(other)
+        for name, value in stats.as_dict().items():
+            self.assertAlmostEqual(value, expected[name])
@@ -24,16 +24,37 @@
 
 """Unidiff parsing library."""
 
+from typing import TYPE_CHECKING, Any
+
 from unidiff import __version__
-from unidiff.patch import (
+from unidiff.constants import (
     DEFAULT_ENCODING,
     LINE_TYPE_ADDED,
     LINE_TYPE_CONTEXT,
     LINE_TYPE_REMOVED,
-    Hunk,
-    PatchedFile,
-    PatchSet,
-    UnidiffParseError,
 )
+from unidiff.errors import UnidiffParseError
+
+if TYPE_CHECKING:
+    from unidiff.patch import (
+        Hunk,
+        IncrementalParser,
+        PatchedFile,
+        PatchSet,
+        aparse,
+    )
 
 VERSION = __version__.__version__
+
+# unidiff.patch is only imported when one of these (or the module itself,
+# as unidiff.patch) is first used, so that importing the package (e.g. to
+# run the command line tool) stays cheap
+_PATCH_NAMES = frozenset(
+    ['Hunk', 'IncrementalParser', 'PatchedFile', 'PatchSet', 'aparse'])
+
+
+def __getattr__(name: str) -> Any:
+    if name == 'patch' or name in _PATCH_NAMES:
+        import unidiff.patch as patch
+        return patch if name == 'patch' else getattr(patch, name)
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
@@ -28,13 +28,25 @@ Examples:
     $ git diff | unidiff
     $ hg diff | unidiff --show-diff
     $ unidiff -f patch.diff
+    $ unidiff --stats -f patch.diff
+    $ unidiff --jobs 8 'queue/*.patch' extra.diff
+    $ git log -p | unidiff --format jsonl
     $ python -m unidiff -f patch.diff
 """
 
-import argparse
+import os
 import sys
+from collections import Counter, namedtuple
+from types import SimpleNamespace
 
-from unidiff import DEFAULT_ENCODING, PatchSet
+from unidiff.constants import DEFAULT_ENCODING
+from unidiff.errors import UnidiffParseError
+from unidiff.stats import ParseStats
+
+# this module is run for every diff piped into the command (e.g. from git
+# hooks), so anything not always needed (argparse, the parser itself when
+# only printing the help, the process pool, the output formats) is imported
+# where it is used
 
 
 DESCRIPTION = """Unified diff metadata.
@@ -43,62 +55,370 @@ Examples:
     $ git diff | unidiff
     $ hg diff | unidiff --show-diff
     $ unidiff -f patch.diff
+    $ unidiff --jobs 8 'queue/*.patch' extra.diff
+    $ git log -p | unidiff --format jsonl
 
 """
 
+# what is kept of each patched file to summarize it; only this is sent back
+# from the worker processes
+FileSummary = namedtuple('FileSummary', [
+    'path', 'source_file', 'target_file', 'added', 'removed',
+    'is_binary_file', 'is_rename', 'is_added_file', 'is_removed_file',
+    'is_modified_file', 'source_mode', 'target_mode', 'diff_line_no'])
+
+FORMAT_TEXT = 'text'
+FORMAT_JSONL = 'jsonl'
+FORMAT_CSV = 'csv'
+FORMAT_JSON = 'json'
+FORMATS = (FORMAT_TEXT, FORMAT_JSONL, FORMAT_CSV, FORMAT_JSON)
+
+# fields of the records written for the machine-readable formats: the diff
+# file the patched file comes from (None for stdin) and its summary
+RECORD_FIELDS = ('diff',) + FileSummary._fields
+
+# the arguments when none are given (as in `git diff | unidiff`), which do
+# not need argparse; same as get_parser().parse_args([])
+DEFAULT_ARGS = {
+    'paths': [], 'show_diff': False, 'diff_file': None, 'jobs': 1,
+    'format': FORMAT_TEXT, 'stats': False,
+}
+
+# send the paths to the workers in a few batches per process, so the work is
+# evenly spread without a round trip per path
+CHUNKS_PER_PROCESS = 4
+
 
 def get_parser():
+    import argparse
+
     parser = argparse.ArgumentParser(
         formatter_class=argparse.RawDescriptionHelpFormatter,
         description=DESCRIPTION)
+    parser.add_argument('paths', nargs='*', metavar='PATH',
+                        help='diff files or glob patterns (like '
+                             '"queue/**/*.patch") to summarize')
     parser.add_argument('--show-diff', action="store_true", default=False,
                         dest='show_diff', help='output diff to stdout')
     parser.add_argument('-f', '--file', dest='diff_file',
                         type=argparse.FileType('r'),
-                        help='if not specified, read diff data from stdin')
+                        help='if not specified (and no paths are given), '
+                             'read diff data from stdin')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of processes parsing the given paths '
+                             '(0 for one per CPU, default 1)')
+    parser.add_argument('--format', choices=FORMATS, default=FORMAT_TEXT,
+                        help='output a summary (text, the default) or one '
+                             'record per patched file as soon as it is '
+                             'parsed (jsonl, csv or a json array)')
+    parser.add_argument('--stats', action='store_true', default=False,
+                        help='output parser counters and timings to stderr')
     return parser
 
 
-def main():
-    parser = get_parser()
-    args = parser.parse_args()
+def expand_paths(patterns):
+    """Return the paths matching the given patterns, in a stable order.
 
-    encoding = DEFAULT_ENCODING
-    if args.diff_file:
-        diff_file = args.diff_file
-    else:
-        encoding = sys.stdin.encoding or encoding
-        diff_file = sys.stdin
+    Patterns without wildcards are kept as they are; matches of each pattern
+    are sorted and only the first occurrence of a path is kept. Raise
+    ValueError if a pattern matches no files.
 
-    patch = PatchSet(diff_file, metadata_only=(not args.show_diff))
+    """
+    import glob
 
-    if args.show_diff:
-        print(patch)
-        print()
+    paths = []
+    seen = set()
+    for pattern in patterns:
+        if glob.escape(pattern) == pattern:
+            matches = [pattern]
+        else:
+            matches = sorted(glob.glob(pattern, recursive=True))
+            if not matches:
+                raise ValueError('no files match %r' % pattern)
+        for path in matches:
+            if path not in seen:
+                seen.add(path)
+                paths.append(path)
+    return paths
+
+
+def summarize(patched_file):
+    f = patched_file
+    return FileSummary(f.path, f.source_file, f.target_file, f.added,
+                       f.removed, f.is_binary_file, f.is_rename,
+                       f.is_added_file, f.is_removed_file, f.is_modified_file,
+                       f.source_mode, f.target_mode, f.diff_line_no)
+
+
+def summarize_file(path, with_stats=False):
+    """Parse the metadata of a diff file.
+
+    Return a (summaries, stats, error) tuple: the FileSummary list (None if
+    the diff could not be read or parsed), the ParseStats if with_stats is
+    set, and the error message.
 
-    print('Summary')
-    print('-------')
-    additions = 0
-    deletions = 0
-    renamed_files = 0
-    for f in patch:
+    """
+    from unidiff.patch import PatchSet
+
+    stats = ParseStats() if with_stats else None
+    try:
+        patch = PatchSet.from_filename(path, metadata_only=True, stats=stats)
+    except (OSError, UnicodeDecodeError, UnidiffParseError) as e:
+        return None, stats, str(e)
+    return [summarize(f) for f in patch], stats, None
+
+
+def iter_summaries(paths, jobs, with_stats=False):
+    """Yield summarize_file results for each path, in the same order.
+
+    The files are parsed in a pool of `jobs` processes (one per CPU if 0).
+
+    """
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(paths))
+    if jobs <= 1:
+        for path in paths:
+            yield summarize_file(path, with_stats)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunksize = max(len(paths) // (jobs * CHUNKS_PER_PROCESS), 1)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(summarize_file, paths,
+                                [with_stats] * len(paths),
+                                chunksize=chunksize)
+
+
+def count_files(summaries):
+    counts = Counter(additions=0, deletions=0)
+    for f in summaries:
+        if not f.is_binary_file:
+            counts['additions'] += f.added
+            counts['deletions'] += f.removed
+        counts['modified'] += f.is_modified_file
+        counts['added'] += f.is_added_file
+        counts['removed'] += f.is_removed_file
+        counts['renamed'] += f.is_rename
+    return counts
+
+
+def print_files(summaries):
+    for f in summaries:
         if f.is_binary_file:
             print('%s:' % f.path, '(binary file)')
         else:
-            additions += f.added
-            deletions += f.removed
             print('%s:' % f.path, '+%d additions,' % f.added,
                   '-%d deletions' % f.removed)
-        renamed_files = renamed_files + 1 if f.is_rename else renamed_files
 
-    print()
+
+def print_counts(counts):
     print('%d modified file(s), %d added file(s), %d removed file(s)' % (
-        len(patch.modified_files), len(patch.added_files),
-        len(patch.removed_files)))
-    if renamed_files:
-        print('%d file(s) renamed' % renamed_files)
-    print('Total: %d addition(s), %d deletion(s)' % (additions, deletions))
+        counts['modified'], counts['added'], counts['removed']))
+    if counts['renamed']:
+        print('%d file(s) renamed' % counts['renamed'])
+    print('Total: %d addition(s), %d deletion(s)' % (
+        counts['additions'], counts['deletions']))
+
+
+def print_title(title):
+    print(title)
+    print('-' * len(title))
+
+
+def print_stats(stats, file):
+    print('Parse stats', file=file)
+    print('-----------', file=file)
+    for name, value in stats.as_dict().items():
+        if isinstance(value, float):
+            print('%s: %.3f ms' % (name, value * 1000), file=file)
+        else:
+            print('%s: %d' % (name, value), file=file)
+
+
+def print_summary(diff_file, show_diff=False, stats=None):
+    from unidiff.patch import PatchSet
+
+    patch = PatchSet(diff_file, metadata_only=(not show_diff), stats=stats)
+
+    if show_diff:
+        # same as print(patch), without building the whole text first
+        patch.write_to(sys.stdout)
+        print()
+        print()
+
+    summaries = [summarize(f) for f in patch]
+    print_title('Summary')
+    print_files(summaries)
+    print()
+    print_counts(count_files(summaries))
+
+
+class RecordWriter(object):
+    """Write a record per patched file, in one of the machine formats.
+
+    Records are written as they come (JSON Lines, CSV with a header row, or
+    a JSON array of objects), so they can be consumed while the diff is
+    still being parsed.
+
+    """
+
+    def __init__(self, output_format, file):
+        self.output_format = output_format
+        self.file = file
+        self.count = 0
+        self._csv = None
+        if output_format == FORMAT_CSV:
+            import csv
+            self._csv = csv.writer(file, lineterminator='\n')
+            self._csv.writerow(RECORD_FIELDS)
+        elif output_format == FORMAT_JSON:
+            file.write('[')
+        if output_format in (FORMAT_JSONL, FORMAT_JSON):
+            import json
+            self._dumps = json.dumps
+
+    def write(self, diff, summary):
+        values = (diff,) + tuple(summary)
+        if self._csv is not None:
+            self._csv.writerow(values)
+        else:
+            record = self._dumps(dict(zip(RECORD_FIELDS, values)))
+            if self.output_format == FORMAT_JSON:
+                self.file.write(',\n' if self.count else '\n')
+                self.file.write(record)
+            else:
+                self.file.write(record + '\n')
+        self.count += 1
+
+    def close(self):
+        if self.output_format == FORMAT_JSON:
+            self.file.write('\n]\n' if self.count else ']\n')
+
+
+def summarize_paths(paths, jobs, stats=None, writer=None):
+    """Print the summary of each diff file, and their grand total.
+
+    If a RecordWriter is given, the records of each diff file are written
+    instead.
+
+    Return the exit status: 1 if any of the files could not be parsed.
+
+    """
+    totals = Counter()
+    failed = 0
+    results = iter_summaries(paths, jobs, with_stats=stats is not None)
+    for path, (summaries, file_stats, error) in zip(paths, results):
+        if file_stats is not None:
+            stats.merge(file_stats)
+        if summaries is None:
+            failed += 1
+            print('unidiff: %s: %s' % (path, error.rstrip('\n')),
+                  file=sys.stderr)
+            continue
+        if writer is not None:
+            for summary in summaries:
+                writer.write(path, summary)
+            continue
+        counts = count_files(summaries)
+        totals.update(counts)
+        print_title(path)
+        print_files(summaries)
+        print()
+        print_counts(counts)
+        print()
+
+    if writer is not None:
+        return 1 if failed else 0
+    print_title('Grand total')
+    print('%d diff file(s)' % (len(paths) - failed))
+    if failed:
+        print('%d diff file(s) could not be parsed' % failed)
+    print_counts(totals)
+    return 1 if failed else 0
+
+
+def main():
+    if len(sys.argv) > 1:
+        parser = get_parser()
+        args = parser.parse_args()
+    else:
+        # none of the checks below can fail without arguments
+        parser = None
+        args = SimpleNamespace(**DEFAULT_ARGS)
+    if args.jobs < 0:
+        parser.error('the number of jobs cannot be negative')
+    if args.paths and args.diff_file:
+        parser.error('paths and -f/--file cannot be used together')
+    try:
+        # glob is not imported to read the diff from stdin
+        paths = expand_paths(args.paths) if args.paths else []
+    except ValueError as e:
+        parser.error(str(e))
+    if args.show_diff and len(paths) > 1:
+        parser.error('--show-diff is only supported for a single diff')
+    if args.show_diff and args.format != FORMAT_TEXT:
+        parser.error('--show-diff is only supported for the text format')
+
+    stats = ParseStats() if args.stats else None
+    if len(paths) > 1:
+        writer = None
+        if args.format != FORMAT_TEXT:
+            writer = RecordWriter(args.format, sys.stdout)
+        status = summarize_paths(paths, args.jobs, stats, writer)
+        if writer is not None:
+            writer.close()
+        if stats is not None:
+            print_stats(stats, sys.stderr)
+        return status
+
+    encoding = DEFAULT_ENCODING
+    diff_name = None
+    if paths:
+        diff_name = paths[0]
+        try:
+            diff_file = open(diff_name, encoding=encoding)
+        except OSError as e:
+            parser.error("can't open '%s': %s" % (diff_name, e))
+    elif args.diff_file:
+        diff_name = args.diff_file.name
+        diff_file = args.diff_file
+    else:
+        encoding = sys.stdin.encoding or encoding
+        diff_file = sys.stdin
+
+    writer = None
+    if args.format != FORMAT_TEXT:
+        writer = RecordWriter(args.format, sys.stdout)
+    try:
+        if writer is not None:
+            from unidiff.patch import PatchSet
+
+            # stream the records, without keeping the parsed files
+            for patched_file in PatchSet.iter_files(
+                    diff_file, metadata_only=True, stats=stats):
+                writer.write(diff_name, summarize(patched_file))
+        else:
+            print_summary(diff_file, args.show_diff, stats)
+    except (UnicodeDecodeError, UnidiffParseError) as e:
+        # as for many paths, report the error for a given path
+        if not paths:
+            raise
+        print('unidiff: %s: %s' % (diff_name, str(e).rstrip('\n')),
+              file=sys.stderr)
+        status = 1
+    else:
+        status = 0
+    finally:
+        if paths:
+            diff_file.close()
+        if writer is not None:
+            writer.close()
+
+    if stats is not None:
+        print_stats(stats, sys.stderr)
+    return status
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -0,0 +1,427 @@
+/*
+ * The MIT License (MIT)
+ * Copyright (c) 2014-2023 Matias Bordese
+ *
+ * Permission is hereby granted, free of charge, to any person obtaining a
+ * copy of this software and associated documentation files (the "Software"),
+ * to deal in the Software without restriction, including without limitation
+ * the rights to use, copy, modify, merge, publish, distribute, sublicense,
+ * and/or sell copies of the Software, and to permit persons to whom the
+ * Software is furnished to do so, subject to the following conditions:
+ *
+ * The above copyright notice and this permission notice shall be included in
+ * all copies or substantial portions of the Software.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+ * EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+ * MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+ * IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+ * DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+ * OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+ * USE OR OTHER DEALINGS IN THE SOFTWARE.
+ */
+
+/*
+ * Optional C implementation of the hunk parsing loop.
+ *
+ * parse_hunk_lines does the same as the list storage and metadata only
+ * branches of PatchedFile._parse_hunk (in patch.py), which is used when this
+ * module is not available: both must give the same results and errors.
+ */
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+#if PY_VERSION_HEX < 0x030A0000
+static inline PyObject *
+Py_NewRef(PyObject *obj)
+{
+    Py_INCREF(obj);
+    return obj;
+}
+#endif
+
+/* the Line slots, in the order of the Line constructor arguments */
+#define LINE_SLOTS 5
+static const char *line_slot_names[LINE_SLOTS] = {
+    "value", "line_type", "source_line_no", "target_line_no", "diff_line_no",
+};
+
+static PyObject *str_added;
+static PyObject *str_removed;
+static PyObject *str_context;
+static PyObject *str_no_newline;
+static PyObject *str_decode;
+static PyObject *str_group;
+static PyObject *str_value;
+
+
+/*
+ * Return a new line_class instance for the given constructor arguments.
+ *
+ * If the slots of line_class are given (as member descriptors), they are set
+ * directly instead of calling Line.__init__, which only sets them.
+ */
+static PyObject *
+new_line(PyObject *line_class, PyObject **slots, PyObject **args)
+{
+    PyObject *line;
+    int i;
+
+    if (slots == NULL) {
+        return PyObject_Vectorcall(line_class, args, LINE_SLOTS, NULL);
+    }
+    line = ((PyTypeObject *)line_class)->tp_alloc(
+        (PyTypeObject *)line_class, 0);
+    if (line == NULL) {
+        return NULL;
+    }
+    for (i = 0; i < LINE_SLOTS; i++) {
+        if (Py_TYPE(slots[i])->tp_descr_set(slots[i], line, args[i]) < 0) {
+            Py_DECREF(line);
+            return NULL;
+        }
+    }
+    return line;
+}
+
+
+/*
+ * Get the member descriptors of the Line slots into slots, or return 0 if
+ * line_class does not have them (and has to be called to create lines).
+ */
+static int
+get_line_slots(PyObject *line_class, PyObject **slots)
+{
+    int i, j;
+
+    if (!PyType_Check(line_class)) {
+        return 0;
+    }
+    for (i = 0; i < LINE_SLOTS; i++) {
+        slots[i] = PyObject_GetAttrString(line_class, line_slot_names[i]);
+        if (slots[i] == NULL || !Py_IS_TYPE(slots[i], &PyMemberDescr_Type)) {
+            PyErr_Clear();
+            for (j = 0; j <= i; j++) {
+                Py_CLEAR(slots[j]);
+            }
+            return 0;
+        }
+    }
+    return 1;
+}
+
+
+static int
+raise_line_expected(PyObject *error_class, PyObject *line)
+{
+    PyObject *message = PyUnicode_FromFormat(
+        "Hunk diff line expected: %S", line);
+    if (message != NULL) {
+        PyErr_SetObject(error_class, message);
+        Py_DECREF(message);
+    }
+    return -1;
+}
+
+
+/*
+ * Unpack a (diff line number, line) item of the diff iterator, returning new
+ * references.
+ */
+static int
+unpack_item(PyObject *item, PyObject **diff_line_no, PyObject **line)
+{
+    PyObject *sequence;
+    Py_ssize_t size;
+
+    sequence = PySequence_Fast(item, "cannot unpack non-iterable object");
+    if (sequence == NULL) {
+        return -1;
+    }
+    size = PySequence_Fast_GET_SIZE(sequence);
+    if (size != 2) {
+        if (size < 2) {
+            PyErr_Format(PyExc_ValueError,
+                         "not enough values to unpack (expected 2, got %zd)",
+                         size);
+        }
+        else {
+            PyErr_SetString(PyExc_ValueError,
+                            "too many values to unpack (expected 2)");
+        }
+        Py_DECREF(sequence);
+        return -1;
+    }
+    *diff_line_no = Py_NewRef(PySequence_Fast_GET_ITEM(sequence, 0));
+    *line = Py_NewRef(PySequence_Fast_GET_ITEM(sequence, 1));
+    Py_DECREF(sequence);
+    return 0;
+}
+
+
+PyDoc_STRVAR(parse_hunk_lines_doc,
+"parse_hunk_lines(diff, encoding, metadata_only, hunk, line_class,\n"
+"                 empty_line_match, error_class, source_line_no,\n"
+"                 target_line_no, expected_source_end, expected_target_end)\n"
+"--\n"
+"\n"
+"Parse the hunk lines from the diff iterator of (line number, line).\n"
+"\n"
+"Lines (decoded using encoding, if not None) are appended to the hunk as\n"
+"line_class instances, unless metadata_only is set. Lines are read until\n"
+"the expected end line numbers are reached (or the iterator is exhausted);\n"
+"return the (source_line_no, target_line_no, added, removed) tuple.\n"
+"\n"
+"empty_line_match is the match method of RE_HUNK_EMPTY_BODY_LINE, and\n"
+"error_class the exception raised for invalid lines.");
+
+static PyObject *
+parse_hunk_lines(PyObject *module, PyObject *args)
+{
+    PyObject *diff, *encoding, *hunk, *line_class, *empty_line_match;
+    PyObject *error_class;
+    int metadata_only;
+    Py_ssize_t source_line_no, target_line_no;
+    Py_ssize_t expected_source_end, expected_target_end;
+    Py_ssize_t added = 0, removed = 0;
+    PyObject *iterator = NULL, *item = NULL;
+    PyObject *diff_line_no = NULL, *line = NULL, *raw_line = NULL;
+    PyObject *value = NULL, *match = NULL;
+    PyObject *line_source_no = NULL, *line_target_no = NULL;
+    PyObject *new = NULL;
+    PyObject *slots[LINE_SLOTS] = {NULL};
+    PyObject *line_args[LINE_SLOTS];
+    PyObject *line_type = NULL;
+    PyObject *result = NULL;
+    int has_slots = 0;
+    int i;
+
+    if (!PyArg_ParseTuple(args, "OOpOOOOnnnn:parse_hunk_lines", &diff,
+                          &encoding, &metadata_only, &hunk, &line_class,
+                          &empty_line_match, &error_class, &source_line_no,
+                          &target_line_no, &expected_source_end,
+                          &expected_target_end)) {
+        return NULL;
+    }
+    if (!PyList_Check(hunk)) {
+        PyErr_SetString(PyExc_TypeError, "hunk must be a list");
+        return NULL;
+    }
+    iterator = PyObject_GetIter(diff);
+    if (iterator == NULL) {
+        return NULL;
+    }
+    if (!metadata_only) {
+        has_slots = get_line_slots(line_class, slots);
+    }
+
+    while ((item = PyIter_Next(iterator)) != NULL) {
+        if (unpack_item(item, &diff_line_no, &raw_line) < 0) {
+            goto error;
+        }
+        Py_CLEAR(item);
+        if (encoding != Py_None) {
+            line = PyObject_CallMethodObjArgs(raw_line, str_decode, encoding,
+                                              NULL);
+            Py_CLEAR(raw_line);
+            if (line == NULL) {
+                goto error;
+            }
+        }
+        else {
+            line = raw_line;
+            raw_line = NULL;
+        }
+
+        if (!PyUnicode_Check(line)) {
+            /* as when comparing the line type of a non text line */
+            if (metadata_only) {
+                int is_true = PyObject_IsTrue(line);
+                if (is_true < 0) {
+                    goto error;
+                }
+                if (is_true) {
+                    raise_line_expected(error_class, line);
+                    goto error;
+                }
+                source_line_no++;
+                target_line_no++;
+            }
+            else {
+                match = PyObject_CallOneArg(empty_line_match, line);
+                if (match != NULL) {
+                    raise_line_expected(error_class, line);
+                }
+                goto error;
+            }
+        }
+        else if (metadata_only) {
+            /* an empty line is taken as context */
+            Py_UCS4 first = PyUnicode_GET_LENGTH(line) ?
+                PyUnicode_READ_CHAR(line, 0) : ' ';
+            if (first == '+') {
+                target_line_no++;
+                added++;
+            }
+            else if (first == '-') {
+                source_line_no++;
+                removed++;
+            }
+            else if (first == ' ') {
+                target_line_no++;
+                source_line_no++;
+            }
+            else if (first != '\\') {
+                raise_line_expected(error_class, line);
+                goto error;
+            }
+        }
+        else {
+            Py_ssize_t length = PyUnicode_GET_LENGTH(line);
+            Py_UCS4 first = length ? PyUnicode_READ_CHAR(line, 0) : 0;
+            line_source_no = Py_NewRef(Py_None);
+            line_target_no = Py_NewRef(Py_None);
+            if (first == ' ') {
+                line_type = str_context;
+                Py_SETREF(line_source_no, PyLong_FromSsize_t(source_line_no));
+                Py_SETREF(line_target_no, PyLong_FromSsize_t(target_line_no));
+                target_line_no++;
+                source_line_no++;
+            }
+            else if (first == '+') {
+                line_type = str_added;
+                Py_SETREF(line_target_no, PyLong_FromSsize_t(target_line_no));
+                target_line_no++;
+                added++;
+            }
+            else if (first == '-') {
+                line_type = str_removed;
+                Py_SETREF(line_source_no, PyLong_FromSsize_t(source_line_no));
+                source_line_no++;
+                removed++;
+            }
+            else if (first == '\\') {
+                line_type = str_no_newline;
+            }
+            else {
+                /* empty (or CRLF-only) lines are taken as context */
+                match = PyObject_CallOneArg(empty_line_match, line);
+                if (match == NULL) {
+                    goto error;
+                }
+                if (match == Py_None) {
+                    raise_line_expected(error_class, line);
+                    goto error;
+                }
+                value = PyObject_CallMethodOneArg(match, str_group, str_value);
+                Py_CLEAR(match);
+                if (value == NULL) {
+                    goto error;
+                }
+                line_type = str_context;
+                Py_SETREF(line_source_no, PyLong_FromSsize_t(source_line_no));
+                Py_SETREF(line_target_no, PyLong_FromSsize_t(target_line_no));
+                target_line_no++;
+                source_line_no++;
+            }
+            if (line_source_no == NULL || line_target_no == NULL) {
+                goto error;
+            }
+            if (value == NULL) {
+                value = PyUnicode_Substring(line, 1, length > 0 ? length : 1);
+                if (value == NULL) {
+                    goto error;
+                }
+            }
+        }
+
+        /* stop parsing if we got past expected number of lines */
+        if (source_line_no > expected_source_end ||
+                target_line_no > expected_target_end) {
+            PyErr_SetString(error_class, "Hunk is longer than expected");
+            goto error;
+        }
+
+        if (!metadata_only) {
+            line_args[0] = value;
+            line_args[1] = line_type;
+            line_args[2] = line_source_no;
+            line_args[3] = line_target_no;
+            line_args[4] = diff_line_no;
+            new = new_line(line_class, has_slots ? slots : NULL, line_args);
+            if (new == NULL || PyList_Append(hunk, new) < 0) {
+                goto error;
+            }
+            Py_CLEAR(new);
+            Py_CLEAR(value);
+            Py_CLEAR(line_source_no);
+            Py_CLEAR(line_target_no);
+        }
+        Py_CLEAR(diff_line_no);
+        Py_CLEAR(line);
+
+        /* if hunk source/target lengths are ok, hunk is complete */
+        if (source_line_no == expected_source_end &&
+                target_line_no == expected_target_end) {
+            break;
+        }
+    }
+    if (PyErr_Occurred()) {
+        goto error;
+    }
+
+    result = Py_BuildValue("(nnnn)", source_line_no, target_line_no, added,
+                           removed);
+
+error:
+    Py_XDECREF(iterator);
+    Py_XDECREF(item);
+    Py_XDECREF(diff_line_no);
+    Py_XDECREF(raw_line);
+    Py_XDECREF(line);
+    Py_XDECREF(value);
+    Py_XDECREF(match);
+    Py_XDECREF(line_source_no);
+    Py_XDECREF(line_target_no);
+    Py_XDECREF(new);
+    for (i = 0; i < LINE_SLOTS; i++) {
+        Py_XDECREF(slots[i]);
+    }
+    return result;
+}
+
+
+static PyMethodDef speedups_methods[] = {
+    {"parse_hunk_lines", parse_hunk_lines, METH_VARARGS,
+     parse_hunk_lines_doc},
+    {NULL, NULL, 0, NULL}
+};
+
+
+static struct PyModuleDef speedups_module = {
+    PyModuleDef_HEAD_INIT,
+    "unidiff._speedups",
+    "Optional C implementation of the hunk parsing loop.",
+    -1,
+    speedups_methods,
+};
+
+
+PyMODINIT_FUNC
+PyInit__speedups(void)
+{
+    str_added = PyUnicode_InternFromString("+");
+    str_removed = PyUnicode_InternFromString("-");
+    str_context = PyUnicode_InternFromString(" ");
+    str_no_newline = PyUnicode_InternFromString("\\");
+    str_decode = PyUnicode_InternFromString("decode");
+    str_group = PyUnicode_InternFromString("group");
+    str_value = PyUnicode_InternFromString("value");
+    if (str_added == NULL || str_removed == NULL || str_context == NULL ||
+            str_no_newline == NULL || str_decode == NULL ||
+            str_group == NULL || str_value == NULL) {
+        return NULL;
+    }
+    return PyModule_Create(&speedups_module);
+}
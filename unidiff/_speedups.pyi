@@ -0,0 +1,8 @@
+from typing import Any, Callable, Iterable, Optional
+
+def parse_hunk_lines(
+    diff: Iterable[tuple[int, Any]], encoding: Optional[str],
+    metadata_only: bool, hunk: list, line_class: type,
+    empty_line_match: Callable[[str], Any], error_class: type[Exception],
+    source_line_no: int, target_line_no: int, expected_source_end: int,
+    expected_target_end: int) -> tuple[int, int, int, int]: ...
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+# Copyright (c) 2014-2023 Matias Bordese
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Cache of parse results, keyed by the hash of the diff data."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from unidiff.__version__ import __version__
+
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_DISK_BYTES = 1024 * 1024 * 1024
+
+_SUFFIX = '.unidiff'
+# each file starts with the digest of the data, to tell damaged files apart
+_DIGEST_SIZE = 20
+
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=_DIGEST_SIZE).digest()
+
+
+class ParseCache(object):
+    """Parse results (as returned by PatchSet.dumps) by key.
+
+    Results are kept in memory up to `max_bytes`, evicting the least
+    recently used ones first, and also stored as files in `directory` (if
+    given) up to `max_disk_bytes`, evicting the least recently used files.
+    The directory can be shared by several processes. Files are stored with
+    a digest of their data, and damaged files are removed when found.
+
+    Pass the cache to PatchSet.from_filename or PatchSet.from_string to use
+    it; each call returns a new PatchSet, so results can be changed without
+    affecting the cache. Loading a result with the columnar storage is
+    several times faster than parsing the diff, while with the list storage
+    most of the time goes to creating the Line objects either way.
+
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES,
+                 directory: Optional[str] = None,
+                 max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __repr__(self) -> str:
+        return '<ParseCache: %d hits, %d misses>' % (self.hits, self.misses)
+
+    @staticmethod
+    def make_key(data: bytes, **options: object) -> str:
+        """Return the cache key for the diff data and parse options."""
+        digest = hashlib.blake2b(data, digest_size=20)
+        # results may change between versions, do not share them
+        digest.update(repr((__version__, sorted(options.items()))).encode())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _SUFFIX)  # type: ignore[arg-type]
+
+    def _keep_in_memory(self, key: str, data: bytes) -> None:
+        # the lock must be held
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        if len(data) > self.max_bytes:
+            return
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_bytes:
+            self._memory_bytes -= len(self._memory.popitem(last=False)[1])
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the data stored for key, or None if not found."""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+
+        if self.directory is not None:
+            path = self._path(key)
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                # keep track of the last use, for eviction
+                os.utime(path)
+            except OSError:
+                # not found, or evicted meanwhile
+                data = None
+            if data is not None:
+                digest, data = data[:_DIGEST_SIZE], data[_DIGEST_SIZE:]
+                if digest != _digest(data):
+                    data = None
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        # removed by another process
+                        pass
+            if data is not None:
+                with self._lock:
+                    self._keep_in_memory(key, data)
+                    self.hits += 1
+                    self.disk_hits += 1
+                return data
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store the data for key."""
+        with self._lock:
+            self._keep_in_memory(key, data)
+        if self.directory is None or len(data) > self.max_disk_bytes:
+            return
+
+        # write to a temporary file first, so the file is complete for any
+        # other process reading it
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_digest(data))
+                f.write(data)
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        self._evict_files()
+
+    def _evict_files(self) -> None:
+        files = []
+        total = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith(_SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # removed by another process
+                pass
+            total -= size
+
+    def clear(self) -> None:
+        """Remove all the stored data, and reset the counters."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self.hits = self.disk_hits = self.misses = 0
+        if self.directory is not None:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith(_SUFFIX):
+                        try:
+                            os.remove(entry.path)
+                        except OSError:
+                            pass
+
+    def stats(self) -> dict[str, int]:
+        """Return the cache counters and memory usage."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'memory_items': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+            }
@@ -24,42 +24,147 @@
 
 """Useful constants and regexes used by the package."""
 
+from __future__ import annotations
+
 import re
+from typing import (
+    Any,
+    AnyStr,
+    Callable,
+    Final,
+    Generic,
+    Iterator,
+    Mapping,
+    Optional,
+    TypeVar,
+)
+
+_T = TypeVar('_T')
+
+try:
+    from mypy_extensions import mypyc_attr
+except ImportError:
+    # only needed when compiling with mypyc (see setup.py), to keep the
+    # classes it cannot compile as regular Python classes
+    def mypyc_attr(*attrs: str, **kwattrs: object) -> Callable[[_T], _T]:
+        return lambda cls: cls
+
+
+@mypyc_attr(native_class=False)
+class _LazyPattern(Generic[AnyStr]):
+    """A regex compiled when first used.
+
+    Compiling all the patterns takes a few milliseconds, a noticeable part of
+    the command line startup, and some are only used in bytes mode. Once
+    compiled, the methods of the pattern (like match) are kept on the
+    instance, shadowing the ones below, so calling them costs the same as
+    on the compiled pattern. This is not a re.Pattern instance: use
+    re.compile(lazy.pattern, lazy.flags) where one is needed.
+
+    """
+
+    _METHODS = ('match', 'fullmatch', 'search', 'findall', 'finditer',
+                'split', 'sub', 'subn')
+
+    def __init__(self, pattern: AnyStr, flags: int = 0) -> None:
+        self._pattern: AnyStr = pattern
+        self._flags = flags
+        self._compiled: Optional[re.Pattern[AnyStr]] = None
+
+    def _compile(self) -> re.Pattern[AnyStr]:
+        if self._compiled is None:
+            self._compiled = re.compile(self._pattern, self._flags)
+            for name in self._METHODS:
+                setattr(self, name, getattr(self._compiled, name))
+        return self._compiled
+
+    def match(self, *args: Any, **kwargs: Any) -> Optional[re.Match[AnyStr]]:
+        return self._compile().match(*args, **kwargs)
+
+    def fullmatch(self, *args: Any,
+                  **kwargs: Any) -> Optional[re.Match[AnyStr]]:
+        return self._compile().fullmatch(*args, **kwargs)
+
+    def search(self, *args: Any, **kwargs: Any) -> Optional[re.Match[AnyStr]]:
+        return self._compile().search(*args, **kwargs)
+
+    def findall(self, *args: Any, **kwargs: Any) -> list[Any]:
+        return self._compile().findall(*args, **kwargs)
+
+    def finditer(self, *args: Any,
+                 **kwargs: Any) -> Iterator[re.Match[AnyStr]]:
+        return self._compile().finditer(*args, **kwargs)
+
+    def split(self, *args: Any, **kwargs: Any) -> list[Any]:
+        return self._compile().split(*args, **kwargs)
+
+    def sub(self, *args: Any, **kwargs: Any) -> AnyStr:
+        return self._compile().sub(*args, **kwargs)
+
+    def subn(self, *args: Any, **kwargs: Any) -> tuple[AnyStr, int]:
+        return self._compile().subn(*args, **kwargs)
+
+    @property
+    def pattern(self) -> AnyStr:
+        return self._pattern
+
+    @property
+    def flags(self) -> int:
+        return self._compile().flags
+
+    @property
+    def groups(self) -> int:
+        return self._compile().groups
+
+    @property
+    def groupindex(self) -> Mapping[str, int]:
+        return self._compile().groupindex
+
+    def __reduce__(self) -> tuple:
+        return (re.compile, (self._pattern, self._flags))
+
+    def __repr__(self) -> str:
+        return repr(self._compile())
+
+
+def _compile(pattern: AnyStr, flags: int = 0) -> _LazyPattern[AnyStr]:
+    """Return the pattern, compiled when first used."""
+    return _LazyPattern(pattern, flags)
 
 
 # the filename may be empty (e.g. difflib.unified_diff output without
 # fromfile/tofile emits bare "--- " and "+++ " headers)
-RE_SOURCE_FILENAME = re.compile(
+RE_SOURCE_FILENAME = _compile(
     r'^--- (?P<filename>"?[^\t\n]*"?)(?:\t(?P<timestamp>[^\n]+))?')
-RE_TARGET_FILENAME = re.compile(
+RE_TARGET_FILENAME = _compile(
     r'^\+\+\+ (?P<filename>"?[^\t\n]*"?)(?:\t(?P<timestamp>[^\n]+))?')
 
 
 # check diff git line for git renamed files support
-RE_DIFF_GIT_HEADER = re.compile(
+RE_DIFF_GIT_HEADER = _compile(
     r'^diff --git (?P<source>"?a/[^\t\n]+"?) (?P<target>"?b/[^\t\n]+"?)')
-RE_DIFF_GIT_HEADER_URI_LIKE = re.compile(
+RE_DIFF_GIT_HEADER_URI_LIKE = _compile(
     r'^diff --git (?P<source>.*://[^\t\n]+) (?P<target>.*://[^\t\n]+)')
-RE_DIFF_GIT_HEADER_NO_PREFIX = re.compile(
+RE_DIFF_GIT_HEADER_NO_PREFIX = _compile(
     r'^diff --git (?P<source>[^\t\n]+) (?P<target>[^\t\n]+)')
 
 # check diff git deleted file marker `deleted file mode 100644`
-RE_DIFF_GIT_DELETED_FILE = re.compile(r'^deleted file mode (?P<mode>\d+)$')
+RE_DIFF_GIT_DELETED_FILE = _compile(r'^deleted file mode (?P<mode>\d+)$')
 
 # check diff git new file marker `new file mode 100644`
-RE_DIFF_GIT_NEW_FILE = re.compile(r'^new file mode (?P<mode>\d+)$')
+RE_DIFF_GIT_NEW_FILE = _compile(r'^new file mode (?P<mode>\d+)$')
 
 # check diff git file mode change markers `old mode 100644` / `new mode 100755`
-RE_DIFF_GIT_OLD_MODE = re.compile(r'^old mode (?P<mode>\d+)$')
-RE_DIFF_GIT_NEW_MODE = re.compile(r'^new mode (?P<mode>\d+)$')
+RE_DIFF_GIT_OLD_MODE = _compile(r'^old mode (?P<mode>\d+)$')
+RE_DIFF_GIT_NEW_MODE = _compile(r'^new mode (?P<mode>\d+)$')
 
 # check diff git index line with a trailing mode `index abc..def 100644`
-RE_DIFF_GIT_INDEX = re.compile(
+RE_DIFF_GIT_INDEX = _compile(
     r'^index [0-9a-f]+\.\.[0-9a-f]+ (?P<mode>\d+)$')
 
 
 # @@ (source offset, length) (target offset, length) @@ (section header)
-RE_HUNK_HEADER = re.compile(
+RE_HUNK_HEADER = _compile(
     r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))?\ @@[ ]?(.*)")
 
 #    kept line (context)
@@ -67,14 +172,14 @@ RE_HUNK_HEADER = re.compile(
 # +  added line
 # -  deleted line
 # \  No newline case
-RE_HUNK_BODY_LINE = re.compile(
+RE_HUNK_BODY_LINE = _compile(
     r'^(?P<line_type>[- \+\\])(?P<value>.*)', re.DOTALL)
-RE_HUNK_EMPTY_BODY_LINE = re.compile(
+RE_HUNK_EMPTY_BODY_LINE = _compile(
     r'^(?P<line_type>[- \+\\]?)(?P<value>[\r\n]{1,2})', re.DOTALL)
 
-RE_NO_NEWLINE_MARKER = re.compile(r'^\\ No newline at end of file')
+RE_NO_NEWLINE_MARKER = _compile(r'^\\ No newline at end of file')
 
-RE_BINARY_DIFF = re.compile(
+RE_BINARY_DIFF = _compile(
     r'^Binary files? '
     r'(?P<source_filename>[^\t]+?)(?:\t(?P<source_timestamp>[\s0-9:\+-]+))?'
     r'(?: and (?P<target_filename>[^\t]+?)(?:\t(?P<target_timestamp>[\s0-9:\+-]+))?)? (differ|has changed)')
@@ -82,18 +187,55 @@ RE_BINARY_DIFF = re.compile(
 # git source/target filename prefixes: the standard "a/" and "b/", plus the
 # mnemonic prefixes used when diff.mnemonicPrefix is set (c/ i/ o/ w/) and the
 # 1/ 2/ pair used by `git diff --no-index`
-RE_PATCH_FILE_PREFIX = re.compile(r'^[abciow12]/')
-
-DEFAULT_ENCODING = 'UTF-8'
-
-DEV_NULL = '/dev/null'
+RE_PATCH_FILE_PREFIX = _compile(r'^[abciow12]/')
+
+
+def _bytes_pattern(pattern: _LazyPattern[str]) -> _LazyPattern[bytes]:
+    """Return a pattern matching the same (ASCII) text in bytes lines."""
+    return _compile(pattern.pattern.encode('ascii'), pattern._flags)
+
+
+# the patterns above for bytes diff lines (see MODE_BYTES)
+RE_SOURCE_FILENAME_BYTES = _bytes_pattern(RE_SOURCE_FILENAME)
+RE_TARGET_FILENAME_BYTES = _bytes_pattern(RE_TARGET_FILENAME)
+RE_DIFF_GIT_HEADER_BYTES = _bytes_pattern(RE_DIFF_GIT_HEADER)
+RE_DIFF_GIT_HEADER_URI_LIKE_BYTES = _bytes_pattern(RE_DIFF_GIT_HEADER_URI_LIKE)
+RE_DIFF_GIT_HEADER_NO_PREFIX_BYTES = _bytes_pattern(
+    RE_DIFF_GIT_HEADER_NO_PREFIX)
+RE_DIFF_GIT_DELETED_FILE_BYTES = _bytes_pattern(RE_DIFF_GIT_DELETED_FILE)
+RE_DIFF_GIT_NEW_FILE_BYTES = _bytes_pattern(RE_DIFF_GIT_NEW_FILE)
+RE_DIFF_GIT_OLD_MODE_BYTES = _bytes_pattern(RE_DIFF_GIT_OLD_MODE)
+RE_DIFF_GIT_NEW_MODE_BYTES = _bytes_pattern(RE_DIFF_GIT_NEW_MODE)
+RE_DIFF_GIT_INDEX_BYTES = _bytes_pattern(RE_DIFF_GIT_INDEX)
+RE_HUNK_HEADER_BYTES = _bytes_pattern(RE_HUNK_HEADER)
+RE_HUNK_BODY_LINE_BYTES = _bytes_pattern(RE_HUNK_BODY_LINE)
+RE_HUNK_EMPTY_BODY_LINE_BYTES = _bytes_pattern(RE_HUNK_EMPTY_BODY_LINE)
+RE_NO_NEWLINE_MARKER_BYTES = _bytes_pattern(RE_NO_NEWLINE_MARKER)
+RE_BINARY_DIFF_BYTES = _bytes_pattern(RE_BINARY_DIFF)
+RE_PATCH_FILE_PREFIX_BYTES = _bytes_pattern(RE_PATCH_FILE_PREFIX)
+
+DEFAULT_ENCODING: Final = 'UTF-8'
+
+DEV_NULL: Final = '/dev/null'
+DEV_NULL_BYTES: Final = b'/dev/null'
 
 # git file mode for a symbolic link
-SYMLINK_FILE_MODE = '120000'
-
-LINE_TYPE_ADDED = '+'
-LINE_TYPE_REMOVED = '-'
-LINE_TYPE_CONTEXT = ' '
-LINE_TYPE_EMPTY = ''
-LINE_TYPE_NO_NEWLINE = '\\'
-LINE_VALUE_NO_NEWLINE = ' No newline at end of file'
+SYMLINK_FILE_MODE: Final = '120000'
+SYMLINK_FILE_MODE_BYTES: Final = b'120000'
+
+LINE_TYPE_ADDED: Final = '+'
+LINE_TYPE_REMOVED: Final = '-'
+LINE_TYPE_CONTEXT: Final = ' '
+LINE_TYPE_EMPTY: Final = ''
+LINE_TYPE_NO_NEWLINE: Final = '\\'
+LINE_VALUE_NO_NEWLINE: Final = ' No newline at end of file'
+
+# hunk lines storage: a list of Line objects, compact columns creating the
+# Line objects on access, or the raw diff lines parsed when first accessed
+STORAGE_LIST: Final = 'list'
+STORAGE_COLUMNAR: Final = 'columnar'
+STORAGE_LAZY: Final = 'lazy'
+
+# diff lines are decoded into text (str), or parsed and kept as bytes
+MODE_TEXT: Final = 'text'
+MODE_BYTES: Final = 'bytes'
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+# Copyright (c) 2014-2023 Matias Bordese
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Parse large git diffs using multiple processes."""
+
+from __future__ import annotations
+
+import io
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Union
+
+from unidiff.constants import (
+    DEFAULT_ENCODING,
+    RE_DIFF_GIT_HEADER,
+    RE_DIFF_GIT_HEADER_NO_PREFIX,
+    RE_DIFF_GIT_HEADER_URI_LIKE,
+    STORAGE_COLUMNAR,
+)
+from unidiff.patch import PatchedFile, PatchSet
+
+
+# smaller chunks are not worth sending to another process
+MIN_CHUNK_SIZE = 1024 * 1024
+# split the diff in a few chunks per process, so the work is evenly spread
+# even if file sizes vary a lot
+CHUNKS_PER_PROCESS = 4
+
+_GIT_HEADER_START = b'\ndiff --git '
+
+_Data = Union[bytes, mmap.mmap]
+
+
+def _is_git_header(data: _Data, start: int, encoding: str,
+                   errors: Optional[str]) -> bool:
+    end = data.find(b'\n', start)
+    line = data[start:end + 1 if end != -1 else len(data)].decode(
+        encoding, errors or 'strict')
+    return bool(RE_DIFF_GIT_HEADER.match(line) or
+                RE_DIFF_GIT_HEADER_URI_LIKE.match(line) or
+                RE_DIFF_GIT_HEADER_NO_PREFIX.match(line))
+
+
+def _split_points(data: _Data, chunk_size: int, encoding: str,
+                  errors: Optional[str]) -> list[int]:
+    # a diff --git header always starts a new file (and resets the parser
+    # state), so the diff can be parsed from there without knowing what came
+    # before; ---/+++ headers are not used since removed lines can look alike
+    size = len(data)
+    points = [0]
+    position = chunk_size
+    while position < size:
+        found = data.find(_GIT_HEADER_START, position - 1)
+        if found == -1:
+            break
+        start = found + 1
+        if not _is_git_header(data, start, encoding, errors):
+            position = start + 1
+            continue
+        points.append(start)
+        position = start + chunk_size
+    points.append(size)
+    return points
+
+
+def _count_lines(data: bytes) -> int:
+    # count lines the way universal newlines mode splits them
+    return data.count(b'\n') + data.count(b'\r') - data.count(b'\r\n')
+
+
+def _parse_chunk(filename: str, start: int, end: int, first_line_no: int,
+                 encoding: str, errors: Optional[str], metadata_only: bool,
+                 storage: str) -> list[PatchedFile]:
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    diff = io.TextIOWrapper(io.BytesIO(data), encoding=encoding, errors=errors)
+    return list(PatchSet._iter_parse(
+        diff, None, metadata_only, storage, first_line_no=first_line_no))
+
+
+def parse(filename: str, processes: Optional[int] = None,
+          encoding: str = DEFAULT_ENCODING, errors: Optional[str] = None,
+          metadata_only: bool = False,
+          storage: str = STORAGE_COLUMNAR) -> PatchSet:
+    """Return a PatchSet instance given a diff filename, using processes.
+
+    The diff is split on `diff --git` headers and the chunks are parsed in
+    a process pool (of `processes` workers, defaulting to the number of
+    CPUs); the result is the same as PatchSet.from_filename. Diffs without
+    git headers, or too small to split, are parsed in the current process.
+    The encoding must be ASCII compatible (like UTF-8 or latin-1).
+
+    Parsed files are sent back to this process, so the columnar storage is
+    used by default: its hunks are sent as a few arrays, while with the
+    list storage every Line has to be recreated here, which takes about as
+    long as parsing it.
+
+    """
+    PatchSet._check_storage(storage)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if processes == 1:
+        return PatchSet.from_filename(filename, encoding=encoding,
+                                      errors=errors,
+                                      metadata_only=metadata_only,
+                                      storage=storage)
+
+    with open(filename, 'rb') as f:
+        try:
+            data: _Data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files cannot be mapped
+            data = b''
+    try:
+        chunk_size = max(len(data) // (processes * CHUNKS_PER_PROCESS),
+                         MIN_CHUNK_SIZE)
+        points = _split_points(data, chunk_size, encoding, errors)
+        # diff line numbers are global, so count the lines before each chunk
+        first_line_nos = [1]
+        for start, end in zip(points[:-2], points[1:-1]):
+            first_line_nos.append(
+                first_line_nos[-1] + _count_lines(data[start:end]))
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+    if len(points) <= 2:
+        return PatchSet.from_filename(filename, encoding=encoding,
+                                      errors=errors,
+                                      metadata_only=metadata_only,
+                                      storage=storage)
+
+    count = len(points) - 1
+    patch = PatchSet([])
+    with ProcessPoolExecutor(max_workers=min(processes, count)) as executor:
+        for patched_files in executor.map(
+                _parse_chunk, [filename] * count, points[:-1], points[1:],
+                first_line_nos, [encoding] * count, [errors] * count,
+                [metadata_only] * count, [storage] * count):
+            patch.extend(patched_files)
+    return patch
@@ -26,47 +26,200 @@
 
 from __future__ import annotations
 
+import codecs
+import copyreg
+import io
+import mmap
+import os
+import pickle
+import sys
+from array import array
+from bisect import bisect_left
+from collections import deque
+from functools import partial
 from io import StringIO
-from typing import Iterable, Iterator, Optional, Union
+from time import perf_counter
+from types import MappingProxyType, ModuleType
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Iterator,
+    Mapping,
+    NamedTuple,
+    NoReturn,
+    Optional,
+    SupportsIndex,
+    Union,
+)
 
 from unidiff.constants import (
     DEFAULT_ENCODING,
     DEV_NULL,
+    DEV_NULL_BYTES,
     LINE_TYPE_ADDED,
     LINE_TYPE_CONTEXT,
     LINE_TYPE_EMPTY,
     LINE_TYPE_REMOVED,
     LINE_TYPE_NO_NEWLINE,
     LINE_VALUE_NO_NEWLINE,
+    MODE_BYTES,
+    MODE_TEXT,
     RE_DIFF_GIT_DELETED_FILE,
+    RE_DIFF_GIT_DELETED_FILE_BYTES,
     RE_DIFF_GIT_HEADER,
+    RE_DIFF_GIT_HEADER_BYTES,
     RE_DIFF_GIT_HEADER_URI_LIKE,
+    RE_DIFF_GIT_HEADER_URI_LIKE_BYTES,
     RE_DIFF_GIT_HEADER_NO_PREFIX,
+    RE_DIFF_GIT_HEADER_NO_PREFIX_BYTES,
     RE_DIFF_GIT_INDEX,
+    RE_DIFF_GIT_INDEX_BYTES,
     RE_DIFF_GIT_NEW_FILE,
+    RE_DIFF_GIT_NEW_FILE_BYTES,
     RE_DIFF_GIT_NEW_MODE,
+    RE_DIFF_GIT_NEW_MODE_BYTES,
     RE_DIFF_GIT_OLD_MODE,
-    RE_HUNK_BODY_LINE,
+    RE_DIFF_GIT_OLD_MODE_BYTES,
     RE_HUNK_EMPTY_BODY_LINE,
+    RE_HUNK_EMPTY_BODY_LINE_BYTES,
     RE_HUNK_HEADER,
+    RE_HUNK_HEADER_BYTES,
     RE_SOURCE_FILENAME,
+    RE_SOURCE_FILENAME_BYTES,
     RE_TARGET_FILENAME,
+    RE_TARGET_FILENAME_BYTES,
     RE_NO_NEWLINE_MARKER,
+    RE_NO_NEWLINE_MARKER_BYTES,
     RE_BINARY_DIFF,
+    RE_BINARY_DIFF_BYTES,
     RE_PATCH_FILE_PREFIX,
+    RE_PATCH_FILE_PREFIX_BYTES,
+    STORAGE_COLUMNAR,
+    STORAGE_LAZY,
+    STORAGE_LIST,
     SYMLINK_FILE_MODE,
+    SYMLINK_FILE_MODE_BYTES,
+    _LazyPattern,
+    mypyc_attr,
 )
 from unidiff.errors import UnidiffParseError
 
-
+# the optional C implementation of the hunk parsing loop, unless
+# UNIDIFF_PURE_PYTHON is set (see unidiff/_speedups.c)
+_speedups: Optional[ModuleType]
+if os.environ.get('UNIDIFF_PURE_PYTHON'):
+    _speedups = None
+else:
+    try:
+        from unidiff import _speedups
+    except ImportError:
+        _speedups = None
+
+if TYPE_CHECKING:
+    from unidiff.cache import ParseCache
+    from unidiff.stats import ParseStats
+
+
+# bytes-like objects the diff data can be read from without copying
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+# marks a missing line number in the integer columns of a ColumnarHunk
+_NO_LINE_NO = -1
+
+# sorted line numbers, and the positions of the lines in their hunk
+_LineIndex = tuple[array, array]
+
+# characters joined into each write by write_to
+_WRITE_BUFFER_SIZE = 64 * 1024
+
+# data parsed by aparse before letting other tasks run
+_ASYNC_CHUNK_SIZE = 64 * 1024
+
+# PatchSet.dumps data header; the version changes with the layout below
+_DUMPS_FORMAT = b'unidiff'
+_DUMPS_VERSION = 1
+
+# sizes of the dumps line number and value offset columns items
+_INT_SIZE = array('i').itemsize
+_OFFSET_SIZE = array('q').itemsize
+
+# line type codes, as found in the raw diff data and the ColumnarHunk columns
+_ADDED = ord(LINE_TYPE_ADDED)
+_REMOVED = ord(LINE_TYPE_REMOVED)
+_CONTEXT = ord(LINE_TYPE_CONTEXT)
+_NO_NEWLINE = ord(LINE_TYPE_NO_NEWLINE)
+_NEWLINE = ord('\n')
+_NO_NEWLINE_MARKER = (
+    LINE_TYPE_NO_NEWLINE + LINE_VALUE_NO_NEWLINE + '\n').encode('ascii')
+
+# line types by their first byte, and back, for bytes diff lines
+_BYTE_CHARS = {bytes([code]): chr(code) for code in range(256)}
+_LINE_TYPE_BYTES = {
+    line_type: line_type.encode('ascii')
+    for line_type in (LINE_TYPE_ADDED, LINE_TYPE_REMOVED, LINE_TYPE_CONTEXT,
+                      LINE_TYPE_EMPTY, LINE_TYPE_NO_NEWLINE)}
+
+# the /dev/null file name, as text or bytes
+_DEV_NULLS = (DEV_NULL, DEV_NULL_BYTES)
+
+
+class _Syntax(NamedTuple):
+    """Header patterns and literals for parsing text or bytes diff lines."""
+
+    line_class: type
+    diff_git_header: _LazyPattern
+    diff_git_header_uri_like: _LazyPattern
+    diff_git_header_no_prefix: _LazyPattern
+    diff_git_deleted_file: _LazyPattern
+    diff_git_new_file: _LazyPattern
+    diff_git_new_mode: _LazyPattern
+    diff_git_old_mode: _LazyPattern
+    diff_git_index: _LazyPattern
+    source_filename: _LazyPattern
+    target_filename: _LazyPattern
+    hunk_header: _LazyPattern
+    no_newline_marker: _LazyPattern
+    binary_diff: _LazyPattern
+    dev_null: Any
+    newline: Any
+    git_binary_patch: Any
+    no_newline_value: Any
+
+
+_TEXT_SYNTAX = _Syntax(
+    str, RE_DIFF_GIT_HEADER, RE_DIFF_GIT_HEADER_URI_LIKE,
+    RE_DIFF_GIT_HEADER_NO_PREFIX, RE_DIFF_GIT_DELETED_FILE,
+    RE_DIFF_GIT_NEW_FILE, RE_DIFF_GIT_NEW_MODE, RE_DIFF_GIT_OLD_MODE,
+    RE_DIFF_GIT_INDEX, RE_SOURCE_FILENAME, RE_TARGET_FILENAME, RE_HUNK_HEADER,
+    RE_NO_NEWLINE_MARKER, RE_BINARY_DIFF, DEV_NULL, '\n',
+    'GIT binary patch\n', LINE_VALUE_NO_NEWLINE + '\n')
+_BYTES_SYNTAX = _Syntax(
+    bytes, RE_DIFF_GIT_HEADER_BYTES, RE_DIFF_GIT_HEADER_URI_LIKE_BYTES,
+    RE_DIFF_GIT_HEADER_NO_PREFIX_BYTES, RE_DIFF_GIT_DELETED_FILE_BYTES,
+    RE_DIFF_GIT_NEW_FILE_BYTES, RE_DIFF_GIT_NEW_MODE_BYTES,
+    RE_DIFF_GIT_OLD_MODE_BYTES, RE_DIFF_GIT_INDEX_BYTES,
+    RE_SOURCE_FILENAME_BYTES, RE_TARGET_FILENAME_BYTES, RE_HUNK_HEADER_BYTES,
+    RE_NO_NEWLINE_MARKER_BYTES, RE_BINARY_DIFF_BYTES, DEV_NULL_BYTES, b'\n',
+    b'GIT binary patch\n', (LINE_VALUE_NO_NEWLINE + '\n').encode('ascii'))
+
+
+@mypyc_attr(allow_interpreted_subclasses=True, acyclic=True)
 class Line(object):
     """A diff line."""
 
-    def __init__(self, value: str, line_type: str,
+    # diffs can have millions of lines, avoid a per-instance __dict__
+    __slots__ = ('source_line_no', 'target_line_no', 'diff_line_no',
+                 'line_type', 'value')
+
+    # the value is bytes for lines parsed in bytes mode (and so is typed as
+    # Any, which a mypyc build checks)
+    def __init__(self, value: Any, line_type: str,
                  source_line_no: Optional[int] = None,
                  target_line_no: Optional[int] = None,
                  diff_line_no: Optional[int] = None) -> None:
-        super(Line, self).__init__()
         self.source_line_no = source_line_no
         self.target_line_no = target_line_no
         self.diff_line_no = diff_line_no
@@ -76,8 +229,22 @@ class Line(object):
     def __repr__(self) -> str:
         return "<Line: %s%s>" % (self.line_type, self.value)
 
+    def __reduce__(self) -> tuple:
+        # a plain constructor call, smaller and faster than the slots state
+        return (self.__class__, (self.value, self.line_type,
+                                 self.source_line_no, self.target_line_no,
+                                 self.diff_line_no))
+
     def __str__(self) -> str:
-        return "%s%s" % (self.line_type, self.value)
+        value = self.value
+        if isinstance(value, bytes):
+            # for lines parsed in bytes mode
+            value = value.decode('utf-8', 'surrogateescape')
+        return "%s%s" % (self.line_type, value)
+
+    def __bytes__(self) -> bytes:
+        # for lines parsed in bytes mode
+        return _LINE_TYPE_BYTES[self.line_type] + self.value
 
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, Line):
@@ -101,6 +268,41 @@ class Line(object):
         return self.line_type == LINE_TYPE_CONTEXT
 
 
+def _join_text(chunks: Iterable[Any]) -> str:
+    """Return the chunks joined as text.
+
+    Bytes chunks (in bytes mode) are decoded as UTF-8, with the undecodable
+    bytes escaped as surrogates, so encoding the text back the same way
+    gives the original bytes.
+
+    """
+    chunk_list = list(chunks)
+    if chunk_list and isinstance(chunk_list[0], bytes):
+        return b''.join(chunk_list).decode('utf-8', 'surrogateescape')
+    return ''.join(chunk_list)
+
+
+def _write_chunks(fp: Any, chunks: Iterable[Any]) -> None:
+    """Write the chunks to the file, joining the small ones.
+
+    The chunks are all text, or all bytes (in bytes mode), and the file is
+    a text or binary file accordingly.
+
+    """
+    batch: list[Any] = []
+    size = 0
+    for chunk in chunks:
+        batch.append(chunk)
+        size += len(chunk)
+        if size >= _WRITE_BUFFER_SIZE:
+            fp.write(chunk[:0].join(batch))
+            batch = []
+            size = 0
+    if batch:
+        fp.write(batch[0][:0].join(batch))
+
+
+@mypyc_attr(native_class=False)
 class PatchInfo(list[str]):
     """Lines with extended patch info.
 
@@ -114,17 +316,30 @@ class PatchInfo(list[str]):
         return value
 
     def __str__(self) -> str:
-        return ''.join(str(line) for line in self)
+        return _join_text(self.iter_chunks())
+
+    def __bytes__(self) -> bytes:
+        # for patch info parsed in bytes mode
+        return b''.join(self.iter_chunks())  # type: ignore[arg-type]
 
+    def iter_chunks(self) -> Iterator[str]:
+        """Return an iterator over the patch info text, in chunks."""
+        return iter(self)
 
+    def write_to(self, fp: Any) -> None:
+        """Write the patch info text to the given text file."""
+        _write_chunks(fp, self.iter_chunks())
+
+
+@mypyc_attr(native_class=False)
 class Hunk(list[Line]):
     """Each of the modified blocks of a file."""
 
-    def __init__(self, src_start: Union[str, int] = 0,
-                 src_len: Optional[Union[str, int]] = 0,
-                 tgt_start: Union[str, int] = 0,
-                 tgt_len: Optional[Union[str, int]] = 0,
-                 section_header: str = '') -> None:
+    def __init__(self, src_start: Union[str, bytes, int] = 0,
+                 src_len: Optional[Union[str, bytes, int]] = 0,
+                 tgt_start: Union[str, bytes, int] = 0,
+                 tgt_len: Optional[Union[str, bytes, int]] = 0,
+                 section_header: Any = '') -> None:
         super(Hunk, self).__init__()
         if src_len is None:
             src_len = 1
@@ -135,8 +350,12 @@ class Hunk(list[Line]):
         self.target_start = int(tgt_start)
         self.target_length = int(tgt_len)
         self.section_header = section_header
-        self._added: Optional[int] = None
-        self._removed: Optional[int] = None
+        # line counts are kept up to date on append, and recalculated (once)
+        # after any other change to the hunk lines
+        self._added: Optional[int] = 0
+        self._removed: Optional[int] = 0
+        # source and target line numbers and positions, see _get_line_index
+        self._line_index: Optional[tuple[int, _LineIndex, _LineIndex]] = None
 
     def __repr__(self) -> str:
         value = "<Hunk: @@ %d,%d %d,%d @@ %s>" % (self.source_start,
@@ -147,13 +366,44 @@ class Hunk(list[Line]):
         return value
 
     def __str__(self) -> str:
+        return _join_text(self.iter_chunks())
+
+    def _header_str(self) -> str:
         # section header is optional and thus we output it only if it's present
-        head = "@@ -%d,%d +%d,%d @@%s\n" % (
+        return "@@ -%d,%d +%d,%d @@%s\n" % (
             self.source_start, self.source_length,
             self.target_start, self.target_length,
             ' ' + self.section_header if self.section_header else '')
-        content = ''.join(str(line) for line in self)
-        return head + content
+
+    def __bytes__(self) -> bytes:
+        # for hunks parsed in bytes mode
+        return b''.join(self.iter_chunks())
+
+    def _header_bytes(self) -> bytes:
+        return b"@@ -%d,%d +%d,%d @@%s\n" % (
+            self.source_start, self.source_length,
+            self.target_start, self.target_length,
+            b' ' + self.section_header if self.section_header else b'')
+
+    def iter_chunks(self) -> Iterator[Any]:
+        """Return an iterator over the hunk diff text, in chunks.
+
+        The header and the lines are returned as a single chunk, so the
+        chunks are bounded by the hunk size. Hunks parsed in bytes mode
+        return bytes.
+
+        """
+        if isinstance(self.section_header, bytes):
+            yield self._header_bytes() + b''.join(
+                [_LINE_TYPE_BYTES[line.line_type] + line.value
+                 for line in self])
+            return
+        yield self._header_str() + ''.join(
+            [line.line_type + line.value for line in self])
+
+    def write_to(self, fp: Any) -> None:
+        """Write the hunk diff text to the given text file."""
+        _write_chunks(fp, self.iter_chunks())
 
     def append(self, line: Line) -> None:
         """Append the line to hunk, and keep track of source/target lines."""
@@ -161,22 +411,160 @@ class Hunk(list[Line]):
         # potentially raising a UnicodeDecodeError.
         str(line)
         super(Hunk, self).append(line)
+        if self._added is not None and self._removed is not None:
+            if line.line_type == LINE_TYPE_ADDED:
+                self._added += 1
+            elif line.line_type == LINE_TYPE_REMOVED:
+                self._removed += 1
+
+    # append a line without checking it or updating the line counts; used by
+    # the parser, which decodes the lines itself and sets the counts once the
+    # hunk is complete (plain hunks only)
+    _append_unchecked = list.append
+
+    def _reset_caches(self) -> None:
+        self._added = self._removed = None
+        self._line_index = None
+
+    def _set_line_counts(self, added: int, removed: int) -> None:
+        """Set the line counts, as counted by the parser."""
+        self._added = added
+        self._removed = removed
+
+    def _count_lines(self) -> tuple[int, int]:
+        """Return the number of added and removed lines."""
+        added = removed = 0
+        for line in self:
+            if line.line_type == LINE_TYPE_ADDED:
+                added += 1
+            elif line.line_type == LINE_TYPE_REMOVED:
+                removed += 1
+        return added, removed
 
     @property
     def added(self) -> int:
-        if self._added is not None:
-            return self._added
-        # re-calculate each time to allow for hunk modifications
-        # (which should mean metadata_only switch wasn't used)
-        return sum(1 for line in self if line.is_added)
+        if self._added is None or self._removed is None:
+            self._added, self._removed = self._count_lines()
+        return self._added
 
     @property
     def removed(self) -> int:
-        if self._removed is not None:
-            return self._removed
-        # re-calculate each time to allow for hunk modifications
-        # (which should mean metadata_only switch wasn't used)
-        return sum(1 for line in self if line.is_removed)
+        if self._added is None or self._removed is None:
+            self._added, self._removed = self._count_lines()
+        return self._removed
+
+    def __reduce__(self) -> tuple:
+        # restore the lines and the counts as they are, without appending;
+        # the line index is left out, it is rebuilt when needed
+        attrs = dict(self.__dict__)
+        attrs['_line_index'] = None
+        return (copyreg.__newobj__,  # type: ignore[attr-defined]
+                (self.__class__,), (attrs, list(self)))
+
+    def __setstate__(self, state: tuple[dict, list[Line]]) -> None:
+        attrs, lines = state
+        self.__dict__.update(attrs)
+        super(Hunk, self).extend(lines)
+
+    def __setitem__(self, index, value):
+        self._reset_caches()
+        super(Hunk, self).__setitem__(index, value)
+
+    def __delitem__(self, index: Union[SupportsIndex, slice]) -> None:
+        self._reset_caches()
+        super(Hunk, self).__delitem__(index)
+
+    def __iadd__(self, lines: Iterable[Line]) -> Hunk:  # type: ignore[override,misc]
+        self._reset_caches()
+        return super(Hunk, self).__iadd__(lines)
+
+    def __imul__(self, count: SupportsIndex) -> Hunk:
+        self._reset_caches()
+        return super(Hunk, self).__imul__(count)
+
+    def extend(self, lines: Iterable[Line]) -> None:
+        self._reset_caches()
+        super(Hunk, self).extend(lines)
+
+    def insert(self, index: SupportsIndex, line: Line) -> None:
+        self._reset_caches()
+        super(Hunk, self).insert(index, line)
+
+    def pop(self, index: SupportsIndex = -1) -> Line:
+        self._reset_caches()
+        return super(Hunk, self).pop(index)
+
+    def remove(self, line: Line) -> None:
+        self._reset_caches()
+        super(Hunk, self).remove(line)
+
+    def clear(self) -> None:
+        self._reset_caches()
+        super(Hunk, self).clear()
+
+    def sort(self, *args, **kwargs) -> None:
+        self._reset_caches()
+        super(Hunk, self).sort(*args, **kwargs)
+
+    def reverse(self) -> None:
+        self._reset_caches()
+        super(Hunk, self).reverse()
+
+    def _get_columns(self) -> tuple[bytearray, array, array, array, array, str]:
+        """Return the hunk lines as ColumnarHunk columns and text buffer."""
+        line_types = bytearray()
+        source_line_nos = array('i')
+        target_line_nos = array('i')
+        diff_line_nos = array('i')
+        value_offsets = array('q')
+        values = []
+        length = 0
+        for line in self:
+            line_types.append(ord(line.line_type) if line.line_type else 0)
+            source_line_nos.append(_NO_LINE_NO if line.source_line_no is None
+                                   else line.source_line_no)
+            target_line_nos.append(_NO_LINE_NO if line.target_line_no is None
+                                   else line.target_line_no)
+            diff_line_nos.append(_NO_LINE_NO if line.diff_line_no is None
+                                 else line.diff_line_no)
+            values.append(line.value)
+            value_offsets.append(length)
+            length += len(line.value)
+            value_offsets.append(length)
+        return (line_types, source_line_nos, target_line_nos, diff_line_nos,
+                value_offsets, ''.join(values))
+
+    def _build_line_index(self) -> tuple[_LineIndex, _LineIndex]:
+        source: _LineIndex = (array('i'), array('i'))
+        target: _LineIndex = (array('i'), array('i'))
+        for position, line in enumerate(self):
+            if line.source_line_no is not None:
+                source[0].append(line.source_line_no)
+                source[1].append(position)
+            if line.target_line_no is not None:
+                target[0].append(line.target_line_no)
+                target[1].append(position)
+        return source, target
+
+    def _get_line_index(self, source: bool) -> _LineIndex:
+        """Return the source or target line numbers and their positions.
+
+        Line numbers are increasing (as in a parsed hunk), so lines can be
+        looked up by number using a binary search.
+
+        """
+        # appending lines only makes the index shorter than the hunk, any
+        # other change resets it
+        if self._line_index is None or self._line_index[0] != len(self):
+            self._line_index = (len(self),) + self._build_line_index()
+        return self._line_index[1] if source else self._line_index[2]
+
+    def _lines_between(self, source: bool, start: int,
+                       stop: int) -> list[Line]:
+        """Return the lines with a source/target number in [start, stop)."""
+        line_nos, positions = self._get_line_index(source)
+        return [self[positions[i]] for i in range(
+            bisect_left(line_nos, start), bisect_left(line_nos, stop))]
 
     def is_valid(self) -> bool:
         """Check hunk header data matches entered lines info."""
@@ -185,7 +573,9 @@ class Hunk(list[Line]):
 
     def source_lines(self) -> Iterator[Line]:
         """Hunk lines from source file (generator)."""
-        return (l for l in self if l.is_context or l.is_removed)
+        for l in self:
+            if l.is_context or l.is_removed:
+                yield l
 
     @property
     def source(self) -> list[str]:
@@ -193,23 +583,754 @@ class Hunk(list[Line]):
 
     def target_lines(self) -> Iterator[Line]:
         """Hunk lines from target file (generator)."""
-        return (l for l in self if l.is_context or l.is_added)
+        for l in self:
+            if l.is_context or l.is_added:
+                yield l
 
     @property
     def target(self) -> list[str]:
         return [str(l) for l in self.target_lines()]
 
 
+@mypyc_attr(native_class=False)
+class ColumnarHunk(Hunk):
+    """A hunk keeping its lines in compact columns.
+
+    Line types are kept in a bytearray, line numbers in integer arrays and
+    line values as offsets into a single text buffer; Line objects are only
+    created when accessed. List operations other than appending lines turn
+    the hunk into a regular one (ie. the lines are created and kept).
+
+    """
+
+    def __init__(self, src_start: Union[str, int] = 0,
+                 src_len: Optional[Union[str, int]] = 0,
+                 tgt_start: Union[str, int] = 0,
+                 tgt_len: Optional[Union[str, int]] = 0,
+                 section_header: str = '', *,
+                 buffer: Optional[Buffer] = None,
+                 encoding: str = DEFAULT_ENCODING,
+                 errors: str = 'strict') -> None:
+        super(ColumnarHunk, self).__init__(
+            src_start, src_len, tgt_start, tgt_len, section_header)
+        # None once the lines have been materialized into the list itself
+        self._line_types: Optional[bytearray] = bytearray()
+        self._source_line_nos = array('i')
+        self._target_line_nos = array('i')
+        self._diff_line_nos = array('i')
+        # value i is self._text[offsets[2 * i]:offsets[2 * i + 1]], or the
+        # same span of the raw diff data when reading from a buffer (decoded
+        # when the line is accessed)
+        self._value_offsets = array('q')
+        self._buffer = buffer
+        self._encoding = encoding
+        self._errors = errors
+        self._text = ''
+        # values appended since the text buffer was last joined
+        self._pending_values: list[str] = []
+        self._text_length = 0
+
+    def _append_value(self, value: str, line_type: str,
+                      source_line_no: Optional[int] = None,
+                      target_line_no: Optional[int] = None,
+                      diff_line_no: Optional[int] = None) -> None:
+        """Append a line given its details, without creating a Line."""
+        if self._line_types is None:
+            super(ColumnarHunk, self).append(
+                Line(value, line_type, source_line_no, target_line_no,
+                     diff_line_no))
+            return
+        if self._buffer is not None:
+            self._detach_buffer()
+        # counting the line types column again is cheap
+        self._reset_caches()
+        self._line_types.append(ord(line_type) if line_type else 0)
+        self._source_line_nos.append(
+            _NO_LINE_NO if source_line_no is None else source_line_no)
+        self._target_line_nos.append(
+            _NO_LINE_NO if target_line_no is None else target_line_no)
+        self._diff_line_nos.append(
+            _NO_LINE_NO if diff_line_no is None else diff_line_no)
+        start = self._text_length
+        self._text_length += len(value)
+        self._value_offsets.append(start)
+        self._value_offsets.append(self._text_length)
+        self._pending_values.append(value)
+
+    def _append_span(self, line_type: int, start: int, end: int,
+                     source_line_no: int, target_line_no: int,
+                     diff_line_no: int) -> None:
+        """Append a line given its type code and span in the buffer."""
+        self._line_types.append(line_type)  # type: ignore[union-attr]
+        self._source_line_nos.append(source_line_no)
+        self._target_line_nos.append(target_line_no)
+        self._diff_line_nos.append(diff_line_no)
+        self._value_offsets.append(start)
+        self._value_offsets.append(end)
+
+    def _decode_values(self) -> tuple[str, array]:
+        """Return a text buffer and value offsets for the buffer values."""
+        values = [self._get_value(i, '')
+                  for i in range(len(self._line_types))]  # type: ignore[arg-type]
+        offsets = array('q')
+        length = 0
+        for value in values:
+            offsets.append(length)
+            length += len(value)
+            offsets.append(length)
+        return ''.join(values), offsets
+
+    def _detach_buffer(self) -> None:
+        """Decode the values read from the buffer into the text buffer."""
+        self._text, self._value_offsets = self._decode_values()
+        self._text_length = len(self._text)
+        self._buffer = None
+
+    def _get_text(self) -> str:
+        """Return the text buffer, joining any pending values into it."""
+        if self._pending_values:
+            self._text += ''.join(self._pending_values)
+            self._pending_values = []
+        return self._text
+
+    def _get_value(self, index: int, text: str) -> str:
+        start = self._value_offsets[2 * index]
+        end = self._value_offsets[2 * index + 1]
+        if self._buffer is not None:
+            return str(self._buffer[start:end], self._encoding, self._errors)
+        return text[start:end]
+
+    def _get_line(self, index: int, text: str) -> Line:
+        line_type = self._line_types[index]  # type: ignore[index]
+        source_line_no = self._source_line_nos[index]
+        target_line_no = self._target_line_nos[index]
+        diff_line_no = self._diff_line_nos[index]
+        return Line(
+            self._get_value(index, text),
+            chr(line_type) if line_type else LINE_TYPE_EMPTY,
+            None if source_line_no == _NO_LINE_NO else source_line_no,
+            None if target_line_no == _NO_LINE_NO else target_line_no,
+            None if diff_line_no == _NO_LINE_NO else diff_line_no)
+
+    def _get_lines(self, indexes: Iterable[int]) -> Iterator[Line]:
+        text = self._get_text()
+        for index in indexes:
+            yield self._get_line(index, text)
+
+    def _iter_lines(self) -> Iterator[Line]:
+        """Return an iterator over all the lines, in order."""
+        if self._buffer is not None:
+            return self._get_lines(range(len(self._line_types)))  # type: ignore[arg-type]
+        # zipping the columns is much faster than looking up each line
+        text = self._get_text()
+        offsets = self._value_offsets
+        return self._zipped_lines(text, zip(
+            self._line_types,  # type: ignore[arg-type]
+            self._source_line_nos, self._target_line_nos,
+            self._diff_line_nos, offsets[0::2], offsets[1::2]))
+
+    @staticmethod
+    def _zipped_lines(text: str, columns: Iterator[tuple[
+            int, int, int, int, int, int]]) -> Iterator[Line]:
+        for (line_type, source_line_no, target_line_no, diff_line_no,
+             start, end) in columns:
+            yield Line(
+                text[start:end],
+                chr(line_type) if line_type else LINE_TYPE_EMPTY,
+                None if source_line_no == _NO_LINE_NO else source_line_no,
+                None if target_line_no == _NO_LINE_NO else target_line_no,
+                None if diff_line_no == _NO_LINE_NO else diff_line_no)
+
+    def iter_chunks(self) -> Iterator[str]:
+        if self._line_types is None:
+            yield from super(ColumnarHunk, self).iter_chunks()
+            return
+        if self._buffer is not None:
+            yield self._header_str() + ''.join([
+                self._get_line_str(index, '')
+                for index in range(len(self._line_types))])
+            return
+        # the columns are read directly, no Line is created
+        text = self._get_text()
+        offsets = self._value_offsets
+        yield self._header_str() + ''.join([
+            chr(line_type) + text[start:end] if line_type else text[start:end]
+            for line_type, start, end in zip(iter(self._line_types), offsets[0::2],
+                                             offsets[1::2])])
+
+    def _get_line_str(self, index: int, text: str) -> str:
+        line_type = self._line_types[index]  # type: ignore[index]
+        value = self._get_value(index, text)
+        return chr(line_type) + value if line_type else value
+
+    def _materialize(self) -> None:
+        """Create the Line objects and keep them as a regular Hunk."""
+        if self._line_types is None:
+            return
+        lines = list(self)
+        counts = self._added, self._removed
+        self._line_types = None
+        self._source_line_nos = array('i')
+        self._target_line_nos = array('i')
+        self._diff_line_nos = array('i')
+        self._value_offsets = array('q')
+        self._buffer = None
+        self._text = ''
+        self._pending_values = []
+        self._text_length = 0
+        super(ColumnarHunk, self).extend(lines)
+        # the lines did not change
+        self._added, self._removed = counts
+
+    @classmethod
+    def _from_columns(cls, src_start: int, src_len: int, tgt_start: int,
+                      tgt_len: int, section_header: str,
+                      line_types: bytearray, source_line_nos: array,
+                      target_line_nos: array, diff_line_nos: array,
+                      value_offsets: array, text: str) -> ColumnarHunk:
+        """Return a hunk given its columns, as returned by _get_columns."""
+        hunk = cls(src_start, src_len, tgt_start, tgt_len, section_header)
+        hunk._line_types = line_types
+        hunk._source_line_nos = source_line_nos
+        hunk._target_line_nos = target_line_nos
+        hunk._diff_line_nos = diff_line_nos
+        hunk._value_offsets = value_offsets
+        hunk._text = text
+        hunk._text_length = len(text)
+        hunk._set_line_counts(*hunk._count_lines())
+        return hunk
+
+    def _get_columns(self) -> tuple[bytearray, array, array, array, array, str]:
+        if self._line_types is None:
+            return super(ColumnarHunk, self)._get_columns()
+        # the columns are copied, so they are not shared with the result
+        if self._buffer is not None:
+            # the buffer itself is not kept, only the decoded values
+            text, value_offsets = self._decode_values()
+        else:
+            text, value_offsets = self._get_text(), self._value_offsets[:]
+        return (self._line_types[:], self._source_line_nos[:],
+                self._target_line_nos[:], self._diff_line_nos[:],
+                value_offsets, text)
+
+    def __reduce__(self) -> tuple:
+        if self._line_types is None:
+            return super(ColumnarHunk, self).__reduce__()
+
+        # keep the columns, which pickle much faster than lines
+        state = dict(self.__dict__)
+        (state['_line_types'], state['_source_line_nos'],
+         state['_target_line_nos'], state['_diff_line_nos'],
+         state['_value_offsets'], state['_text']) = self._get_columns()
+        state['_buffer'] = None
+        state['_pending_values'] = []
+        state['_text_length'] = len(state['_text'])
+        state['_line_index'] = None
+        return (copyreg.__newobj__,  # type: ignore[attr-defined]
+                (self.__class__,), (state, []))
+
+    def __len__(self) -> int:
+        if self._line_types is None:
+            return super(ColumnarHunk, self).__len__()
+        return len(self._line_types)
+
+    def __iter__(self) -> Iterator[Line]:
+        if self._line_types is None:
+            return super(ColumnarHunk, self).__iter__()
+        return self._iter_lines()
+
+    def __reversed__(self) -> Iterator[Line]:
+        if self._line_types is None:
+            return super(ColumnarHunk, self).__reversed__()
+        return self._get_lines(range(len(self._line_types) - 1, -1, -1))
+
+    def __getitem__(self, index):
+        if self._line_types is None:
+            return super(ColumnarHunk, self).__getitem__(index)
+        indexes = range(len(self._line_types))[index]
+        if isinstance(indexes, range):
+            return list(self._get_lines(indexes))
+        return self._get_line(indexes, self._get_text())
+
+    def __contains__(self, line: object) -> bool:
+        return any(l == line for l in self)
+
+    def __eq__(self, other: object) -> bool:
+        if self._line_types is None:
+            return super(ColumnarHunk, self).__eq__(other)
+        if not isinstance(other, list):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __ne__(self, other: object) -> bool:
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __add__(self, other: list[Line]) -> list[Line]:  # type: ignore[override]
+        return list(self) + other
+
+    def __mul__(self, count: SupportsIndex) -> list[Line]:
+        return list(self) * count
+
+    def __rmul__(self, count: SupportsIndex) -> list[Line]:
+        return list(self) * count
+
+    def append(self, line: Line) -> None:
+        """Append the line to hunk, and keep track of source/target lines."""
+        str(line)
+        self._append_value(line.value, line.line_type, line.source_line_no,
+                           line.target_line_no, line.diff_line_no)
+
+    def extend(self, lines: Iterable[Line]) -> None:
+        for line in lines:
+            self.append(line)
+
+    def __iadd__(self, lines: Iterable[Line]) -> ColumnarHunk:  # type: ignore[override]
+        self.extend(lines)
+        return self
+
+    def copy(self) -> list[Line]:
+        return list(self)
+
+    def count(self, line: Line) -> int:
+        return sum(1 for l in self if l == line)
+
+    def index(self, line: Line, *args: SupportsIndex) -> int:
+        if self._line_types is None:
+            return super(ColumnarHunk, self).index(line, *args)
+        return list(self).index(line, *args)
+
+    # any other list mutation works on the materialized lines
+
+    def __setitem__(self, index, value):
+        self._materialize()
+        super(ColumnarHunk, self).__setitem__(index, value)
+
+    def __delitem__(self, index):
+        self._materialize()
+        super(ColumnarHunk, self).__delitem__(index)
+
+    def __imul__(self, count: SupportsIndex) -> ColumnarHunk:
+        self._materialize()
+        super(ColumnarHunk, self).__imul__(count)
+        return self
+
+    def insert(self, index: SupportsIndex, line: Line) -> None:
+        self._materialize()
+        super(ColumnarHunk, self).insert(index, line)
+
+    def pop(self, index: SupportsIndex = -1) -> Line:
+        self._materialize()
+        return super(ColumnarHunk, self).pop(index)
+
+    def remove(self, line: Line) -> None:
+        self._materialize()
+        super(ColumnarHunk, self).remove(line)
+
+    def clear(self) -> None:
+        self._materialize()
+        super(ColumnarHunk, self).clear()
+
+    def sort(self, *args, **kwargs) -> None:
+        self._materialize()
+        super(ColumnarHunk, self).sort(*args, **kwargs)
+
+    def reverse(self) -> None:
+        self._materialize()
+        super(ColumnarHunk, self).reverse()
+
+    def _build_line_index(self) -> tuple[_LineIndex, _LineIndex]:
+        if self._line_types is None:
+            return super(ColumnarHunk, self)._build_line_index()
+        indexes = []
+        for line_nos in (self._source_line_nos, self._target_line_nos):
+            positions = array('i', [i for i, line_no in enumerate(line_nos)
+                                    if line_no != _NO_LINE_NO])
+            indexes.append(
+                (array('i', [line_nos[i] for i in positions]), positions))
+        return indexes[0], indexes[1]
+
+    def _count_lines(self) -> tuple[int, int]:
+        if self._line_types is None:
+            return super(ColumnarHunk, self)._count_lines()
+        return self._line_types.count(_ADDED), self._line_types.count(_REMOVED)
+
+    def _indexes_of(self, codes: tuple[int, ...]) -> list[int]:
+        return [i for i, line_type in enumerate(self._line_types)  # type: ignore[arg-type]
+                if line_type in codes]
+
+    def source_lines(self) -> Iterator[Line]:
+        """Hunk lines from source file (generator)."""
+        if self._line_types is None:
+            return super(ColumnarHunk, self).source_lines()
+        return self._get_lines(
+            self._indexes_of((_CONTEXT, _REMOVED)))
+
+    @property
+    def source(self) -> list[str]:
+        if self._line_types is None:
+            return super(ColumnarHunk, self).source
+        text = self._get_text()
+        return [self._get_line_str(i, text) for i in
+                self._indexes_of((_CONTEXT, _REMOVED))]
+
+    def target_lines(self) -> Iterator[Line]:
+        """Hunk lines from target file (generator)."""
+        if self._line_types is None:
+            return super(ColumnarHunk, self).target_lines()
+        return self._get_lines(
+            self._indexes_of((_CONTEXT, _ADDED)))
+
+    @property
+    def target(self) -> list[str]:
+        if self._line_types is None:
+            return super(ColumnarHunk, self).target
+        text = self._get_text()
+        return [self._get_line_str(i, text) for i in
+                self._indexes_of((_CONTEXT, _ADDED))]
+
+
+@mypyc_attr(native_class=False)
+class LazyHunk(Hunk):
+    """A hunk keeping its raw diff lines until they are needed.
+
+    The hunk lines are checked and counted when parsed, but Line objects are
+    only created when the lines are first accessed; from then on it works as
+    a regular hunk. Appending lines does not parse them.
+
+    """
+
+    def __init__(self, src_start: Union[str, int] = 0,
+                 src_len: Optional[Union[str, int]] = 0,
+                 tgt_start: Union[str, int] = 0,
+                 tgt_len: Optional[Union[str, int]] = 0,
+                 section_header: str = '') -> None:
+        super(LazyHunk, self).__init__(
+            src_start, src_len, tgt_start, tgt_len, section_header)
+        # the hunk header, raw lines joined (None once parsed) and their
+        # lengths (lines may not end in a newline, e.g. if split on CR),
+        # and the diff line number of the first one
+        self._header = ''
+        self._body: Optional[str] = None
+        self._body_lengths = array('i')
+        self._body_line_no = 0
+
+    def _set_body(self, header: str, lines: list[str], line_no: int) -> None:
+        self._header = header
+        self._body = ''.join(lines)
+        self._body_lengths = array('i', map(len, lines))
+        self._body_line_no = line_no
+
+    def _iter_body(self) -> Iterator[str]:
+        body = self._body
+        start = 0
+        for length in self._body_lengths:
+            yield body[start:start + length]  # type: ignore[index]
+            start += length
+
+    def _load(self) -> None:
+        """Parse the raw lines, keeping them before any appended lines."""
+        if self._body is None:
+            return
+        lines = self._iter_body()
+        patched_file = PatchedFile()
+        patched_file._parse_hunk(
+            self._header, enumerate(lines, self._body_line_no), None, False)
+        self._body = None
+        self._body_lengths = array('i')
+        # the counts already include these lines
+        list.__setitem__(self, slice(0, 0), patched_file[0])
+
+    def __reduce__(self) -> tuple:
+        if self._body is None:
+            return super(LazyHunk, self).__reduce__()
+        # keep the raw lines, which pickle much faster than lines
+        attrs = dict(self.__dict__)
+        attrs['_line_index'] = None
+        return (copyreg.__newobj__,  # type: ignore[attr-defined]
+                (self.__class__,), (attrs, list.copy(self)))
+
+    def __len__(self) -> int:
+        self._load()
+        return super(LazyHunk, self).__len__()
+
+    def __bool__(self) -> bool:
+        return bool(self._body) or super(LazyHunk, self).__len__() > 0
+
+    def __iter__(self) -> Iterator[Line]:
+        self._load()
+        return super(LazyHunk, self).__iter__()
+
+    def __reversed__(self) -> Iterator[Line]:
+        self._load()
+        return super(LazyHunk, self).__reversed__()
+
+    def __getitem__(self, index):
+        self._load()
+        return super(LazyHunk, self).__getitem__(index)
+
+    def __contains__(self, line: object) -> bool:
+        self._load()
+        return super(LazyHunk, self).__contains__(line)
+
+    def __eq__(self, other: object) -> bool:
+        self._load()
+        if isinstance(other, LazyHunk):
+            other._load()
+        return super(LazyHunk, self).__eq__(other)
+
+    def __ne__(self, other: object) -> bool:
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __add__(self, other: list[Line]) -> list[Line]:  # type: ignore[override]
+        return list(self) + other
+
+    def __mul__(self, count: SupportsIndex) -> list[Line]:
+        return list(self) * count
+
+    def __rmul__(self, count: SupportsIndex) -> list[Line]:
+        return list(self) * count
+
+    def copy(self) -> list[Line]:
+        return list(self)
+
+    def count(self, line: Line) -> int:
+        self._load()
+        return super(LazyHunk, self).count(line)
+
+    def index(self, line: Line, *args: SupportsIndex) -> int:
+        self._load()
+        return super(LazyHunk, self).index(line, *args)
+
+    def __setitem__(self, index, value):
+        self._load()
+        super(LazyHunk, self).__setitem__(index, value)
+
+    def __delitem__(self, index):
+        self._load()
+        super(LazyHunk, self).__delitem__(index)
+
+    def __iadd__(self, lines: Iterable[Line]) -> LazyHunk:  # type: ignore[override]
+        self._load()
+        super(LazyHunk, self).__iadd__(lines)
+        return self
+
+    def __imul__(self, count: SupportsIndex) -> LazyHunk:
+        self._load()
+        super(LazyHunk, self).__imul__(count)
+        return self
+
+    def extend(self, lines: Iterable[Line]) -> None:
+        self._load()
+        super(LazyHunk, self).extend(lines)
+
+    def insert(self, index: SupportsIndex, line: Line) -> None:
+        self._load()
+        super(LazyHunk, self).insert(index, line)
+
+    def pop(self, index: SupportsIndex = -1) -> Line:
+        self._load()
+        return super(LazyHunk, self).pop(index)
+
+    def remove(self, line: Line) -> None:
+        self._load()
+        super(LazyHunk, self).remove(line)
+
+    def clear(self) -> None:
+        self._load()
+        super(LazyHunk, self).clear()
+
+    def sort(self, *args, **kwargs) -> None:
+        self._load()
+        super(LazyHunk, self).sort(*args, **kwargs)
+
+    def reverse(self) -> None:
+        self._load()
+        super(LazyHunk, self).reverse()
+
+
+class _BufferLines(object):
+    """Iterator of numbered, decoded lines from a bytes-like buffer.
+
+    Hunk bodies are not read through the iterator but scanned in place by
+    PatchedFile._parse_buffer_hunk, which advances position and line_no.
+
+    """
+
+    def __init__(self, buffer: Buffer, encoding: str = DEFAULT_ENCODING,
+                 errors: str = 'strict') -> None:
+        if isinstance(buffer, memoryview):
+            # memoryview has no find(); use the exported object when the view
+            # covers all of it, otherwise make a copy
+            obj = buffer.obj
+            if (isinstance(obj, (bytes, bytearray, mmap.mmap)) and
+                    buffer.nbytes == len(obj)):
+                buffer = obj
+            else:
+                buffer = buffer.tobytes()
+        self.buffer = buffer
+        self.size = len(buffer)
+        self.encoding = encoding
+        self.errors = errors
+        self.position = 0
+        self.line_no = 0
+
+    def __iter__(self) -> _BufferLines:
+        return self
+
+    # returns (line number, line); typed as a plain tuple, as mypyc cannot
+    # compile __next__ returning a tuple[int, str]
+    def __next__(self) -> tuple:
+        start = self.position
+        if start >= self.size:
+            raise StopIteration
+        end = self.buffer.find(b'\n', start)
+        end = self.size if end == -1 else end + 1
+        self.position = end
+        self.line_no += 1
+        return self.line_no, self.decode(start, end)
+
+    def decode(self, start: int, end: int) -> str:
+        return str(self.buffer[start:end], self.encoding, self.errors)
+
+
+@mypyc_attr(native_class=False)
+class _NeedData(str):
+    __slots__ = ()
+
+
+# returned by _FedLines when it runs out of lines before being closed
+_NEED_DATA = _NeedData()
+
+
+class _FedLines(object):
+    """Iterator of numbered lines fed to an IncrementalParser.
+
+    A hunk is only made available once all its lines were fed, so the parser
+    can only run out of lines (getting _NEED_DATA) outside of a hunk.
+
+    """
+
+    def __init__(self) -> None:
+        self.lines: deque[str] = deque()
+        self.line_no = 0
+        self.closed = False
+        # lines of an incomplete hunk, and how many more lines it expects
+        self._hunk_lines: list[str] = []
+        self._source_left = 0
+        self._target_left = 0
+
+    def __iter__(self) -> _FedLines:
+        return self
+
+    def __next__(self) -> tuple:  # see _BufferLines.__next__
+        if not self.lines:
+            if self.closed:
+                raise StopIteration
+            return self.line_no, _NEED_DATA
+        self.line_no += 1
+        return self.line_no, self.lines.popleft()
+
+    def add(self, line: str) -> None:
+        if self._hunk_lines:
+            self._add_hunk_line(line)
+            return
+
+        is_hunk_header = line[:1] == '@' and RE_HUNK_HEADER.match(line)
+        if is_hunk_header:
+            source_length = is_hunk_header.group(2)
+            target_length = is_hunk_header.group(4)
+            self._source_left = 1 if source_length is None else int(source_length)
+            self._target_left = 1 if target_length is None else int(target_length)
+            self._hunk_lines.append(line)
+        else:
+            self.lines.append(line)
+
+    def _add_hunk_line(self, line: str) -> None:
+        # count lines the same way PatchedFile._parse_hunk does
+        self._hunk_lines.append(line)
+        line_type = line[:1]
+        if line_type == LINE_TYPE_ADDED:
+            self._target_left -= 1
+        elif line_type == LINE_TYPE_REMOVED:
+            self._source_left -= 1
+        elif line_type == LINE_TYPE_CONTEXT or (
+                line_type != LINE_TYPE_NO_NEWLINE and
+                RE_HUNK_EMPTY_BODY_LINE.match(line)):
+            self._source_left -= 1
+            self._target_left -= 1
+        elif line_type != LINE_TYPE_NO_NEWLINE:
+            # not a hunk line, let the parser report it
+            self.release_hunk()
+            return
+        # the parser reads at least one line for any hunk
+        if self._source_left <= 0 and self._target_left <= 0:
+            self.release_hunk()
+
+    def release_hunk(self) -> None:
+        self.lines.extend(self._hunk_lines)
+        self._hunk_lines = []
+
+
+class _CountedLines(object):
+    """Iterator of numbered diff lines, counting (and decoding) them."""
+
+    def __init__(self, lines: Iterator, encoding: Optional[str],
+                 stats: ParseStats) -> None:
+        self.lines = enumerate(lines, 1)
+        self.encoding = encoding
+        self.stats = stats
+
+    def __iter__(self) -> _CountedLines:
+        return self
+
+    def __next__(self) -> tuple:  # see _BufferLines.__next__
+        line_no, line = next(self.lines)
+        stats = self.stats
+        stats.lines_read += 1
+        if self.encoding is not None:
+            start = perf_counter()
+            stats.bytes_decoded += len(line)
+            line = line.decode(self.encoding)
+            stats.decode_time += perf_counter() - start
+        return line_no, line
+
+
+def _strip_file_prefix(filename: Any) -> Any:
+    """Return the filename without its VCS prefix (eg. a/ or b/)."""
+    if isinstance(filename, bytes):
+        quote: Any = b'"'
+        prefix: _LazyPattern = RE_PATCH_FILE_PREFIX_BYTES
+    else:
+        quote = '"'
+        prefix = RE_PATCH_FILE_PREFIX
+    quoted = filename.startswith(quote) and filename.endswith(quote)
+    if quoted:
+        filename = filename[1:-1]
+
+    if prefix.match(filename):
+        filename = filename[2:]
+
+    if quoted:
+        filename = quote + filename + quote
+
+    return filename
+
+
+@mypyc_attr(native_class=False)
 class PatchedFile(list[Hunk]):
     """Patch updated file, it is a list of Hunks."""
 
+    # file names, timestamps and modes are bytes for files parsed in bytes
+    # mode
     def __init__(self, patch_info: Optional[PatchInfo] = None,
-                 source: str = '', target: str = '',
-                 source_timestamp: Optional[str] = None,
-                 target_timestamp: Optional[str] = None,
+                 source: Any = '', target: Any = '',
+                 source_timestamp: Any = None,
+                 target_timestamp: Any = None,
                  is_binary_file: bool = False,
-                 source_mode: Optional[str] = None,
-                 target_mode: Optional[str] = None,
+                 source_mode: Any = None,
+                 target_mode: Any = None,
                  diff_line_no: Optional[int] = None) -> None:
         super(PatchedFile, self).__init__()
         self.patch_info = patch_info
@@ -224,32 +1345,78 @@ class PatchedFile(list[Hunk]):
         # 1-based line number in the diff where this file entry starts; useful
         # to locate files that have no hunks (e.g. binary changes)
         self.diff_line_no = diff_line_no
+        # (source file, target file, path) the path was last computed for
+        self._path_cache: Optional[tuple[Any, Any, Any]] = None
 
     def __repr__(self) -> str:
         return "<PatchedFile: %s>" % self.path
 
+    def __getstate__(self) -> dict:
+        attrs = dict(self.__dict__)
+        attrs['_path_cache'] = None
+        return attrs
+
+    def __setstate__(self, attrs: dict) -> None:
+        self.__dict__.update(attrs)
+
     def __str__(self) -> str:
-        source = ''
-        target = ''
+        return _join_text(self.iter_chunks())
+
+    def __bytes__(self) -> bytes:
+        # for files parsed in bytes mode
+        return b''.join(self.iter_chunks())
+
+    def iter_chunks(self) -> Iterator[Any]:
+        """Return an iterator over the file diff text, in chunks.
+
+        Files parsed in bytes mode return bytes.
+
+        """
         # patch info is optional
-        info = '' if self.patch_info is None else str(self.patch_info)
+        if self.patch_info is not None:
+            yield from self.patch_info.iter_chunks()
         if not self.is_binary_file and self:
-            source = "--- %s%s\n" % (
+            if isinstance(self.source_file, bytes):
+                tab: Any = b'\t'
+                headers: Any = (b"--- %s%s\n", b"+++ %s%s\n", b'')
+            else:
+                tab = '\t'
+                headers = ("--- %s%s\n", "+++ %s%s\n", '')
+            yield headers[0] % (
                 self.source_file,
-                '\t' + self.source_timestamp if self.source_timestamp else '')
-            target = "+++ %s%s\n" % (
+                tab + self.source_timestamp if self.source_timestamp else headers[2])
+            yield headers[1] % (
                 self.target_file,
-                '\t' + self.target_timestamp if self.target_timestamp else '')
-        hunks = ''.join(str(hunk) for hunk in self)
-        return info + source + target + hunks
+                tab + self.target_timestamp if self.target_timestamp else headers[2])
+        for hunk in self:
+            yield from hunk.iter_chunks()
+
+    def write_to(self, fp: Any) -> None:
+        """Write the file diff text to the given text file."""
+        _write_chunks(fp, self.iter_chunks())
 
-    def _parse_hunk(self, header: str, diff: Iterator, encoding: Optional[str],
-                    metadata_only: bool) -> None:
+    def _parse_hunk(self, header: Union[str, bytes], diff: Iterator,
+                    encoding: Optional[str], metadata_only: bool,
+                    storage: str = STORAGE_LIST) -> None:
         """Parse hunk details."""
+        if isinstance(header, bytes):
+            self._parse_bytes_hunk(header, diff, metadata_only)
+            return
         header_info = RE_HUNK_HEADER.match(header)
         assert header_info is not None  # caller guarantees a hunk header
         hunk_info = header_info.groups()
-        hunk = Hunk(*hunk_info)
+        # without content there is nothing to store in columns
+        hunk: Hunk
+        columnar_hunk = None
+        lazy_hunk = None
+        if storage == STORAGE_COLUMNAR and not metadata_only:
+            hunk = columnar_hunk = ColumnarHunk(*hunk_info)
+        elif storage == STORAGE_LAZY and not metadata_only:
+            hunk = lazy_hunk = LazyHunk(*hunk_info)
+        else:
+            hunk = Hunk(*hunk_info)
+        raw_lines: list[str] = []
+        first_line_no = 0
 
         source_line_no = hunk.source_start
         target_line_no = hunk.target_start
@@ -257,75 +1424,202 @@ class PatchedFile(list[Hunk]):
         expected_target_end = target_line_no + hunk.target_length
         added = 0
         removed = 0
+        append_line = hunk._append_unchecked
+
+        if (_speedups is not None and hunk is not columnar_hunk and
+                hunk is not lazy_hunk and
+                expected_source_end <= sys.maxsize and
+                expected_target_end <= sys.maxsize):
+            # the same loop, in C (for list storage and metadata only)
+            source_line_no, target_line_no, added, removed = (
+                _speedups.parse_hunk_lines(
+                    diff, encoding, metadata_only, hunk, Line,
+                    RE_HUNK_EMPTY_BODY_LINE.match, UnidiffParseError,
+                    source_line_no, target_line_no, expected_source_end,
+                    expected_target_end))
+        else:
+            for diff_line_no, raw_line in diff:
+                # typed, so a mypyc build can use the str operations directly
+                line: str = (raw_line if encoding is None else
+                             raw_line.decode(encoding))
+
+                if lazy_hunk is not None:
+                    # check and count the line as below, but keep it as it is
+                    if not raw_lines:
+                        first_line_no = diff_line_no
+                    raw_lines.append(line)
+                    line_type = line[:1]
+                    if line_type == LINE_TYPE_ADDED:
+                        target_line_no += 1
+                        added += 1
+                    elif line_type == LINE_TYPE_REMOVED:
+                        source_line_no += 1
+                        removed += 1
+                    elif line_type == LINE_TYPE_CONTEXT or (
+                            line_type != LINE_TYPE_NO_NEWLINE and
+                            RE_HUNK_EMPTY_BODY_LINE.match(line)):
+                        target_line_no += 1
+                        source_line_no += 1
+                    elif line_type != LINE_TYPE_NO_NEWLINE:
+                        raise UnidiffParseError(
+                            'Hunk diff line expected: %s' % line)
+
+                elif metadata_only:
+                    # quick line type detection, no regex required
+                    line_type = line[0] if line else LINE_TYPE_CONTEXT
+                    if line_type not in (LINE_TYPE_ADDED,
+                                         LINE_TYPE_REMOVED,
+                                         LINE_TYPE_CONTEXT,
+                                         LINE_TYPE_NO_NEWLINE):
+                        raise UnidiffParseError(
+                            'Hunk diff line expected: %s' % line)
+
+                    if line_type == LINE_TYPE_ADDED:
+                        target_line_no += 1
+                        added += 1
+                    elif line_type == LINE_TYPE_REMOVED:
+                        source_line_no += 1
+                        removed += 1
+                    elif line_type == LINE_TYPE_CONTEXT:
+                        target_line_no += 1
+                        source_line_no += 1
 
-        for diff_line_no, line in diff:
-            if encoding is not None:
-                line = line.decode(encoding)
+                else:
+                    # parse diff line content; the line type is given by its
+                    # first character, so the regex is only needed for the
+                    # rare empty (or CRLF-only) lines, which are treated as
+                    # context
+                    line_type = line[:1]
+                    value = line[1:]
+                    line_source_no = line_target_no = None
+                    if line_type == LINE_TYPE_CONTEXT:
+                        line_source_no = source_line_no
+                        line_target_no = target_line_no
+                        target_line_no += 1
+                        source_line_no += 1
+                    elif line_type == LINE_TYPE_ADDED:
+                        line_target_no = target_line_no
+                        target_line_no += 1
+                        added += 1
+                    elif line_type == LINE_TYPE_REMOVED:
+                        line_source_no = source_line_no
+                        source_line_no += 1
+                        removed += 1
+                    elif line_type != LINE_TYPE_NO_NEWLINE:
+                        valid_line = RE_HUNK_EMPTY_BODY_LINE.match(line)
+                        if not valid_line:
+                            raise UnidiffParseError(
+                                'Hunk diff line expected: %s' % line)
+                        line_type = LINE_TYPE_CONTEXT
+                        value = valid_line.group('value')
+                        line_source_no = source_line_no
+                        line_target_no = target_line_no
+                        target_line_no += 1
+                        source_line_no += 1
+
+                # stop parsing if we got past expected number of lines
+                if (source_line_no > expected_source_end or
+                        target_line_no > expected_target_end):
+                    raise UnidiffParseError('Hunk is longer than expected')
+
+                if columnar_hunk is not None:
+                    columnar_hunk._append_value(
+                        value, line_type, line_source_no, line_target_no,
+                        diff_line_no)
+                elif not metadata_only and lazy_hunk is None:
+                    append_line(Line(value, line_type, line_source_no,
+                                     line_target_no, diff_line_no))
+
+                # if hunk source/target lengths are ok, hunk is complete
+                if (source_line_no == expected_source_end and
+                        target_line_no == expected_target_end):
+                    break
 
-            if metadata_only:
-                # quick line type detection, no regex required
-                line_type = line[0] if line else LINE_TYPE_CONTEXT
-                if line_type not in (LINE_TYPE_ADDED,
-                                     LINE_TYPE_REMOVED,
-                                     LINE_TYPE_CONTEXT,
-                                     LINE_TYPE_NO_NEWLINE):
-                    raise UnidiffParseError(
-                        'Hunk diff line expected: %s' % line)
+        # report an error if we haven't got expected number of lines
+        if (source_line_no < expected_source_end or
+                target_line_no < expected_target_end):
+            raise UnidiffParseError('Hunk is shorter than expected')
 
-                if line_type == LINE_TYPE_ADDED:
-                    target_line_no += 1
-                    added += 1
-                elif line_type == LINE_TYPE_REMOVED:
-                    source_line_no += 1
-                    removed += 1
-                elif line_type == LINE_TYPE_CONTEXT:
-                    target_line_no += 1
-                    source_line_no += 1
+        # the line counts are already known (and the only ones available
+        # for metadata only hunks, which have no lines)
+        hunk._set_line_counts(added, removed)
+        if columnar_hunk is not None:
+            # release the individual value strings
+            columnar_hunk._get_text()
+        elif lazy_hunk is not None:
+            lazy_hunk._set_body(header, raw_lines, first_line_no)
 
-                # no file content tracking
-                original_line = None
+        self.append(hunk)
 
-            else:
-                # parse diff line content
-                valid_line = RE_HUNK_BODY_LINE.match(line)
-                if not valid_line:
-                    valid_line = RE_HUNK_EMPTY_BODY_LINE.match(line)
+    def _parse_bytes_hunk(self, header: bytes, diff: Iterator,
+                          metadata_only: bool) -> None:
+        """Parse hunk details, keeping the hunk lines as bytes.
 
-                if not valid_line:
-                    raise UnidiffParseError(
-                        'Hunk diff line expected: %s' % line)
+        Same as _parse_hunk (with the list storage), for bytes diff lines:
+        line values and the section header are kept as bytes, line types are
+        the same as for text lines.
 
-                line_type = valid_line.group('line_type')
-                if line_type == LINE_TYPE_EMPTY:
-                    line_type = LINE_TYPE_CONTEXT
+        """
+        header_info = RE_HUNK_HEADER_BYTES.match(header)
+        assert header_info is not None  # caller guarantees a hunk header
+        # the section header is kept as bytes
+        hunk = Hunk(*header_info.groups())
+        append_line = hunk._append_unchecked
 
+        source_line_no = hunk.source_start
+        target_line_no = hunk.target_start
+        expected_source_end = source_line_no + hunk.source_length
+        expected_target_end = target_line_no + hunk.target_length
+        added = 0
+        removed = 0
+
+        for diff_line_no, line in diff:
+            # line types are compared by their byte value
+            line_type = line[0] if line else _NEWLINE
+            line_source_no = line_target_no = None
+            if line_type == _CONTEXT:
+                line_type = LINE_TYPE_CONTEXT
+                value = line[1:]
+                line_source_no = source_line_no
+                line_target_no = target_line_no
+                target_line_no += 1
+                source_line_no += 1
+            elif line_type == _ADDED:
+                line_type = LINE_TYPE_ADDED
+                value = line[1:]
+                line_target_no = target_line_no
+                target_line_no += 1
+                added += 1
+            elif line_type == _REMOVED:
+                line_type = LINE_TYPE_REMOVED
+                value = line[1:]
+                line_source_no = source_line_no
+                source_line_no += 1
+                removed += 1
+            elif line_type == _NO_NEWLINE:
+                line_type = LINE_TYPE_NO_NEWLINE
+                value = line[1:]
+            else:
+                valid_line = RE_HUNK_EMPTY_BODY_LINE_BYTES.match(line)
+                if metadata_only or not valid_line:
+                    raise UnidiffParseError(
+                        'Hunk diff line expected: %r' % line)
+                # empty (or CRLF-only) line, treated as context
+                line_type = LINE_TYPE_CONTEXT
                 value = valid_line.group('value')
-                original_line = Line(value, line_type=line_type)
-
-                if line_type == LINE_TYPE_ADDED:
-                    original_line.target_line_no = target_line_no
-                    target_line_no += 1
-                elif line_type == LINE_TYPE_REMOVED:
-                    original_line.source_line_no = source_line_no
-                    source_line_no += 1
-                elif line_type == LINE_TYPE_CONTEXT:
-                    original_line.target_line_no = target_line_no
-                    original_line.source_line_no = source_line_no
-                    target_line_no += 1
-                    source_line_no += 1
-                elif line_type == LINE_TYPE_NO_NEWLINE:
-                    pass
-                else:
-                    original_line = None
+                line_source_no = source_line_no
+                line_target_no = target_line_no
+                target_line_no += 1
+                source_line_no += 1
 
             # stop parsing if we got past expected number of lines
             if (source_line_no > expected_source_end or
                     target_line_no > expected_target_end):
                 raise UnidiffParseError('Hunk is longer than expected')
 
-            if original_line:
-                original_line.diff_line_no = diff_line_no
-                hunk.append(original_line)
+            if not metadata_only:
+                append_line(Line(value, line_type, line_source_no,
+                                 line_target_no, diff_line_no))
 
             # if hunk source/target lengths are ok, hunk is complete
             if (source_line_no == expected_source_end and
@@ -337,47 +1631,214 @@ class PatchedFile(list[Hunk]):
                 target_line_no < expected_target_end):
             raise UnidiffParseError('Hunk is shorter than expected')
 
+        # the line counts are already known (and the only ones available
+        # for metadata only hunks, which have no lines)
+        hunk._set_line_counts(added, removed)
+
+        self.append(hunk)
+
+    def _parse_buffer_hunk(self, header: str, lines: _BufferLines,
+                           metadata_only: bool) -> None:
+        """Parse hunk details, scanning the hunk body in the raw buffer.
+
+        Same as _parse_hunk, but the hunk lines are not decoded: values are
+        kept as spans of the buffer, decoded when the lines are accessed.
+
+        """
+        header_info = RE_HUNK_HEADER.match(header)
+        assert header_info is not None  # caller guarantees a hunk header
+        hunk_info = header_info.groups()
+        hunk: Hunk
+        columnar_hunk = None
         if metadata_only:
-            # HACK: set fixed calculated values when metadata_only is enabled
-            hunk._added = added
-            hunk._removed = removed
+            hunk = Hunk(*hunk_info)
+        else:
+            hunk = columnar_hunk = ColumnarHunk(
+                *hunk_info, buffer=lines.buffer, encoding=lines.encoding,
+                errors=lines.errors)
+
+        source_line_no = hunk.source_start
+        target_line_no = hunk.target_start
+        expected_source_end = source_line_no + hunk.source_length
+        expected_target_end = target_line_no + hunk.target_length
+        added = 0
+        removed = 0
+
+        buffer = lines.buffer
+        find = buffer.find
+        size = lines.size
+        end = lines.position
+        diff_line_no = lines.line_no
+        while end < size:
+            start = end
+            end = find(b'\n', start)
+            end = size if end == -1 else end + 1
+            diff_line_no += 1
+            line_type = buffer[start]
+
+            # values start after the line type character
+            value_start = start + 1
+            value_end = end
+            line_source_no = line_target_no = _NO_LINE_NO
+            if line_type == _CONTEXT:
+                line_source_no = source_line_no
+                line_target_no = target_line_no
+                target_line_no += 1
+                source_line_no += 1
+            elif line_type == _ADDED:
+                line_target_no = target_line_no
+                target_line_no += 1
+                added += 1
+            elif line_type == _REMOVED:
+                line_source_no = source_line_no
+                source_line_no += 1
+                removed += 1
+            elif line_type != _NO_NEWLINE:
+                line = lines.decode(start, end)
+                valid_line = RE_HUNK_EMPTY_BODY_LINE.match(line)
+                if metadata_only or not valid_line:
+                    raise UnidiffParseError(
+                        'Hunk diff line expected: %s' % line)
+                # empty (or CRLF-only) line, treated as context
+                line_type = _CONTEXT
+                value_start = start
+                value_end = start + len(valid_line.group('value'))
+                line_source_no = source_line_no
+                line_target_no = target_line_no
+                target_line_no += 1
+                source_line_no += 1
+
+            # stop parsing if we got past expected number of lines
+            if (source_line_no > expected_source_end or
+                    target_line_no > expected_target_end):
+                raise UnidiffParseError('Hunk is longer than expected')
+
+            if columnar_hunk is not None:
+                columnar_hunk._append_span(
+                    line_type, value_start, value_end, line_source_no,
+                    line_target_no, diff_line_no)
+
+            # if hunk source/target lengths are ok, hunk is complete
+            if (source_line_no == expected_source_end and
+                    target_line_no == expected_target_end):
+                break
+
+        # report an error if we haven't got expected number of lines
+        if (source_line_no < expected_source_end or
+                target_line_no < expected_target_end):
+            raise UnidiffParseError('Hunk is shorter than expected')
+
+        # no newline markers and empty lines following the hunk are appended
+        # to it; keep them as spans too, instead of decoding the hunk values
+        # to append them later
+        while columnar_hunk is not None and end < size:
+            if buffer[end] == _NEWLINE:
+                columnar_hunk._append_span(
+                    0, end, end + 1, _NO_LINE_NO, _NO_LINE_NO, _NO_LINE_NO)
+                end += 1
+            elif buffer[end:end + len(_NO_NEWLINE_MARKER)] == _NO_NEWLINE_MARKER:
+                columnar_hunk._append_span(
+                    _NO_NEWLINE, end + 1, end + len(_NO_NEWLINE_MARKER),
+                    _NO_LINE_NO, _NO_LINE_NO, _NO_LINE_NO)
+                end += len(_NO_NEWLINE_MARKER)
+            else:
+                break
+            diff_line_no += 1
+
+        lines.position = end
+        lines.line_no = diff_line_no
+
+        # the line counts are already known (and the only ones available
+        # for metadata only hunks, which have no lines)
+        hunk._set_line_counts(added, removed)
 
         self.append(hunk)
 
-    def _add_no_newline_marker_to_last_hunk(self) -> None:
+    def _add_no_newline_marker_to_last_hunk(
+            self, value: Any = LINE_VALUE_NO_NEWLINE + '\n') -> None:
         if not self:
             raise UnidiffParseError(
                 'Unexpected marker:' + LINE_VALUE_NO_NEWLINE)
         last_hunk = self[-1]
-        last_hunk.append(
-            Line(LINE_VALUE_NO_NEWLINE + '\n', line_type=LINE_TYPE_NO_NEWLINE))
+        last_hunk.append(Line(value, line_type=LINE_TYPE_NO_NEWLINE))
 
-    def _append_trailing_empty_line(self) -> None:
+    def _append_trailing_empty_line(self, value: Any = '\n') -> None:
         if not self:
             raise UnidiffParseError('Unexpected trailing newline character')
         last_hunk = self[-1]
-        last_hunk.append(Line('\n', line_type=LINE_TYPE_EMPTY))
+        last_hunk.append(Line(value, line_type=LINE_TYPE_EMPTY))
 
     @property
-    def path(self) -> str:
+    def path(self) -> Any:
         """Return the file path abstracted from VCS."""
-        filepath = self.source_file
-        if filepath in (None, DEV_NULL) or (
-                self.is_rename and self.target_file not in (None, DEV_NULL)):
+        source_file = self.source_file
+        target_file = self.target_file
+        cache = self._path_cache
+        if (cache is not None and cache[0] is source_file and
+                cache[1] is target_file):
+            return cache[2]
+
+        filepath = source_file
+        if filepath in (None, DEV_NULL, DEV_NULL_BYTES) or (
+                self.is_rename and
+                target_file not in (None, DEV_NULL, DEV_NULL_BYTES)):
             # if this is a rename, prefer the target filename
-            filepath = self.target_file
+            filepath = target_file
+        filepath = _strip_file_prefix(filepath)
 
-        quoted = filepath.startswith('"') and filepath.endswith('"')
-        if quoted:
-            filepath = filepath[1:-1]
+        self._path_cache = (source_file, target_file, filepath)
+        return filepath
 
-        if RE_PATCH_FILE_PREFIX.match(filepath):
-            filepath = filepath[2:]
+    def _lines_between(self, source: bool, start: int,
+                       stop: int) -> list[Line]:
+        # hunks are in order and do not overlap (as in a parsed diff), so the
+        # first hunk with lines in range can be found using a binary search
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            hunk = self[middle]
+            if source:
+                hunk_stop = hunk.source_start + hunk.source_length
+            else:
+                hunk_stop = hunk.target_start + hunk.target_length
+            if hunk_stop <= start:
+                low = middle + 1
+            else:
+                high = middle
 
-        if quoted:
-            filepath = '"{}"'.format(filepath)
+        lines = []
+        for index in range(low, len(self)):
+            hunk = self[index]
+            if (hunk.source_start if source else hunk.target_start) >= stop:
+                break
+            lines.extend(hunk._lines_between(source, start, stop))
+        return lines
 
-        return filepath
+    def line_at_source(self, line_no: int) -> Optional[Line]:
+        """Return the line with the given source line number, if any.
+
+        Only lines included in the diff (context and removed) can be found.
+
+        """
+        lines = self._lines_between(True, line_no, line_no + 1)
+        return lines[0] if lines else None
+
+    def line_at_target(self, line_no: int) -> Optional[Line]:
+        """Return the line with the given target line number, if any.
+
+        Only lines included in the diff (context and added) can be found.
+
+        """
+        lines = self._lines_between(False, line_no, line_no + 1)
+        return lines[0] if lines else None
+
+    def lines_at_source(self, start: int, stop: int) -> list[Line]:
+        """Return the lines with a source line number in [start, stop)."""
+        return self._lines_between(True, start, stop)
+
+    def lines_at_target(self, start: int, stop: int) -> list[Line]:
+        """Return the lines with a target line number in [start, stop)."""
+        return self._lines_between(False, start, stop)
 
     @property
     def added(self) -> int:
@@ -391,14 +1852,14 @@ class PatchedFile(list[Hunk]):
 
     @property
     def is_rename(self) -> bool:
-        return (self.source_file != DEV_NULL
-            and self.target_file != DEV_NULL
+        return (self.source_file not in _DEV_NULLS
+            and self.target_file not in _DEV_NULLS
             and self.source_file[2:] != self.target_file[2:])
 
     @property
     def is_added_file(self) -> bool:
         """Return True if this patch adds the file."""
-        if self.source_file == DEV_NULL:
+        if self.source_file in _DEV_NULLS:
             return True
         return (len(self) == 1 and self[0].source_start == 0 and
                 self[0].source_length == 0)
@@ -406,7 +1867,7 @@ class PatchedFile(list[Hunk]):
     @property
     def is_removed_file(self) -> bool:
         """Return True if this patch removes the file."""
-        if self.target_file == DEV_NULL:
+        if self.target_file in _DEV_NULLS:
             return True
         return (len(self) == 1 and self[0].target_start == 0 and
                 self[0].target_length == 0)
@@ -422,189 +1883,400 @@ class PatchedFile(list[Hunk]):
         # prefer the target mode; fall back to the source mode (e.g. a
         # removed symlink only carries the old mode)
         mode = self.target_mode if self.target_mode is not None else self.source_mode
-        return mode == SYMLINK_FILE_MODE
+        return mode in (SYMLINK_FILE_MODE, SYMLINK_FILE_MODE_BYTES)
+
 
+# yielded by PatchSet._iter_parse when it gets _NEED_DATA, in place of a file
+_NO_FILE = PatchedFile()
 
+
+@mypyc_attr(native_class=False)
 class PatchSet(list[PatchedFile]):
     """A list of PatchedFiles."""
 
-    def __init__(self, f: Union[StringIO, str, bytes, Iterable[str]],
+    def __init__(self, f: Union[StringIO, str, bytes, Iterable[str],
+                                Iterable[bytes]],
                  encoding: Optional[str] = None,
-                 metadata_only: bool = False) -> None:
+                 metadata_only: bool = False,
+                 storage: str = STORAGE_LIST,
+                 stats: Optional[ParseStats] = None,
+                 mode: str = MODE_TEXT) -> None:
         super(PatchSet, self).__init__()
+        # files by path, source and target name; built when first needed
+        self._index: Optional[tuple[dict[str, PatchedFile], ...]] = None
+
+        self._check_storage(storage)
+        self._check_mode(mode, encoding, storage)
+        data, encoding = self._prepare_input(f, encoding, stats, mode)
+        # if encoding is None, assume we are reading unicode data
+        # when metadata_only is True, only perform a minimal metadata parsing
+        # (ie. hunks without content) which is around 2-3 times faster (see
+        # benchmarks/bench_parse.py; there is no gain without hunks); it will
+        # still validate the diff metadata consistency and get counts
+        # when storage is 'columnar', hunk lines are kept in compact columns
+        # and Line objects are only created when accessed; when it is 'lazy',
+        # hunk lines are only counted, and parsed when first accessed
+        # when stats is given (a unidiff.stats.ParseStats), what the parser
+        # does is recorded there
+        # when mode is 'bytes', the diff lines are bytes and parsed as such:
+        # nothing is decoded, file names, patch info and line values are
+        # kept as bytes
+        self._parse(data, encoding=encoding, metadata_only=metadata_only,
+                    storage=storage, stats=stats, mode=mode)
+
+    def __repr__(self) -> str:
+        return '<PatchSet: %s>' % super(PatchSet, self).__repr__()
+
+    def __getstate__(self) -> dict:
+        attrs = dict(self.__dict__)
+        attrs['_index'] = None
+        return attrs
+
+    def __setstate__(self, attrs: dict) -> None:
+        self.__dict__.update(attrs)
+
+    def __str__(self) -> str:
+        return _join_text(self.iter_chunks())
+
+    def __bytes__(self) -> bytes:
+        # for diffs parsed in bytes mode
+        return b''.join(self.iter_chunks())
+
+    def iter_chunks(self) -> Iterator[Any]:
+        """Return an iterator over the diff text, in chunks.
+
+        Each chunk is a header or a whole hunk; use write_to to write them
+        out in larger batches.
+
+        """
+        for patched_file in self:
+            yield from patched_file.iter_chunks()
+
+    def write_to(self, fp: Any) -> None:
+        """Write the diff text to the given text file.
+
+        Same as writing str(patch), but the text is written in batches
+        instead of building it all in memory first.
+
+        """
+        _write_chunks(fp, self.iter_chunks())
+
+    @classmethod
+    def _prepare_input(cls, f: Union[StringIO, str, bytes, Iterable[str],
+                                     Iterable[bytes]],
+                       encoding: Optional[str],
+                       stats: Optional[ParseStats] = None,
+                       mode: str = MODE_TEXT,
+                       ) -> tuple[Iterator, Optional[str]]:
+        if mode == MODE_BYTES:
+            if isinstance(f, str):
+                raise TypeError('Expected bytes diff data in bytes mode')
+            if isinstance(f, bytes):
+                return iter(io.BytesIO(f)), None
+            return iter(f), None
 
         # convert str/bytes inputs to StringIO objects (bytes are decoded,
         # defaulting to UTF-8 when no encoding is given)
         if isinstance(f, (str, bytes)):
-            f = self._convert_string(f, encoding)
+            f = cls._convert_string(f, encoding, stats=stats)
             # the data has already been decoded into text
             encoding = None
 
         # make sure we pass an iterator object to parse
-        data = iter(f)
-        # if encoding is None, assume we are reading unicode data
-        # when metadata_only is True, only perform a minimal metadata parsing
-        # (ie. hunks without content) which is around 2.5-6 times faster;
-        # it will still validate the diff metadata consistency and get counts
-        self._parse(data, encoding=encoding, metadata_only=metadata_only)
+        return iter(f), encoding
 
-    def __repr__(self) -> str:
-        return '<PatchSet: %s>' % super(PatchSet, self).__repr__()
+    @staticmethod
+    def _check_storage(storage: str) -> None:
+        if storage not in (STORAGE_LIST, STORAGE_COLUMNAR, STORAGE_LAZY):
+            raise ValueError('Unknown storage: %r' % storage)
 
-    def __str__(self) -> str:
-        return ''.join(str(patched_file) for patched_file in self)
+    @staticmethod
+    def _check_mode(mode: str, encoding: Optional[str], storage: str) -> None:
+        if mode not in (MODE_TEXT, MODE_BYTES):
+            raise ValueError('Unknown mode: %r' % mode)
+        if mode == MODE_BYTES and encoding is not None:
+            raise ValueError('Bytes mode does not decode, got an encoding')
+        if mode == MODE_BYTES and storage != STORAGE_LIST:
+            raise ValueError('Bytes mode only supports the list storage')
+
+    @classmethod
+    def iter_files(cls, f: Union[StringIO, str, bytes, Iterable[str],
+                                 Iterable[bytes]],
+                   encoding: Optional[str] = None,
+                   metadata_only: bool = False,
+                   storage: str = STORAGE_LIST,
+                   stats: Optional[ParseStats] = None,
+                   mode: str = MODE_TEXT) -> Iterator[PatchedFile]:
+        """Parse the diff data, yielding each PatchedFile once it is complete.
+
+        Accepts the same input as the PatchSet constructor. Files are not
+        kept after being yielded, so memory usage is bounded by the largest
+        file in the diff instead of the whole diff.
+
+        """
+        cls._check_storage(storage)
+        cls._check_mode(mode, encoding, storage)
+        data, encoding = cls._prepare_input(f, encoding, stats, mode)
+        if stats is not None:
+            return cls._iter_parse_with_stats(data, encoding, metadata_only,
+                                              storage, stats, mode)
+        return cls._iter_parse(data, encoding=encoding,
+                               metadata_only=metadata_only, storage=storage,
+                               mode=mode)
+
+    def _parse(self, diff: Iterator, encoding: Optional[str],
+               metadata_only: bool, storage: str = STORAGE_LIST,
+               stats: Optional[ParseStats] = None,
+               mode: str = MODE_TEXT) -> None:
+        if stats is not None:
+            self.extend(self._iter_parse_with_stats(
+                diff, encoding, metadata_only, storage, stats, mode))
+            return
+        self.extend(self._iter_parse(diff, encoding, metadata_only, storage,
+                                     mode=mode))
+
+    @classmethod
+    def _iter_parse_with_stats(cls, diff: Iterator, encoding: Optional[str],
+                               metadata_only: bool, storage: str,
+                               stats: ParseStats,
+                               mode: str = MODE_TEXT) -> Iterator[PatchedFile]:
+        """Same as _iter_parse, recording what the parser does in stats."""
+        files = cls._iter_parse(_CountedLines(diff, encoding, stats), None,
+                                metadata_only, storage, stats=stats,
+                                mode=mode)
+        while True:
+            # only the parser time is recorded, not the caller's
+            start = perf_counter()
+            try:
+                patched_file = next(files)
+            except StopIteration:
+                stats.parse_time += perf_counter() - start
+                return
+            stats.parse_time += perf_counter() - start
+            stats.files += 1
+            if patched_file.is_binary_file:
+                stats.binary_files += 1
+            stats.hunks += len(patched_file)
+            # the lines of other hunks are kept in columns, or not parsed yet
+            stats.lines_created += sum(
+                list.__len__(hunk) for hunk in patched_file
+                if type(hunk) is Hunk)
+            yield patched_file
 
-    def _parse(self, diff: Iterable, encoding: Optional[str],
-               metadata_only: bool) -> None:
+    @staticmethod
+    def _iter_parse(diff: Iterable, encoding: Optional[str],
+                    metadata_only: bool,
+                    storage: str = STORAGE_LIST,
+                    first_line_no: int = 1,
+                    stats: Optional[ParseStats] = None,
+                    mode: str = MODE_TEXT) -> Iterator[PatchedFile]:
+        # a file is complete (and can be yielded) once the next one starts,
+        # since the parser never goes back to a file it is done with
+        pending_file = None
         current_file = None
         patch_info = None
+        bytes_mode = mode == MODE_BYTES
+        syntax = _BYTES_SYNTAX if bytes_mode else _TEXT_SYNTAX
 
-        diff_lines = enumerate(diff, 1)
+        # buffer and fed lines are already numbered
+        diff_lines: Iterator[tuple[int, Any]] = (
+            diff if isinstance(diff, (_BufferLines, _FedLines, _CountedLines))
+            else enumerate(diff, first_line_no))
         for diff_line_no, line in diff_lines:
             if encoding is not None:
                 line = line.decode(encoding)
 
-            # check for a git file rename
-            is_diff_git_header = RE_DIFF_GIT_HEADER.match(line) or \
-                RE_DIFF_GIT_HEADER_URI_LIKE.match(line) or \
-                RE_DIFF_GIT_HEADER_NO_PREFIX.match(line)
-            if is_diff_git_header:
-                patch_info = PatchInfo()
-                source_file = is_diff_git_header.group('source')
-                target_file = is_diff_git_header.group('target')
-                current_file = PatchedFile(
-                    patch_info, source_file, target_file, None, None,
-                    diff_line_no=diff_line_no)
-                self.append(current_file)
-                patch_info.append(line)
-                continue
-
-            # check for a git new file
-            is_diff_git_new_file = RE_DIFF_GIT_NEW_FILE.match(line)
-            if is_diff_git_new_file:
-                if current_file is None or patch_info is None:
-                    raise UnidiffParseError('Unexpected new file found: %s' % line)
-                current_file.source_file = DEV_NULL
-                current_file.target_mode = is_diff_git_new_file.group('mode')
-                patch_info.append(line)
-                continue
-
-            # check for a git deleted file
-            is_diff_git_deleted_file = RE_DIFF_GIT_DELETED_FILE.match(line)
-            if is_diff_git_deleted_file:
-                if current_file is None or patch_info is None:
-                    raise UnidiffParseError('Unexpected deleted file found: %s' % line)
-                current_file.target_file = DEV_NULL
-                current_file.source_mode = is_diff_git_deleted_file.group('mode')
-                patch_info.append(line)
-                continue
-
-            # check for git file mode change / index lines (extract the mode
-            # but keep the line as patch info so the diff still round-trips)
-            if current_file is not None and patch_info is not None:
-                is_diff_git_old_mode = RE_DIFF_GIT_OLD_MODE.match(line)
-                if is_diff_git_old_mode:
-                    current_file.source_mode = is_diff_git_old_mode.group('mode')
+            # dispatch on the first character of the line, so each line is
+            # only checked against the patterns it could possibly match
+            first = _BYTE_CHARS.get(line[:1], '') if bytes_mode else line[:1]
+            if stats is not None:
+                stats._scan_line(first, current_file is not None and
+                                 patch_info is not None)
+
+            if first == 'd':
+                # check for a git file rename
+                is_diff_git_header = syntax.diff_git_header.match(line) or \
+                    syntax.diff_git_header_uri_like.match(line) or \
+                    syntax.diff_git_header_no_prefix.match(line)
+                if is_diff_git_header:
+                    patch_info = PatchInfo()
+                    source_file = is_diff_git_header.group('source')
+                    target_file = is_diff_git_header.group('target')
+                    if pending_file is not None:
+                        yield pending_file
+                    current_file = pending_file = PatchedFile(
+                        patch_info, source_file, target_file, None, None,
+                        diff_line_no=diff_line_no)
                     patch_info.append(line)
                     continue
 
-                is_diff_git_new_mode = RE_DIFF_GIT_NEW_MODE.match(line)
-                if is_diff_git_new_mode:
-                    current_file.target_mode = is_diff_git_new_mode.group('mode')
+                # check for a git deleted file
+                is_diff_git_deleted_file = syntax.diff_git_deleted_file.match(line)
+                if is_diff_git_deleted_file:
+                    if current_file is None or patch_info is None:
+                        raise UnidiffParseError('Unexpected deleted file found: %s' % line)
+                    current_file.target_file = syntax.dev_null
+                    current_file.source_mode = is_diff_git_deleted_file.group('mode')
                     patch_info.append(line)
                     continue
 
-                is_diff_git_index = RE_DIFF_GIT_INDEX.match(line)
-                if is_diff_git_index:
-                    # an unchanged index mode applies to both source and target
-                    mode = is_diff_git_index.group('mode')
-                    if current_file.source_mode is None:
-                        current_file.source_mode = mode
-                    if current_file.target_mode is None:
-                        current_file.target_mode = mode
+            elif first == 'n':
+                # check for a git new file
+                is_diff_git_new_file = syntax.diff_git_new_file.match(line)
+                if is_diff_git_new_file:
+                    if current_file is None or patch_info is None:
+                        raise UnidiffParseError('Unexpected new file found: %s' % line)
+                    current_file.source_file = syntax.dev_null
+                    current_file.target_mode = is_diff_git_new_file.group('mode')
                     patch_info.append(line)
                     continue
 
-            # check for source file header
-            is_source_filename = RE_SOURCE_FILENAME.match(line)
-            if is_source_filename:
-                source_file = is_source_filename.group('filename')
-                source_timestamp = is_source_filename.group('timestamp')
-                # reset current file, unless we are processing a rename
-                # (in that case, source files should match)
-                if current_file is not None and not (
-                        current_file.source_file == source_file):
-                    current_file = None
-                elif current_file is not None:
-                    current_file.source_timestamp = source_timestamp
-                continue
+                # check for git file mode change (extract the mode but keep
+                # the line as patch info so the diff still round-trips)
+                if current_file is not None and patch_info is not None:
+                    is_diff_git_new_mode = syntax.diff_git_new_mode.match(line)
+                    if is_diff_git_new_mode:
+                        current_file.target_mode = is_diff_git_new_mode.group('mode')
+                        patch_info.append(line)
+                        continue
+
+            elif first == 'o':
+                if current_file is not None and patch_info is not None:
+                    is_diff_git_old_mode = syntax.diff_git_old_mode.match(line)
+                    if is_diff_git_old_mode:
+                        current_file.source_mode = is_diff_git_old_mode.group('mode')
+                        patch_info.append(line)
+                        continue
+
+            elif first == 'i':
+                if current_file is not None and patch_info is not None:
+                    is_diff_git_index = syntax.diff_git_index.match(line)
+                    if is_diff_git_index:
+                        # an unchanged index mode applies to both source and target
+                        index_mode = is_diff_git_index.group('mode')
+                        if current_file.source_mode is None:
+                            current_file.source_mode = index_mode
+                        if current_file.target_mode is None:
+                            current_file.target_mode = index_mode
+                        patch_info.append(line)
+                        continue
+
+            elif first == '-':
+                # check for source file header
+                is_source_filename = syntax.source_filename.match(line)
+                if is_source_filename:
+                    source_file = is_source_filename.group('filename')
+                    source_timestamp = is_source_filename.group('timestamp')
+                    # reset current file, unless we are processing a rename
+                    # (in that case, source files should match)
+                    if current_file is not None and not (
+                            current_file.source_file == source_file):
+                        current_file = None
+                    elif current_file is not None:
+                        current_file.source_timestamp = source_timestamp
+                    continue
 
-            # check for target file header
-            is_target_filename = RE_TARGET_FILENAME.match(line)
-            if is_target_filename:
-                target_file = is_target_filename.group('filename')
-                target_timestamp = is_target_filename.group('timestamp')
-                if current_file is not None and not (current_file.target_file == target_file):
-                    raise UnidiffParseError('Target without source: %s' % line)
-                if current_file is None:
-                    # add current file to PatchSet
-                    current_file = PatchedFile(
-                        patch_info, source_file, target_file,
-                        source_timestamp, target_timestamp,
-                        diff_line_no=diff_line_no)
-                    self.append(current_file)
+            elif first == '+':
+                # check for target file header
+                is_target_filename = syntax.target_filename.match(line)
+                if is_target_filename:
+                    target_file = is_target_filename.group('filename')
+                    target_timestamp = is_target_filename.group('timestamp')
+                    if current_file is not None and not (current_file.target_file == target_file):
+                        raise UnidiffParseError('Target without source: %s' % line)
+                    if current_file is None:
+                        # add current file to PatchSet
+                        if pending_file is not None:
+                            yield pending_file
+                        current_file = pending_file = PatchedFile(
+                            patch_info, source_file, target_file,
+                            source_timestamp, target_timestamp,
+                            diff_line_no=diff_line_no)
+                        patch_info = None
+                    else:
+                        current_file.target_timestamp = target_timestamp
+                    continue
+
+            elif first == '@':
+                # check for hunk header
+                is_hunk_header = syntax.hunk_header.match(line)
+                if is_hunk_header:
                     patch_info = None
-                else:
-                    current_file.target_timestamp = target_timestamp
-                continue
+                    if current_file is None:
+                        raise UnidiffParseError('Unexpected hunk found: %s' % line)
+                    if isinstance(diff_lines, _BufferLines):
+                        current_file._parse_buffer_hunk(
+                            line, diff_lines, metadata_only)
+                    elif stats is not None:
+                        start = perf_counter()
+                        decode_time = stats.decode_time
+                        current_file._parse_hunk(line, diff_lines, encoding,
+                                                 metadata_only, storage)
+                        # the hunk lines are decoded as they are read
+                        stats.hunk_time += (perf_counter() - start -
+                                            (stats.decode_time - decode_time))
+                    else:
+                        current_file._parse_hunk(line, diff_lines, encoding,
+                                                 metadata_only, storage)
+                    continue
 
-            # check for hunk header
-            is_hunk_header = RE_HUNK_HEADER.match(line)
-            if is_hunk_header:
-                patch_info = None
-                if current_file is None:
-                    raise UnidiffParseError('Unexpected hunk found: %s' % line)
-                current_file._parse_hunk(line, diff_lines, encoding, metadata_only)
-                continue
+            elif first == '\\':
+                # check for no newline marker
+                is_no_newline = syntax.no_newline_marker.match(line)
+                if is_no_newline:
+                    if current_file is None:
+                        raise UnidiffParseError('Unexpected marker: %s' % line)
+                    current_file._add_no_newline_marker_to_last_hunk(
+                        syntax.no_newline_value)
+                    continue
 
-            # check for no newline marker
-            is_no_newline = RE_NO_NEWLINE_MARKER.match(line)
-            if is_no_newline:
-                if current_file is None:
-                    raise UnidiffParseError('Unexpected marker: %s' % line)
-                current_file._add_no_newline_marker_to_last_hunk()
+            elif (line == syntax.newline and current_file is not None and
+                  len(current_file) > 0):
+                # sometimes hunks can be followed by empty lines; only attach
+                # the empty line to the current file when it actually has
+                # hunks, otherwise (e.g. a hunkless rename in git format-patch
+                # output) it is just a separator and belongs to the
+                # surrounding patch info
+                current_file._append_trailing_empty_line(syntax.newline)
                 continue
 
-            # sometimes hunks can be followed by empty lines; only attach the
-            # empty line to the current file when it actually has hunks,
-            # otherwise (e.g. a hunkless rename in git format-patch output) it
-            # is just a separator and belongs to the surrounding patch info
-            if line == '\n' and current_file:
-                current_file._append_trailing_empty_line()
+            elif line is _NEED_DATA:
+                # an IncrementalParser needs more data to go on
+                yield _NO_FILE
                 continue
 
+            elif not isinstance(line, syntax.line_class):
+                if bytes_mode:
+                    raise TypeError(
+                        'Expected bytes diff data in bytes mode: %r' % line)
+                raise TypeError(
+                    'Expected text diff data (pass an encoding to parse '
+                    'bytes): %r' % line)
+
             # if nothing has matched above then this line is a patch info
             if patch_info is None:
                 current_file = None
                 patch_info = PatchInfo()
 
-            is_binary_diff = RE_BINARY_DIFF.match(line)
-            if is_binary_diff:
-                source_file = is_binary_diff.group('source_filename')
-                target_file = is_binary_diff.group('target_filename')
-                patch_info.append(line)
-                if current_file is not None:
-                    current_file.is_binary_file = True
-                else:
-                    current_file = PatchedFile(
-                        patch_info, source_file, target_file, is_binary_file=True,
-                        diff_line_no=diff_line_no)
-                    self.append(current_file)
-                patch_info = None
-                current_file = None
-                continue
+            if first == 'B':
+                is_binary_diff = syntax.binary_diff.match(line)
+                if is_binary_diff:
+                    source_file = is_binary_diff.group('source_filename')
+                    target_file = is_binary_diff.group('target_filename')
+                    patch_info.append(line)
+                    if current_file is not None:
+                        current_file.is_binary_file = True
+                    else:
+                        if pending_file is not None:
+                            yield pending_file
+                        pending_file = PatchedFile(
+                            patch_info, source_file, target_file, is_binary_file=True,
+                            diff_line_no=diff_line_no)
+                    patch_info = None
+                    current_file = None
+                    continue
 
-            if line == 'GIT binary patch\n':
+            elif line == syntax.git_binary_patch:
                 if current_file is None:
                     raise UnidiffParseError('Unexpected binary patch marker: %s' % line)
                 current_file.is_binary_file = True
@@ -612,32 +2284,401 @@ class PatchSet(list[PatchedFile]):
                 current_file = None
                 continue
 
+            if stats is not None:
+                stats._patch_info_line()
             patch_info.append(line)
 
+        if pending_file is not None:
+            yield pending_file
+
     @classmethod
     def from_filename(cls, filename: str, encoding: str = DEFAULT_ENCODING,
                       errors: Optional[str] = None,
                       newline: Optional[str] = None,
-                      metadata_only: bool = False) -> PatchSet:
-        """Return a PatchSet instance given a diff filename."""
+                      metadata_only: bool = False,
+                      storage: str = STORAGE_LIST,
+                      cache: Optional[ParseCache] = None,
+                      stats: Optional[ParseStats] = None,
+                      mode: str = MODE_TEXT) -> PatchSet:
+        """Return a PatchSet instance given a diff filename.
+
+        If a cache is given, the result is looked up there by the file
+        contents and options (see unidiff.cache.ParseCache); stats are only
+        recorded when the diff is parsed. In bytes mode, the file is read as
+        is (encoding, errors and newline do not apply) and cannot be cached.
+
+        """
+        if mode == MODE_BYTES:
+            if cache is not None:
+                raise ValueError('Bytes mode results cannot be cached')
+            with open(filename, 'rb') as f:
+                return cls(f, metadata_only=metadata_only, storage=storage,
+                           stats=stats, mode=mode)
+
+        if cache is not None:
+            with open(filename, 'rb') as f:
+                data = f.read()
+            key = cache.make_key(data, encoding=encoding, errors=errors,
+                                 newline=newline, metadata_only=metadata_only)
+            return cls._from_cache(cache, key, storage, partial(
+                cls, io.TextIOWrapper(io.BytesIO(data), encoding=encoding,
+                                      errors=errors, newline=newline),
+                metadata_only=metadata_only, storage=storage, stats=stats))
+
         with open(filename, 'r', encoding=encoding, errors=errors, newline=newline) as f:
-            instance = cls(f, metadata_only=metadata_only)
+            instance = cls(f, metadata_only=metadata_only, storage=storage,
+                           stats=stats)
         return instance
 
+    @classmethod
+    def _from_cache(cls, cache: ParseCache, key: str, storage: str,
+                    parse: Callable[[], PatchSet]) -> PatchSet:
+        data = cache.get(key)
+        if data is not None:
+            try:
+                return cls.loads(data, storage=storage)
+            except Exception:
+                # stored by an incompatible version (or damaged), parse it
+                # again
+                pass
+        patch = parse()
+        cache.put(key, patch.dumps())
+        return patch
+
+    @classmethod
+    def from_buffer(cls, buffer: Buffer, encoding: str = DEFAULT_ENCODING,
+                    errors: str = 'strict',
+                    metadata_only: bool = False) -> PatchSet:
+        """Return a PatchSet instance given the raw diff data in a buffer.
+
+        The buffer (bytes, bytearray, memoryview or mmap) is scanned in place
+        and hunk lines are only decoded when accessed, so the buffer must not
+        change while the PatchSet is in use. Line endings are kept as found
+        (lines are only split on newline characters).
+
+        """
+        return cls(_BufferLines(buffer, encoding, errors),  # type: ignore[arg-type]
+                   metadata_only=metadata_only)
+
+    @classmethod
+    def from_mmap(cls, filename: str, encoding: str = DEFAULT_ENCODING,
+                  errors: str = 'strict',
+                  metadata_only: bool = False) -> PatchSet:
+        """Return a PatchSet instance given a diff filename, memory-mapping it.
+
+        See from_buffer; the file is read through the mapping as needed.
+
+        """
+        with open(filename, 'rb') as f:
+            try:
+                buffer: Buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files cannot be mapped
+                buffer = b''
+        return cls.from_buffer(buffer, encoding, errors,
+                               metadata_only=metadata_only)
+
     @staticmethod
     def _convert_string(data: Union[str, bytes], encoding: Optional[str] = None,
-                        errors: str = 'strict') -> StringIO:
+                        errors: str = 'strict',
+                        stats: Optional[ParseStats] = None) -> StringIO:
         if isinstance(data, bytes):
             # decode bytes input, defaulting to UTF-8 when no encoding is given
-            data = data.decode(encoding or DEFAULT_ENCODING, errors)
+            start = perf_counter() if stats is not None else 0.0
+            text = data.decode(encoding or DEFAULT_ENCODING, errors)
+            if stats is not None:
+                elapsed = perf_counter() - start
+                stats.bytes_decoded += len(data)
+                stats.decode_time += elapsed
+                stats.parse_time += elapsed
+            return StringIO(text)
         return StringIO(data)
 
+    @classmethod
+    def _parse_string(cls, data: Union[str, bytes], encoding: Optional[str],
+                      errors: str, metadata_only: bool, storage: str,
+                      stats: Optional[ParseStats], mode: str) -> PatchSet:
+        if mode == MODE_BYTES:
+            # the data is parsed as is (and checked to be bytes)
+            return cls(data, encoding=encoding, metadata_only=metadata_only,
+                       storage=storage, stats=stats, mode=mode)
+        return cls(cls._convert_string(data, encoding, errors, stats),
+                   metadata_only=metadata_only, storage=storage, stats=stats)
+
     @classmethod
     def from_string(cls, data: Union[str, bytes], encoding: Optional[str] = None,
-                    errors: str = 'strict', metadata_only: bool = False) -> PatchSet:
-        """Return a PatchSet instance given a diff string."""
-        return cls(cls._convert_string(data, encoding, errors),
-                   metadata_only=metadata_only)
+                    errors: str = 'strict', metadata_only: bool = False,
+                    storage: str = STORAGE_LIST,
+                    cache: Optional[ParseCache] = None,
+                    stats: Optional[ParseStats] = None,
+                    mode: str = MODE_TEXT) -> PatchSet:
+        """Return a PatchSet instance given a diff string.
+
+        If a cache is given, the result is looked up there by the data and
+        options (see unidiff.cache.ParseCache); stats are only recorded when
+        the diff is parsed. In bytes mode, the data must be bytes (which are
+        not decoded) and the result cannot be cached.
+
+        """
+        if mode == MODE_BYTES and cache is not None:
+            raise ValueError('Bytes mode results cannot be cached')
+        parse = partial(cls._parse_string, data, encoding, errors,
+                        metadata_only, storage, stats, mode)
+        if cache is None:
+            return parse()
+        if isinstance(data, str):
+            key = cache.make_key(data.encode(DEFAULT_ENCODING, 'surrogatepass'),
+                                 text=True, metadata_only=metadata_only)
+        else:
+            key = cache.make_key(data, encoding=encoding, errors=errors,
+                                 metadata_only=metadata_only)
+        return cls._from_cache(cache, key, storage, parse)
+
+    @classmethod
+    async def from_async_iter(cls, source: Any,
+                              encoding: str = DEFAULT_ENCODING,
+                              errors: str = 'strict',
+                              metadata_only: bool = False,
+                              storage: str = STORAGE_LIST) -> PatchSet:
+        """Return a PatchSet instance given an asyncio stream or async iterable.
+
+        See aparse for the accepted sources.
+
+        """
+        patch = cls([])
+        async for patched_file in aparse(
+                source, encoding=encoding, errors=errors,
+                metadata_only=metadata_only, storage=storage):
+            patch.append(patched_file)
+        return patch
+
+    def dumps(self) -> bytes:
+        """Return the parsed patch data in a compact, versioned format.
+
+        Hunk line types, numbers and value offsets are kept as packed arrays
+        and line values as a single string per hunk; see loads. Only the
+        parsed data is kept (ie. not any other attribute set on the files or
+        hunks). Diffs parsed in bytes mode are not supported.
+
+        """
+        files = []
+        for patched_file in self:
+            if (isinstance(patched_file.source_file, bytes) or
+                    isinstance(patched_file.target_file, bytes)):
+                raise ValueError('Bytes mode results cannot be dumped')
+            hunks = []
+            for hunk in patched_file:
+                (line_types, source_line_nos, target_line_nos, diff_line_nos,
+                 value_offsets, text) = hunk._get_columns()
+                hunks.append((
+                    hunk.source_start, hunk.source_length, hunk.target_start,
+                    hunk.target_length, hunk.section_header,
+                    hunk.added, hunk.removed, bytes(line_types),
+                    source_line_nos.tobytes(), target_line_nos.tobytes(),
+                    # values are contiguous, each starts where the last ends
+                    diff_line_nos.tobytes(), value_offsets[1::2].tobytes(),
+                    text))
+            patch_info = patched_file.patch_info
+            files.append((
+                None if patch_info is None else list(patch_info),
+                patched_file.source_file, patched_file.target_file,
+                patched_file.source_timestamp, patched_file.target_timestamp,
+                patched_file.is_binary_file, patched_file.source_mode,
+                patched_file.target_mode, patched_file.diff_line_no, hunks))
+        return pickle.dumps(
+            (_DUMPS_FORMAT, _DUMPS_VERSION, sys.byteorder, files),
+            protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def loads(cls, data: bytes, storage: str = STORAGE_COLUMNAR) -> PatchSet:
+        """Return a PatchSet instance given the data returned by dumps.
+
+        Hunks are loaded using the columnar storage by default, so their
+        lines are only created when accessed; loading is then much faster
+        than parsing the diff again (the lazy storage loads the same way).
+        Use the list storage to get regular hunks instead. Only plain data is
+        read from the payload, no other objects are created while loading it.
+        Raise ValueError if the data is damaged or was not returned by dumps
+        (as far as its structure tells).
+
+        """
+        cls._check_storage(storage)
+        try:
+            header = _DataUnpickler(io.BytesIO(data)).load()
+        except Exception:
+            # damaged data can fail to unpickle in many ways (eg. with a
+            # MemoryError for a huge length)
+            raise ValueError('Invalid PatchSet data')
+        if (not isinstance(header, tuple) or len(header) != 4 or
+                header[0] != _DUMPS_FORMAT):
+            raise ValueError('Invalid PatchSet data')
+        data_format, version, byteorder, files = header
+        if version != _DUMPS_VERSION:
+            raise ValueError(
+                'Unsupported PatchSet data version: %r' % (version,))
+        if byteorder not in ('little', 'big'):
+            raise ValueError('Invalid PatchSet data')
+        _check_dumps_files(files)
+        try:
+            return cls._load_files(files, byteorder, storage)
+        except Exception:
+            raise ValueError('Invalid PatchSet data')
+
+    @classmethod
+    def _load_files(cls, files: list, byteorder: str,
+                    storage: str) -> PatchSet:
+        """Return a PatchSet instance given the (checked) dumps files."""
+        patch = cls([])
+        patched_files = []
+        for (patch_info, source_file, target_file, source_timestamp,
+             target_timestamp, is_binary_file, source_mode, target_mode,
+             diff_line_no, hunks) in files:
+            patched_file = PatchedFile(
+                None if patch_info is None else PatchInfo(patch_info),
+                source_file, target_file, source_timestamp, target_timestamp,
+                is_binary_file, source_mode, target_mode, diff_line_no)
+            for (src_start, src_len, tgt_start, tgt_len, section_header,
+                 added, removed, line_types, source_line_nos, target_line_nos,
+                 diff_line_nos, value_ends, text) in hunks:
+                columns = (array('i', source_line_nos),
+                           array('i', target_line_nos),
+                           array('i', diff_line_nos),
+                           array('q', value_ends))
+                if byteorder != sys.byteorder:
+                    for column in columns:
+                        column.byteswap()
+                ends = columns[3]
+                if ends and (min(ends) < 0 or ends[-1] != len(text)):
+                    raise ValueError('Invalid PatchSet data')
+                value_offsets = array('q', bytes(2 * ends.itemsize * len(ends)))
+                value_offsets[1::2] = ends
+                value_offsets[2::2] = ends[:-1]
+                hunk: Hunk = ColumnarHunk._from_columns(
+                    src_start, src_len, tgt_start, tgt_len, section_header,
+                    bytearray(line_types), columns[0], columns[1], columns[2],
+                    value_offsets, text)
+                if storage == STORAGE_LIST:
+                    lines = list(hunk)
+                    hunk = Hunk(src_start, src_len, tgt_start, tgt_len,
+                                section_header)
+                    list.extend(hunk, lines)
+                # metadata only hunks have counts but no lines
+                hunk._set_line_counts(added, removed)
+                patched_file.append(hunk)
+            patched_files.append(patched_file)
+        patch.extend(patched_files)
+        return patch
+
+    def _build_index(self) -> tuple[dict[str, PatchedFile], ...]:
+        if self._index is None:
+            by_path: dict[str, PatchedFile] = {}
+            by_source: dict[str, PatchedFile] = {}
+            by_target: dict[str, PatchedFile] = {}
+            for patched_file in self:
+                by_path.setdefault(patched_file.path, patched_file)
+                if patched_file.source_file not in _DEV_NULLS:
+                    by_source.setdefault(
+                        _strip_file_prefix(patched_file.source_file),
+                        patched_file)
+                if patched_file.target_file not in _DEV_NULLS:
+                    by_target.setdefault(
+                        _strip_file_prefix(patched_file.target_file),
+                        patched_file)
+            self._index = (by_path, by_source, by_target)
+        return self._index
+
+    def _reset_index(self) -> None:
+        self._index = None
+
+    @property
+    def by_path(self) -> Mapping[str, PatchedFile]:
+        """Return a read-only mapping of the patched files by path.
+
+        If a path is patched more than once, the first file is used. The
+        mapping is built when first needed, and again after the PatchSet
+        changes (changes to the files' names are not tracked).
+
+        """
+        return MappingProxyType(self._build_index()[0])
+
+    @property
+    def by_source(self) -> Mapping[str, PatchedFile]:
+        """Return a read-only mapping of the patched files by source name.
+
+        Names are given without their VCS prefix (as in PatchedFile.path);
+        added files are not included.
+
+        """
+        return MappingProxyType(self._build_index()[1])
+
+    @property
+    def by_target(self) -> Mapping[str, PatchedFile]:
+        """Return a read-only mapping of the patched files by target name.
+
+        Names are given without their VCS prefix (as in PatchedFile.path);
+        removed files are not included.
+
+        """
+        return MappingProxyType(self._build_index()[2])
+
+    def get(self, path: Any,
+            default: Optional[PatchedFile] = None) -> Optional[PatchedFile]:
+        """Return the patched file with the given path, or default.
+
+        The path is bytes for diffs parsed in bytes mode.
+
+        """
+        return self._build_index()[0].get(path, default)
+
+    # list changes invalidate the index
+
+    def __setitem__(self, index, value):
+        self._reset_index()
+        super(PatchSet, self).__setitem__(index, value)
+
+    def __delitem__(self, index: Union[SupportsIndex, slice]) -> None:
+        self._reset_index()
+        super(PatchSet, self).__delitem__(index)
+
+    def __iadd__(self, files: Iterable[PatchedFile]) -> PatchSet:  # type: ignore[override,misc]
+        self._reset_index()
+        return super(PatchSet, self).__iadd__(files)
+
+    def __imul__(self, count: SupportsIndex) -> PatchSet:
+        self._reset_index()
+        return super(PatchSet, self).__imul__(count)
+
+    def append(self, patched_file: PatchedFile) -> None:
+        self._reset_index()
+        super(PatchSet, self).append(patched_file)
+
+    def extend(self, files: Iterable[PatchedFile]) -> None:
+        self._reset_index()
+        super(PatchSet, self).extend(files)
+
+    def insert(self, index: SupportsIndex, patched_file: PatchedFile) -> None:
+        self._reset_index()
+        super(PatchSet, self).insert(index, patched_file)
+
+    def pop(self, index: SupportsIndex = -1) -> PatchedFile:
+        self._reset_index()
+        return super(PatchSet, self).pop(index)
+
+    def remove(self, patched_file: PatchedFile) -> None:
+        self._reset_index()
+        super(PatchSet, self).remove(patched_file)
+
+    def clear(self) -> None:
+        self._reset_index()
+        super(PatchSet, self).clear()
+
+    def sort(self, *args, **kwargs) -> None:
+        self._reset_index()
+        super(PatchSet, self).sort(*args, **kwargs)
+
+    def reverse(self) -> None:
+        self._reset_index()
+        super(PatchSet, self).reverse()
 
     @property
     def added_files(self) -> list[PatchedFile]:
@@ -663,3 +2704,200 @@ class PatchSet(list[PatchedFile]):
     def removed(self) -> int:
         """Return the patch total removed lines."""
         return sum([f.removed for f in self])
+
+
+def _refuse_class(module: str, name: str) -> NoReturn:
+    raise pickle.UnpicklingError(
+        'Unexpected object in PatchSet data: %s.%s' % (module, name))
+
+
+# unpickler for PatchSet.loads, limited to builtin data types (created with
+# type(), as mypyc cannot compile a subclass of the C pickle.Unpickler)
+_DataUnpickler = type('_DataUnpickler', (pickle.Unpickler,), {
+    '__module__': __name__, 'find_class': staticmethod(_refuse_class)})
+
+# the line type codes kept by ColumnarHunk (0 for empty lines)
+_COLUMN_LINE_TYPES = bytes([0, _ADDED, _REMOVED, _CONTEXT, _NO_NEWLINE])
+
+
+# the types of the dumps hunk fields, with or without a section header
+_DUMPS_HUNK_TYPES = frozenset(
+    (int, int, int, int, section_header_type, int, int, bytes, bytes, bytes,
+     bytes, bytes, str)
+    for section_header_type in (str, type(None)))
+
+
+def _check_dumps_hunk(hunk_data: Any) -> None:
+    """Raise ValueError unless hunk_data is laid out as dumps does."""
+    if (type(hunk_data) is not tuple or
+            tuple(map(type, hunk_data)) not in _DUMPS_HUNK_TYPES):
+        raise ValueError('Invalid PatchSet data')
+    line_types = hunk_data[7]
+    count = len(line_types)
+    if (line_types.translate(None, _COLUMN_LINE_TYPES) or
+            len(hunk_data[8]) != count * _INT_SIZE or
+            len(hunk_data[9]) != count * _INT_SIZE or
+            len(hunk_data[10]) != count * _INT_SIZE or
+            len(hunk_data[11]) != count * _OFFSET_SIZE):
+        raise ValueError('Invalid PatchSet data')
+
+
+def _check_dumps_files(files: Any) -> None:
+    """Raise ValueError unless files is laid out as dumps does.
+
+    Only the structure and types are checked, as data changed within those
+    (eg. the text of a line) cannot be told apart from valid data.
+
+    """
+    if type(files) is not list:
+        raise ValueError('Invalid PatchSet data')
+    for file_data in files:
+        if type(file_data) is not tuple or len(file_data) != 10:
+            raise ValueError('Invalid PatchSet data')
+        (patch_info, source_file, target_file, source_timestamp,
+         target_timestamp, is_binary_file, source_mode, target_mode,
+         diff_line_no, hunks) = file_data
+        if patch_info is not None:
+            if type(patch_info) is not list:
+                raise ValueError('Invalid PatchSet data')
+            for line in patch_info:
+                if type(line) is not str:
+                    raise ValueError('Invalid PatchSet data')
+        for value in (source_file, target_file, source_timestamp,
+                      target_timestamp, source_mode, target_mode):
+            if value is not None and type(value) is not str:
+                raise ValueError('Invalid PatchSet data')
+        if (type(is_binary_file) is not bool or
+                (diff_line_no is not None and type(diff_line_no) is not int) or
+                type(hunks) is not list):
+            raise ValueError('Invalid PatchSet data')
+        for hunk_data in hunks:
+            _check_dumps_hunk(hunk_data)
+
+
+class IncrementalParser(object):
+    """Parse diff data fed in chunks, as it becomes available.
+
+    Data can be fed as text or bytes (decoded using the given encoding);
+    lines and hunks may be split across chunks. Each PatchedFile is returned
+    once complete, ie. when the next file starts or the parser is closed.
+    After a parsing error the parser cannot be used anymore.
+
+    """
+
+    def __init__(self, encoding: str = DEFAULT_ENCODING,
+                 errors: str = 'strict', metadata_only: bool = False,
+                 storage: str = STORAGE_LIST) -> None:
+        PatchSet._check_storage(storage)
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors)
+        self._lines = _FedLines()
+        self._files = PatchSet._iter_parse(
+            self._lines, None, metadata_only, storage)
+        # the last line fed, if it was not complete
+        self._partial = ''
+
+    def feed(self, data: Union[str, bytes]) -> list[PatchedFile]:
+        """Parse the data, returning the files completed so far."""
+        if self._lines.closed:
+            raise ValueError('Parser is closed')
+        if isinstance(data, bytes):
+            data = self._decoder.decode(data)
+        lines = (self._partial + data).split('\n')
+        self._partial = lines.pop()
+        for line in lines:
+            self._lines.add(line + '\n')
+        return self._parse()
+
+    def close(self) -> list[PatchedFile]:
+        """Parse any remaining data, returning the last files."""
+        if self._lines.closed:
+            raise ValueError('Parser is closed')
+        data = self._partial + self._decoder.decode(b'', final=True)
+        lines = data.split('\n')
+        for line in lines[:-1]:
+            self._lines.add(line + '\n')
+        if lines[-1]:
+            self._lines.add(lines[-1])
+        self._lines.release_hunk()
+        self._lines.closed = True
+        return self._parse()
+
+    def _parse(self) -> list[PatchedFile]:
+        files = []
+        for patched_file in self._files:
+            if patched_file is _NO_FILE:
+                break
+            files.append(patched_file)
+        return files
+
+
+class _AsyncFiles(object):
+    """The async iterator over the parsed files returned by aparse.
+
+    (An async generator would be simpler, but cannot be compiled by mypyc.)
+
+    """
+
+    def __init__(self, source: Any, parser: IncrementalParser) -> None:
+        self._source = source
+        self._parser = parser
+        # the source async iterator (unless it is read), and the rest of its
+        # last chunk
+        self._chunks: Optional[AsyncIterator[Union[str, bytes]]] = None
+        self._chunk: Union[str, bytes] = ''
+        self._start = 0
+        # the parsed files not returned yet
+        self._files: deque[PatchedFile] = deque()
+        self._closed = False
+
+    def __aiter__(self) -> _AsyncFiles:
+        return self
+
+    async def __anext__(self) -> PatchedFile:
+        # asyncio is already loaded when this runs, no need to always import
+        # it
+        import asyncio
+
+        while not self._files:
+            if self._closed:
+                raise StopAsyncIteration
+            chunk = await self._read()
+            if not chunk:
+                self._closed = True
+                self._files.extend(self._parser.close())
+            else:
+                self._files.extend(self._parser.feed(chunk))
+                await asyncio.sleep(0)
+        return self._files.popleft()
+
+    async def _read(self) -> Union[str, bytes]:
+        """Return the next chunk of data, empty at the end of the source."""
+        if hasattr(self._source, 'read'):
+            return await self._source.read(_ASYNC_CHUNK_SIZE)
+        if self._chunks is None:
+            self._chunks = self._source.__aiter__()
+        while self._start >= len(self._chunk):
+            try:
+                self._chunk = await self._chunks.__anext__()
+            except StopAsyncIteration:
+                return ''
+            self._start = 0
+        start = self._start
+        self._start += _ASYNC_CHUNK_SIZE
+        return self._chunk[start:self._start]
+
+
+def aparse(source: Any, encoding: str = DEFAULT_ENCODING,
+           errors: str = 'strict', metadata_only: bool = False,
+           storage: str = STORAGE_LIST) -> AsyncIterator[PatchedFile]:
+    """Parse diff data from an asyncio stream, yielding each PatchedFile.
+
+    The source is either an asyncio.StreamReader (or any object with an
+    async read(n) method) or an async iterable of text or bytes chunks.
+    The data is parsed in small chunks, letting other tasks run in between,
+    so parsing a large diff does not block the event loop.
+
+    """
+    parser = IncrementalParser(encoding, errors, metadata_only=metadata_only,
+                               storage=storage)
+    return _AsyncFiles(source, parser)
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+# Copyright (c) 2014-2023 Matias Bordese
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Counters and timings recorded while parsing diffs."""
+
+from __future__ import annotations
+
+from typing import Union
+
+
+# first characters of the lines that may be a header (see
+# PatchSet._iter_parse); 'o' and 'i' lines are only checked within a git
+# file header
+_HEADER_FIRST_CHARS = frozenset(['d', 'n', '-', '+', '@', '\\', 'B'])
+_GIT_HEADER_FIRST_CHARS = frozenset(['o', 'i'])
+
+_COUNTERS = (
+    'files', 'binary_files', 'hunks', 'lines_created', 'lines_read',
+    'header_lines', 'patch_info_lines', 'bytes_decoded', 'header_candidates',
+    'header_misses', 'parse_time', 'decode_time', 'hunk_time',
+)
+
+
+class ParseStats(object):
+    """Where the time goes when parsing a diff.
+
+    Pass an instance as `stats` to PatchSet (or PatchSet.iter_files,
+    from_filename or from_string) to record what the parser did; the counts
+    add up over every parse using the same instance. Recording costs a few
+    checks per header line and per hunk, and nothing when no instance is
+    given.
+
+    Lines are counted by where they went: hunk lines were parsed as part of
+    a hunk body, header lines matched one of the header patterns (file and
+    hunk headers, git extended headers, binary markers, ...) and patch info
+    lines matched none (e.g. a commit message). The parse time is split into
+    decoding (of bytes input), header parsing and hunk parsing.
+
+    Header candidates are the lines whose first character may start a
+    header, so they were checked against the header patterns (one or more
+    of them, depending on the line); header matches are the candidates that
+    turned out to be a header, and header misses those kept as patch info.
+
+    """
+
+    def __init__(self) -> None:
+        self.files = 0
+        self.binary_files = 0
+        self.hunks = 0
+        # Line objects created (hunk lines kept in columns, or not kept at
+        # all for metadata only parsing, are not created)
+        self.lines_created = 0
+        self.lines_read = 0
+        self.header_lines = 0
+        self.patch_info_lines = 0
+        self.bytes_decoded = 0
+        self.header_candidates = 0
+        self.header_misses = 0
+        self.parse_time = 0.0
+        self.decode_time = 0.0
+        self.hunk_time = 0.0
+        # whether the last scanned line was checked against any pattern
+        self._attempted = False
+
+    def __repr__(self) -> str:
+        return '<ParseStats: %d files, %d lines, %.3fs>' % (
+            self.files, self.lines_read, self.parse_time)
+
+    @property
+    def hunk_lines(self) -> int:
+        return self.lines_read - self.header_lines - self.patch_info_lines
+
+    @property
+    def header_matches(self) -> int:
+        return self.header_candidates - self.header_misses
+
+    @property
+    def header_time(self) -> float:
+        return self.parse_time - self.decode_time - self.hunk_time
+
+    def _scan_line(self, first: str, in_git_header: bool) -> None:
+        """Record a line checked by the header parser."""
+        self.header_lines += 1
+        self._attempted = first in _HEADER_FIRST_CHARS or (
+            in_git_header and first in _GIT_HEADER_FIRST_CHARS)
+        if self._attempted:
+            self.header_candidates += 1
+
+    def _patch_info_line(self) -> None:
+        """Record that the last scanned line matched no header pattern."""
+        self.header_lines -= 1
+        self.patch_info_lines += 1
+        if self._attempted:
+            self.header_misses += 1
+
+    def merge(self, other: ParseStats) -> None:
+        """Add the counts and timings recorded by another instance."""
+        for name in _COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def as_dict(self) -> dict[str, Union[int, float]]:
+        """Return the counters and timings (in seconds) by name."""
+        return {
+            'files': self.files,
+            'binary_files': self.binary_files,
+            'hunks': self.hunks,
+            'lines_created': self.lines_created,
+            'lines_read': self.lines_read,
+            'header_lines': self.header_lines,
+            'hunk_lines': self.hunk_lines,
+            'patch_info_lines': self.patch_info_lines,
+            'bytes_decoded': self.bytes_decoded,
+            'header_candidates': self.header_candidates,
+            'header_matches': self.header_matches,
+            'parse_time': self.parse_time,
+            'decode_time': self.decode_time,
+            'header_time': self.header_time,
+            'hunk_time': self.hunk_time,
+        }